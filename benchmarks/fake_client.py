@@ -0,0 +1,128 @@
+import asyncio
+import itertools
+from collections import OrderedDict
+
+from pyrogram import Client
+from pyrogram.enums import ChatType
+from pyrogram.types import Chat, User, Message, Document
+
+from utils.supervisor import dispatch_update
+
+
+class FakeClient(Client):
+    """
+    Клиент Pyrogram без подключения к Telegram для нагрузочных тестов.
+    Хранит зарегистрированные обработчики и выполняет их так же, как диспетчер Pyrogram:
+    в каждой группе срабатывает первый обработчик, чьи фильтры пропустили обновление.
+    Исходящие запросы не уходят в сеть, а запоминаются; последний ответ в каждом чате
+    доступен симулятору пользователя, чтобы нажимать кнопки из его клавиатуры.
+
+    Атрибуты:
+        api_latency (float): Искусственная задержка каждого запроса к API (сек).
+        api_calls (int): Количество выполненных запросов к API.
+        last_messages (dict): Последнее сообщение бота в каждом чате.
+        inline_results (int): Количество результатов, отправленных в ответах на инлайн-запросы.
+        files (dict): Содержимое отправленных ботом документов по file_id, их же отдает download_media.
+    Создавать нужно внутри запущенного event loop.
+    """
+    def __init__(self, name: str = "load_test", api_latency: float = 0.0):
+        super().__init__(name=name, api_id=1, api_hash="0" * 32, bot_token="1:fake", in_memory=True)
+        self.me = User(id=1, is_bot=True, first_name="Load test bot", username="load_test_bot")
+        self.api_latency = api_latency
+        self.api_calls = 0
+        self.last_messages: dict = {}
+        self.inline_results = 0
+        self.files: dict = {}
+        self._message_ids = itertools.count(1)
+
+    def add_handler(self, handler, group: int = 0):
+        # Pyrogram добавляет обработчик фоновой задачей, здесь он нужен сразу.
+        groups = self.dispatcher.groups
+        if group not in groups:
+            groups[group] = []
+            self.dispatcher.groups = OrderedDict(sorted(groups.items()))
+        self.dispatcher.groups[group].append(handler)
+        return handler, group
+
+    async def feed(self, update):
+        """Передает обновление зарегистрированным обработчикам."""
+        await dispatch_update(self, update)
+
+    async def _api_call(self):
+        self.api_calls += 1
+        await asyncio.sleep(self.api_latency)
+
+    async def send_message(self, chat_id, text: str, reply_markup=None, **kwargs):
+        await self._api_call()
+        message = Message(
+            id=next(self._message_ids),
+            chat=Chat(id=chat_id, type=ChatType.PRIVATE),
+            from_user=self.me,
+            text=text,
+            reply_markup=reply_markup,
+            client=self,
+        )
+        self.last_messages[chat_id] = message
+        return message
+
+    async def edit_message_text(self, chat_id, message_id: int, text: str, reply_markup=None, **kwargs):
+        await self._api_call()
+        message = Message(
+            id=message_id,
+            chat=Chat(id=chat_id, type=ChatType.PRIVATE),
+            from_user=self.me,
+            text=text,
+            reply_markup=reply_markup,
+            client=self,
+        )
+        self.last_messages[chat_id] = message
+        return message
+
+    async def edit_message_reply_markup(self, chat_id, message_id: int, reply_markup=None, **kwargs):
+        await self._api_call()
+        message = self.last_messages.get(chat_id)
+        if message is not None and message.id == message_id:
+            message.reply_markup = reply_markup
+        return message
+
+    async def send_document(self, chat_id, document, file_name: str = None, caption: str = "", **kwargs):
+        await self._api_call()
+        with open(document, "rb") as file:
+            content = file.read()
+        file_id = f"document{len(self.files) + 1}"
+        self.files[file_id] = content
+        message = Message(
+            id=next(self._message_ids),
+            chat=Chat(id=chat_id, type=ChatType.PRIVATE),
+            from_user=self.me,
+            caption=caption,
+            document=Document(file_id=file_id, file_unique_id=file_id, file_name=file_name, file_size=len(content)),
+            client=self,
+        )
+        self.last_messages[chat_id] = message
+        return message
+
+    async def download_media(self, message, file_name: str = "downloads/", **kwargs):
+        await self._api_call()
+        with open(file_name, "wb") as file:
+            file.write(self.files[message.document.file_id])
+        return file_name
+
+    async def answer_callback_query(self, callback_query_id: str, text: str = None, **kwargs):
+        await self._api_call()
+        return True
+
+    async def answer_inline_query(self, inline_query_id: str, results: list, **kwargs):
+        await self._api_call()
+        self.inline_results += len(results)
+        return True
+
+    async def set_bot_commands(self, commands: list, **kwargs):
+        await self._api_call()
+        return True
+
+    async def start(self):
+        return self
+
+    async def stop(self, block: bool = True):
+        return self
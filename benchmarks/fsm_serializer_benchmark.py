@@ -0,0 +1,162 @@
+"""
+Сравнение сериализаторов данных FSM с прежним путем (json.loads/json.dumps строк при каждом обновлении).
+Для типичных данных обработчиков измеряет размер закодированных данных, память на пользователя
+в MemoryStorage (tracemalloc), время обновления (разбор, изменение, кодирование) и время нажатия,
+которое записывает те же данные (без повторного кодирования).
+С --redis-url дополнительно измеряет MEMORY USAGE хэша пользователя в Redis.
+
+    python -m benchmarks.fsm_serializer_benchmark --users 10000
+    python -m benchmarks.fsm_serializer_benchmark --redis-url redis://localhost:6379/15
+"""
+import copy
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import tracemalloc
+
+from fsm import FSMContext, MemoryStorage, create_serializer
+from states.tasks import TaskState
+
+SERIALIZERS = ("json", "compact", "msgpack")
+
+
+def payloads() -> list:
+    """Данные FSM, которые записывают обработчики регистрации, задач, выбора и поиска."""
+    return [
+        {"username": "alice_1984"},
+        {"task_name": "Prepare the quarterly report"},
+        {"data": {"task_id": 1048576, "task_status": "PROG", "task_name": "Prepare the quarterly report",
+                  "task_due": True}},
+        {"data": {"task_id": 1048577, "task_status": "DONE", "task_name": "Buy milk", "task_due": False,
+                  "field": "description"}},
+        {"selected": "2bz.1.1.3.a.1", "selection_page": "2"},
+        {"search": "report"},
+    ]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="FSM data serializers vs the JSON string path.")
+    parser.add_argument("--users", type=int, default=10000, help="Users stored for the memory measurement.")
+    parser.add_argument("--repeat", type=int, default=20000, help="Measured updates per variant.")
+    parser.add_argument("--redis-url", default=None, help="Redis URL for MEMORY USAGE (keys are removed).")
+    return parser.parse_args()
+
+
+def timed(func, repeat: int) -> float:
+    """Возвращает медианное время вызова (мкс) по 5 сериям."""
+    series = []
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(repeat // 5):
+            func()
+        series.append((time.perf_counter() - started) / (repeat // 5))
+    return statistics.median(series) * 1e6
+
+
+def legacy_update(raw: str, data: dict) -> str:
+    """Прежний путь: строка из Redis разбирается и новые данные кодируются при каждом обновлении."""
+    json.loads(raw)
+    return json.dumps(data)
+
+
+def context_update(storage, raw: bytes, data: dict) -> bytes:
+    """Обновление через FSMContext: данные разбираются при сравнении и кодируются, если изменились."""
+    context = FSMContext(storage, 1, TaskState.CHANGE_TASK_DATA, raw=raw)
+    context.set_state(TaskState.CHANGE_TASK_DATA)
+    context.set_data(data)
+    return context.payload()
+
+
+def memory_per_user(storage, raw: bytes, users: int) -> float:
+    """Байт на пользователя в MemoryStorage с данными raw."""
+    async def fill():
+        for user_id in range(users):
+            # Отдельная копия данных на пользователя, как после записи из обработчика.
+            context = FSMContext(storage, user_id, TaskState.CHANGE_TASK_DATA, raw=bytes(bytearray(raw)))
+            await storage.save(context, {"state", "data"})
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    asyncio.run(fill())
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (current - before) / users
+
+
+def legacy_memory_per_user(data: dict, users: int) -> float:
+    """Байт на пользователя в MemoryStorage до сериализаторов: копии словарей данных."""
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    records = {user_id: {"state": TaskState.CHANGE_TASK_DATA, "data": copy.deepcopy(data)} for user_id in range(users)}
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return (current - before) / users
+
+
+def redis_memory_usage(url: str, raw_by_name: dict) -> dict:
+    """MEMORY USAGE хэша `user:{id}` (state и data) в байтах для каждого формата."""
+    from redis import Redis
+
+    client = Redis.from_url(url)
+    result = {}
+    try:
+        for name, raw in raw_by_name.items():
+            key = f"fsm_benchmark:{name}"
+            client.hset(key, mapping={"state": TaskState.CHANGE_TASK_DATA, "data": raw})
+            result[name] = client.memory_usage(key, samples=0)
+            client.delete(key)
+    finally:
+        client.close()
+    return result
+
+
+def main():
+    args = parse_args()
+    data = payloads()
+    detail = data[2]
+    changed = {"data": {**detail["data"], "field": "name"}}
+    print(f"{len(data)} handler payloads, {args.users} users, {args.repeat} updates\n")
+
+    rows = []
+    legacy_raw = json.dumps(detail)
+    rows.append((
+        "json str (before)",
+        statistics.mean(len(json.dumps(item).encode()) for item in data),
+        legacy_memory_per_user(detail, args.users),
+        timed(lambda: legacy_update(legacy_raw, changed), args.repeat),
+        timed(lambda: legacy_update(legacy_raw, detail), args.repeat),
+    ))
+    raw_by_name = {"json str (before)": legacy_raw.encode()}
+    for name in SERIALIZERS:
+        try:
+            serializer = create_serializer(name)
+        except ImportError as e:
+            print(f"{name}: skipped ({e})")
+            continue
+        for item in data:
+            assert serializer.loads(serializer.dumps(item)) == item
+        storage = MemoryStorage(serializer=serializer)
+        raw = serializer.dumps(detail)
+        raw_by_name[name] = raw
+        rows.append((
+            name,
+            statistics.mean(len(serializer.dumps(item)) for item in data),
+            memory_per_user(MemoryStorage(serializer=serializer), raw, args.users),
+            timed(lambda: context_update(storage, raw, changed), args.repeat),
+            timed(lambda: context_update(storage, raw, copy.copy(detail)), args.repeat),
+        ))
+
+    print(f"\n{'variant':<20}{'payload B':>11}{'memory B/user':>15}{'update us':>11}{'unchanged us':>14}")
+    for name, size, memory, update, unchanged in rows:
+        print(f"{name:<20}{size:>11.1f}{memory:>15.0f}{update:>11.2f}{unchanged:>14.2f}")
+    if args.redis_url:
+        print(f"\n{'variant':<20}{'redis B/key':>12}")
+        for name, usage in redis_memory_usage(args.redis_url, raw_by_name).items():
+            print(f"{name:<20}{usage:>12}")
+
+
+if __name__ == "__main__":
+    main()
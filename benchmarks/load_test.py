@@ -0,0 +1,99 @@
+"""
+Нагрузочный тест бота без Telegram.
+Запускает N виртуальных пользователей, которые параллельно проходят полный сценарий работы с ботом
+через настоящие обработчики, диспетчер и очередь отправки, и выводит пропускную способность
+и перцентили времени ответа по каждому шагу.
+
+Пример:
+    python -m benchmarks.load_test --users 200 --tasks 15 --backend memory --fsm memory
+"""
+import time
+import asyncio
+import argparse
+
+from config.config import settings
+from utils.sender import MessageSender
+from utils.metrics import metrics
+from benchmarks.fake_client import FakeClient
+from benchmarks.simulator import LatencyStats, VirtualUser
+from benchmarks.stubs import MemoryCRUD
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline load test of the bot handlers.")
+    parser.add_argument("--users", type=int, default=100, help="Number of concurrent virtual users.")
+    parser.add_argument("--tasks", type=int, default=12, help="Tasks created by each user.")
+    parser.add_argument("--backend", choices=("memory", "postgres"), default="memory",
+                        help="Storage of users and tasks: in-memory stub or the configured PostgreSQL.")
+    parser.add_argument("--fsm", choices=("memory", "redis"), default="memory", help="FSM storage backend.")
+    parser.add_argument("--db-latency", type=float, default=0.0,
+                        help="Simulated round-trip of each query to the in-memory stub (seconds).")
+    parser.add_argument("--api-latency", type=float, default=0.0,
+                        help="Simulated round-trip of each Telegram API call (seconds).")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Pause between user steps (seconds).")
+    parser.add_argument("--throttle", action="store_true",
+                        help="Keep the configured Telegram rate limits in the sender.")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Collect handler, CRUD and per-update round-trip metrics and print them.")
+    parser.add_argument("--user-id-base", type=int, default=10_000_000, help="First virtual user id.")
+    return parser.parse_args()
+
+
+def print_report(stats: LatencyStats, elapsed: float, app, client: FakeClient):
+    print(f"{'step':<24}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for step, count, p50, p95, p99, worst in stats.report():
+        print(f"{step:<24}{count:>8}{p50:>10.2f}{p95:>10.2f}{p99:>10.2f}{worst:>10.2f}")
+    total = stats.total()
+    print(f"\nupdates: {total}, failed scenarios: {stats.errors}, elapsed: {elapsed:.2f} s, "
+          f"throughput: {total / elapsed:.1f} updates/s")
+    print(f"api calls: {client.api_calls}")
+    if isinstance(app.crud, MemoryCRUD):
+        print(f"db queries: {app.crud.queries}")
+    print(f"dispatcher: {app.dispatcher.stats()}")
+    print(f"sender: {app.sender.stats()}")
+
+
+async def run(args):
+    # main импортируется после выбора бэкенда FSM, BotApp создает хранилище по настройкам.
+    settings.fsm_backend = args.fsm
+    from main import create_app
+
+    client = FakeClient(api_latency=args.api_latency)
+    app = create_app(client)
+    if not args.throttle:
+        app.sender = MessageSender(client, global_rate=1e9, chat_rate=1e9, chat_burst=1e9,
+                                   workers=settings.sender_workers)
+    if args.backend == "memory":
+        app.crud = MemoryCRUD(latency=args.db_latency)
+        app.register_handlers()
+    else:
+        await app.setup()
+
+    metrics.enabled = args.metrics
+    stats = LatencyStats()
+    users = [
+        VirtualUser(client, app.dispatcher, args.user_id_base + number, args.tasks, args.think_time, app.callbacks)
+        for number in range(args.users)
+    ]
+    started = time.perf_counter()
+    results = await asyncio.gather(*(user.run(stats) for user in users), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    failures = [result for result in results if isinstance(result, Exception)]
+    if failures:
+        print(f"first failure: {failures[0]!r}")
+
+    print_report(stats, elapsed, app, client)
+    if args.metrics:
+        print()
+        print(metrics.render())
+    await app.dispatcher.join()
+    await app.sender.close()
+    await app.crud.close()
+    await app.db.close()
+    await app.storage.close()
+    if app.redis:
+        await app.redis.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
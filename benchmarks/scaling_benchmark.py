@@ -0,0 +1,107 @@
+"""
+Пропускная способность режима супервизора в зависимости от количества процессов-воркеров.
+Супервизор раздает обновления виртуальных пользователей воркерам по консистентному хешу Телеграм ID
+через те же очереди multiprocessing, что и в боевом режиме. Воркеры выполняют настоящие обработчики,
+диспетчер и очередь отправки с FakeClient и MemoryCRUD, поэтому тест не требует Telegram, PSQL и Redis.
+
+Пример:
+    python -m benchmarks.scaling_benchmark --workers 1,2,4,8 --users 400 --tasks 10
+
+Рост пропускной способности ограничен количеством ядер машины и скоростью супервизора,
+который сериализует все обновления в одном процессе.
+"""
+import os
+import time
+import asyncio
+import argparse
+import itertools
+
+# Воркеры запускаются через spawn и читают настройки из окружения заново.
+os.environ["FSM_BACKEND"] = "memory"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from pyrogram.enums import ChatType
+from pyrogram.types import Chat, User, Message
+
+from config.config import settings
+from utils.sender import MessageSender
+from utils.supervisor import Supervisor
+from benchmarks.fake_client import FakeClient
+from benchmarks.stubs import MemoryCRUD
+
+_message_ids = itertools.count(1)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Supervisor throughput by number of worker processes.")
+    parser.add_argument("--workers", default=",".join(str(2 ** n) for n in range(4) if 2 ** n <= (os.cpu_count() or 1)),
+                        help="Comma separated numbers of worker processes to measure.")
+    parser.add_argument("--users", type=int, default=400, help="Number of virtual users.")
+    parser.add_argument("--tasks", type=int, default=10, help="Tasks created by each user.")
+    parser.add_argument("--lists", type=int, default=5, help="/my_tasks requests of each user.")
+    parser.add_argument("--user-id-base", type=int, default=10_000_000, help="First virtual user id.")
+    return parser.parse_args()
+
+
+async def create_benchmark_app(shard: int):
+    """Создает приложение бота в процессе-воркере с FakeClient, MemoryCRUD и очередью отправки без лимитов."""
+    from main import create_app
+
+    client = FakeClient(name=f"scaling_{shard}")
+    app = create_app(client)
+    app.sender = MessageSender(client, global_rate=1e9, chat_rate=1e9, chat_burst=1e9,
+                               workers=settings.sender_workers)
+    app.crud = MemoryCRUD()
+    app.register_handlers()
+    return app
+
+
+def user_script(user_id: int, tasks: int, lists: int) -> list:
+    """Сообщения одного пользователя: регистрация, создание задач и просмотр списка."""
+    user = User(id=user_id, is_bot=False, first_name=f"user{user_id}")
+    chat = Chat(id=user_id, type=ChatType.PRIVATE)
+    texts = ["/start", f"User {user_id}", f"login{user_id}"]
+    for number in range(tasks):
+        texts += ["/create_task", f"Task {number}", f"Description of task {number}"]
+    texts += ["/my_tasks"] * lists
+    return [Message(id=next(_message_ids), chat=chat, from_user=user, text=text) for text in texts]
+
+
+async def measure(workers: int, scripts: list) -> tuple:
+    """
+    Передает обновления всех пользователей супервизору, чередуя пользователей, как в живом потоке,
+    и ждет, пока воркеры обработают их и завершатся.
+    Возвращает:
+        tuple: Время (сек), количество переданных и обработанных обновлений.
+    """
+    supervisor = Supervisor(None, workers, create_benchmark_app)
+    await supervisor.start()
+    started = time.perf_counter()
+    for number, update in enumerate(
+        update for step in itertools.zip_longest(*scripts) for update in step if update is not None
+    ):
+        supervisor.forward(update)
+        if number % 500 == 499:
+            await asyncio.sleep(0)
+    await supervisor.stop()
+    elapsed = time.perf_counter() - started
+    return elapsed, supervisor.forwarded, sum(supervisor.processed.values())
+
+
+async def run(args):
+    scripts = [
+        user_script(args.user_id_base + number, args.tasks, args.lists)
+        for number in range(args.users)
+    ]
+    print(f"{args.users} users, {sum(map(len, scripts))} updates, {os.cpu_count()} CPUs\n")
+    print(f"{'workers':>8}{'elapsed s':>12}{'updates/s':>12}{'speedup':>10}{'processed':>12}")
+    baseline = None
+    for workers in (int(value) for value in args.workers.split(",")):
+        elapsed, forwarded, processed = await measure(workers, scripts)
+        throughput = forwarded / elapsed
+        baseline = baseline or throughput
+        print(f"{workers:>8}{elapsed:>12.2f}{throughput:>12.1f}{throughput / baseline:>10.2f}{processed:>12}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,201 @@
+import time
+import asyncio
+import itertools
+
+from pyrogram.enums import ChatType
+from pyrogram.types import Chat, User, Message, CallbackQuery, InlineQuery
+
+_update_ids = itertools.count(1)
+
+
+class ScenarioError(Exception):
+    """Бот ответил не так, как ожидает сценарий виртуального пользователя."""
+
+
+class LatencyStats:
+    """
+    Собирает время выполнения шагов сценария.
+    Атрибуты:
+        samples (dict): Список длительностей (сек) для каждого шага.
+        errors (int): Количество сценариев, прерванных ошибкой.
+    """
+    def __init__(self):
+        self.samples: dict = {}
+        self.errors = 0
+
+    def add(self, step: str, seconds: float):
+        self.samples.setdefault(step, []).append(seconds)
+
+    @staticmethod
+    def percentile(values: list, q: float) -> float:
+        """Возвращает q-й перцентиль (0-100) по методу ближайшего ранга."""
+        ordered = sorted(values)
+        index = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def total(self) -> int:
+        return sum(len(values) for values in self.samples.values())
+
+    def report(self) -> list:
+        """
+        Возвращает строки отчета по шагам.
+        Возвращает:
+            list: Кортежи (шаг, количество, p50, p95, p99, max) со временем в миллисекундах.
+        """
+        rows = []
+        for step, values in self.samples.items():
+            rows.append((
+                step,
+                len(values),
+                *(self.percentile(values, q) * 1000 for q in (50, 95, 99)),
+                max(values) * 1000,
+            ))
+        return rows
+
+
+class VirtualUser:
+    """
+    Виртуальный пользователь, проходящий полный сценарий работы с ботом:
+    регистрация, создание задач, листание списка, изменение статуса и срока, удаление задачи, выгрузка и загрузка задач.
+    Кнопки нажимаются по клавиатуре последнего ответа бота, как это делает живой пользователь.
+
+    Атрибуты:
+        client (FakeClient): Клиент, которому передаются обновления.
+        dispatcher (UpdateDispatcher): Диспетчер бота, по нему определяется конец обработки шага.
+        user_id (int): Телеграм ID пользователя.
+        tasks (int): Сколько задач создать.
+        think_time (float): Пауза между шагами (сек).
+        callbacks (CallbackCodec): Разбор callback_data кнопок бота, чтобы находить кнопки по действию.
+    """
+    def __init__(self, client, dispatcher, user_id: int, tasks: int, think_time: float = 0.0, callbacks=None):
+        self.client = client
+        self.callbacks = callbacks
+        self.dispatcher = dispatcher
+        self.user_id = user_id
+        self.tasks = tasks
+        self.think_time = think_time
+        self.user = User(id=user_id, is_bot=False, first_name=f"user{user_id}")
+        self.chat = Chat(id=user_id, type=ChatType.PRIVATE)
+
+    def message(self, text: str = None, document=None) -> Message:
+        return Message(id=next(_update_ids), chat=self.chat, from_user=self.user, text=text, document=document,
+                       client=self.client)
+
+    def callback(self, data: str) -> CallbackQuery:
+        return CallbackQuery(
+            client=self.client,
+            id=str(next(_update_ids)),
+            from_user=self.user,
+            chat_instance=str(self.user_id),
+            message=self.client.last_messages.get(self.user_id),
+            data=data,
+        )
+
+    def inline_query(self, query: str, offset: str = "") -> InlineQuery:
+        return InlineQuery(
+            client=self.client,
+            id=str(next(_update_ids)),
+            from_user=self.user,
+            query=query,
+            offset=offset,
+            chat_type=ChatType.PRIVATE,
+        )
+
+    def buttons(self, prefix: str, text: str = None) -> list:
+        """
+        Возвращает callback_data всех кнопок последнего ответа бота, чей читаемый вид
+        (`действие:значение:...`, см. CallbackData) начинается с prefix.
+        """
+        message = self.client.last_messages.get(self.user_id)
+        markup = getattr(message, "reply_markup", None)
+        found = []
+        for row in getattr(markup, "inline_keyboard", []):
+            for button in row:
+                data = button.callback_data
+                if isinstance(data, bytes):
+                    data = data.decode()
+                described = str(self.callbacks.unpack(data, self.user_id)) if self.callbacks and data else data
+                if described and described.startswith(prefix) and (text is None or button.text == text):
+                    found.append(data)
+        return found
+
+    def button(self, prefix: str, text: str = None) -> str:
+        """Находит в последнем ответе бота кнопку, чей читаемый вид callback_data начинается с prefix."""
+        found = self.buttons(prefix, text)
+        if not found:
+            message = self.client.last_messages.get(self.user_id)
+            raise ScenarioError(f"No button {prefix!r} in reply {getattr(message, 'text', None)!r}")
+        return found[0]
+
+    async def step(self, stats: LatencyStats, name: str, update):
+        """Передает обновление боту и ждет, пока диспетчер обработает все обновления пользователя."""
+        started = time.perf_counter()
+        await self.client.feed(update)
+        await self.dispatcher.wait_user(self.user_id)
+        stats.add(name, time.perf_counter() - started)
+        if self.think_time:
+            await asyncio.sleep(self.think_time)
+
+    async def run(self, stats: LatencyStats):
+        try:
+            await self.step(stats, "start", self.message("/start"))
+            await self.step(stats, "enter_name", self.message(f"User {self.user_id}"))
+            await self.step(stats, "enter_login", self.message(f"login{self.user_id}"))
+            for number in range(self.tasks):
+                await self.step(stats, "create_task", self.message("/create_task"))
+                await self.step(stats, "enter_task_name", self.message(f"Task {number}"))
+                await self.step(stats, "enter_task_description", self.message(f"Description of task {number}"))
+            await self.step(stats, "my_tasks", self.message("/my_tasks"))
+            pages = 0
+            while True:
+                try:
+                    data = self.button("my_tasks:n")
+                except ScenarioError:
+                    break
+                await self.step(stats, "next_page", self.callback(data))
+                pages += 1
+            if pages:
+                await self.step(stats, "previous_page", self.callback(self.button("my_tasks:p")))
+                # Повторный переход на уже открытую страницу, без изменений задач.
+                await self.step(stats, "next_page_again", self.callback(self.button("my_tasks:n")))
+            await self.step(stats, "search", self.message("/search task 1"))
+            try:
+                data = self.button("search:")
+            except ScenarioError:
+                data = None
+            if data:
+                await self.step(stats, "search_next_page", self.callback(data))
+            await self.step(stats, "inline_search", self.inline_query("description"))
+            await self.step(stats, "my_tasks", self.message("/my_tasks"))
+            await self.step(stats, "detail_task", self.callback(self.button("detail_task:")))
+            await self.step(stats, "choose_task_status", self.callback(self.button("choose_task_status")))
+            await self.step(stats, "change_task_status", self.callback(self.button("change_task_status:")))
+            await self.step(stats, "my_tasks", self.message("/my_tasks"))
+            await self.step(stats, "detail_task", self.callback(self.button("detail_task:")))
+            await self.step(stats, "choose_due_date", self.callback(self.button("choose_due_date")))
+            await self.step(stats, "enter_due_date", self.message("+1d"))
+            await self.step(stats, "my_tasks", self.message("/my_tasks"))
+            await self.step(stats, "detail_task", self.callback(self.button("detail_task:")))
+            await self.step(stats, "delete_task", self.callback(self.button("delete_task")))
+            await self.step(stats, "confirm_deletion", self.callback(self.button("confirm_deletion")))
+            # Пакетные операции: выбор нескольких задач, смена их статуса и удаление страницы задач.
+            await self.step(stats, "my_tasks", self.message("/my_tasks"))
+            await self.step(stats, "select_tasks", self.callback(self.button("select_tasks:")))
+            for data in self.buttons("toggle_task:")[:2]:
+                await self.step(stats, "toggle_task", self.callback(data))
+            await self.step(stats, "bulk_status", self.callback(self.button("bulk_status:DONE")))
+            await self.step(stats, "my_tasks", self.message("/my_tasks"))
+            await self.step(stats, "select_tasks", self.callback(self.button("select_tasks:")))
+            await self.step(stats, "select_page", self.callback(self.button("select_page")))
+            await self.step(stats, "bulk_delete", self.callback(self.button("bulk_delete")))
+            await self.step(stats, "confirm_bulk_delete", self.callback(self.button("confirm_bulk_delete")))
+            # Выгрузка задач в файл и загрузка этого же файла обратно.
+            await self.step(stats, "export", self.message("/export"))
+            document = getattr(self.client.last_messages.get(self.user_id), "document", None)
+            if document is None:
+                raise ScenarioError("No document in reply to /export")
+            await self.step(stats, "import", self.message("/import"))
+            await self.step(stats, "import_file", self.message(document=document))
+        except ScenarioError:
+            stats.errors += 1
+            raise
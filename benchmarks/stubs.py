@@ -0,0 +1,242 @@
+import io
+import csv
+import json
+import asyncio
+import bisect
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
+
+from models.tasks import Task, TaskSummary
+from database.databasehelper import CRUD
+
+
+class MemoryCRUD(CRUD):
+    """
+    Замена CRUD для нагрузочных тестов без PostgreSQL.
+    Повторяет интерфейс CRUD и хранит пользователей и задачи в памяти процесса.
+    Атрибуты:
+        latency (float): Искусственная задержка каждого запроса (сек), имитирует сетевой round-trip до БД.
+        queries (int): Количество выполненных запросов.
+    """
+    def __init__(self, latency: float = 0.0):
+        super().__init__(session=None)
+        self.latency = latency
+        self.queries = 0
+        self._users: dict = {}
+        self._tasks: dict = {}
+        self._user_keys: dict = {}
+        self._next_id = 1
+        self._clock = datetime.now(timezone.utc)
+
+    async def _roundtrip(self):
+        self.queries += 1
+        await asyncio.sleep(self.latency)
+
+    def _now(self) -> datetime:
+        # Время строго возрастает, чтобы порядок задач совпадал с порядком создания, как в PSQL.
+        self._clock += timedelta(microseconds=1)
+        return self._clock
+
+    def _records(self, obj) -> list:
+        return self._tasks.values() if obj is Task else self._users.values()
+
+    async def add_user(self, tg_user_id, username, login):
+        await self._roundtrip()
+        self._users[tg_user_id] = SimpleNamespace(
+            id=len(self._users) + 1, tg_user_id=tg_user_id, username=username, login=login,
+            status="Active", created_at=self._now(),
+        )
+
+    async def get_user(self, tg_user_id):
+        await self._roundtrip()
+        return self._users.get(tg_user_id)
+
+    def _insert(self, tg_user_id, name, description, status="PROG"):
+        now = self._now()
+        task = SimpleNamespace(
+            id=self._next_id, name=name, description=description, tg_user_id=tg_user_id,
+            status=status, created_at=now, last_update=now, due_at=None, remind_at=None, reminder_lease=None,
+        )
+        self._next_id += 1
+        self._tasks[task.id] = task
+        self._user_keys.setdefault(tg_user_id, []).append((task.created_at, task.id))
+
+    async def get_user_ids_after(self, after_id: int = 0, limit: int = 1000) -> list:
+        await self._roundtrip()
+        return sorted((user.id, user.tg_user_id) for user in self._users.values() if user.id > after_id)[:limit]
+
+    async def add_task(self, tg_user_id, name, description):
+        await self._roundtrip()
+        self._insert(tg_user_id, name, description)
+        await self._tasks_changed(tg_user_id)
+
+    async def get_tasks(self, tg_user_id):
+        await self._roundtrip()
+        return [self._summary(self._tasks[task_id]) for _, task_id in self._user_keys.get(tg_user_id, [])]
+
+    @staticmethod
+    def _summary(task) -> TaskSummary:
+        return TaskSummary(task.id, task.name, task.status, task.created_at, task.due_at)
+
+    async def get_task_summary(self, task_id, tg_user_id=None):
+        await self._roundtrip()
+        task = self._tasks.get(task_id)
+        if task is None or tg_user_id not in (None, task.tg_user_id):
+            return None
+        return self._summary(task)
+
+    async def get_tasks_page(self, tg_user_id, limit, cursor=None, backward=False):
+        await self._roundtrip()
+        keys = self._user_keys.get(tg_user_id, [])
+        if backward:
+            end = bisect.bisect_left(keys, cursor) if cursor else len(keys)
+            selected = keys[max(0, end - limit - 1):end]
+            has_more = len(selected) > limit
+            selected = selected[-limit:]
+        else:
+            start = bisect.bisect_right(keys, cursor) if cursor else 0
+            selected = keys[start:start + limit + 1]
+            has_more = len(selected) > limit
+            selected = selected[:limit]
+        rows = [self._tasks[task_id] for _, task_id in selected]
+        return [SimpleNamespace(id=task.id, name=task.name, created_at=task.created_at) for task in rows], has_more
+
+    async def search_tasks(self, tg_user_id, query, limit, offset=0):
+        await self._roundtrip()
+        found = []
+        for _, task_id in self._user_keys.get(tg_user_id, []):
+            task = self._tasks[task_id]
+            if query in task.name.lower():
+                found.append((1, task.created_at, task))
+            elif query in task.description.lower():
+                found.append((0, task.created_at, task))
+        # Совпадение в названии выше, затем новые задачи, как ранжирование word_similarity в PSQL.
+        found.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        page = [self._summary(task) for _, _, task in found[offset:offset + limit + 1]]
+        return page[:limit], len(page) > limit
+
+    async def update_task(self, obj, field, value, update_values: dict, tg_user_id=None):
+        await self._roundtrip()
+        updated = 0
+        for record in self._records(obj):
+            if getattr(record, field) == value:
+                if obj is Task and tg_user_id not in (None, record.tg_user_id):
+                    continue
+                for key, new_value in update_values.items():
+                    setattr(record, key, new_value)
+                updated += 1
+        if obj is Task and updated:
+            await self._tasks_changed(tg_user_id)
+        return updated > 0
+
+    async def delete_task(self, task_id, tg_user_id=None):
+        await self._roundtrip()
+        task = self._tasks.get(task_id)
+        if task is None or tg_user_id not in (None, task.tg_user_id):
+            return False
+        del self._tasks[task_id]
+        self._user_keys[task.tg_user_id].remove((task.created_at, task.id))
+        await self._tasks_changed(tg_user_id)
+        return True
+
+    async def bulk_update_tasks(self, tg_user_id, task_ids, update_values: dict):
+        await self._roundtrip()
+        updated = 0
+        for task_id in set(task_ids):
+            task = self._tasks.get(task_id)
+            if task is not None and task.tg_user_id == tg_user_id:
+                for key, new_value in update_values.items():
+                    setattr(task, key, new_value)
+                updated += 1
+        if updated:
+            await self._tasks_changed(tg_user_id)
+        return updated
+
+    async def bulk_delete_tasks(self, tg_user_id, task_ids):
+        await self._roundtrip()
+        deleted = 0
+        for task_id in set(task_ids):
+            task = self._tasks.get(task_id)
+            if task is not None and task.tg_user_id == tg_user_id:
+                del self._tasks[task_id]
+                self._user_keys[tg_user_id].remove((task.created_at, task.id))
+                deleted += 1
+        if deleted:
+            await self._tasks_changed(tg_user_id)
+        return deleted
+
+    async def export_tasks(self, tg_user_id, output, fmt: str = "csv", chunk_rows: int = 100):
+        await self._roundtrip()
+        columns = ("id", "name", "description", "status", "created_at")
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if fmt != "jsonl":
+            writer.writerow(columns)
+        keys = list(self._user_keys.get(tg_user_id, []))
+        for number, (_, task_id) in enumerate(keys, 1):
+            task = self._tasks[task_id]
+            row = [getattr(task, column) for column in columns]
+            if fmt == "jsonl":
+                row[-1] = row[-1].isoformat()
+                buffer.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n")
+            else:
+                writer.writerow(row)
+            if number % chunk_rows == 0 or number == len(keys):
+                await output(buffer.getvalue().encode())
+                buffer.seek(0)
+                buffer.truncate()
+        if not keys and buffer.tell():
+            await output(buffer.getvalue().encode())
+        return True
+
+    async def import_tasks(self, tg_user_id, batches):
+        imported = 0
+        async for batch in batches:
+            await self._roundtrip()
+            for name, description, status in batch:
+                self._insert(tg_user_id, name, description, status)
+            imported += len(batch)
+        if imported:
+            await self._tasks_changed(tg_user_id)
+        return imported
+
+    async def claim_reminders(self, horizon, lease, limit):
+        await self._roundtrip()
+        now = datetime.now(timezone.utc)
+        claimed = sorted(
+            (task for task in self._tasks.values()
+             if task.remind_at is not None and task.remind_at <= now + horizon
+             and (task.reminder_lease is None or task.reminder_lease < now)),
+            key=lambda task: task.remind_at,
+        )[:limit]
+        for task in claimed:
+            task.reminder_lease = now + lease
+        return [(task.id, task.remind_at, task.reminder_lease) for task in claimed]
+
+    async def fire_reminders(self, leases):
+        await self._roundtrip()
+        fired = []
+        for task_id, lease in leases:
+            task = self._tasks.get(task_id)
+            if task is not None and task.reminder_lease == lease:
+                task.remind_at = task.reminder_lease = None
+                fired.append(SimpleNamespace(id=task.id, tg_user_id=task.tg_user_id, name=task.name,
+                                             status=task.status, due_at=task.due_at))
+        return fired
+
+    async def release_reminders(self, leases):
+        await self._roundtrip()
+        for task_id, lease in leases:
+            task = self._tasks.get(task_id)
+            if task is not None and task.reminder_lease == lease:
+                task.reminder_lease = None
+
+    async def get_some_record(self, obj, field, value):
+        await self._roundtrip()
+        for record in self._records(obj):
+            if getattr(record, field) == value:
+                return record
+        return None
+
+    async def close(self):
+        pass
@@ -12,19 +12,120 @@ class Settings(BaseSettings):
         api_hash (str): Hash API Telegram.
         bot_token (str): Token Telegram-бота.
         redis_password (str): Пароль для Redis.
+        redis_host (str): Хост Redis.
+        redis_port (int): Порт Redis.
+        redis_db (int): Номер базы Redis.
+        redis_url (str | None): URL подключения к Redis, имеет приоритет над хостом и портом.
+        redis_max_connections (int): Размер пула соединений с Redis.
         postgres_user (str): Имя пользователя PSQL.
         postgres_password (str): Пароль для PSQL.
         postgres_db (str): Название базы данных PSQL.
         postgres_port (int): Порт для подключения к PSQL.
+        db_pool_size (int): Количество постоянных соединений в пуле.
+        db_max_overflow (int): Количество дополнительных соединений сверх db_pool_size.
+        db_pool_timeout (float): Сколько секунд ждать свободное соединение из пула.
+        db_pool_pre_ping (bool): Проверять соединение перед выдачей из пула.
+        db_statement_timeout (int): Таймаут выполнения запроса в PSQL (мс), 0 - без ограничения.
+        db_pool_stats_interval (int): Период логирования статистики пула (сек), 0 - отключено.
+        warmup_connections (int): Сколько соединений с БД и Redis открыть при запуске, 0 - без прогрева.
+        task_write_buffer (bool): Копить изменения задач и записывать их пачками (BufferedCRUD).
+        task_write_window (float): Сколько секунд копить изменения задач перед записью.
+        task_write_max_batch (int): Количество изменений задач, при котором запись начинается сразу.
+        user_cache_size (int): Максимальное количество пользователей в кэше регистрации.
+        user_cache_ttl (int): Время жизни записи в кэше регистрации (сек).
+        user_cache_shared (bool): Разделять кэш регистрации между экземплярами бота через Redis.
+        keyboard_cache_size (int): Максимальное количество страниц списка задач в кэше, 0 - кэш отключен.
+        keyboard_cache_ttl (int): Время жизни страницы списка задач в кэше (сек).
+        keyboard_cache_shared (bool): Разделять кэш страниц между экземплярами бота через Redis.
+        search_cache_size (int): Максимальное количество пользователей в кэше результатов поиска, 0 - кэш отключен.
+        search_cache_ttl (int): Время жизни результатов поиска в кэше (сек).
+        fsm_ttl (int): Время жизни состояния пользователя без активности (сек), 0 - без ограничения.
+        fsm_backend (str): Хранилище FSM: "redis" или "memory" (в памяти процесса).
+        fsm_memory_max_users (int): Максимальное количество пользователей в хранилище "memory".
+        fsm_memory_sweep_interval (int): Период очистки устаревших состояний в хранилище "memory" (сек).
+        fsm_serializer (str): Формат данных FSM: "compact", "json" или "msgpack" (нужен пакет msgpack).
+        dispatcher_max_concurrency (int): Сколько обновлений разных пользователей обрабатывается одновременно.
+        dispatcher_max_pending (int): Сколько обновлений может ждать в очередях, дальше прием новых приостанавливается.
+        sender_global_rate (float): Общий лимит исходящих сообщений бота (в секунду).
+        sender_chat_rate (float): Лимит исходящих сообщений в один чат (в секунду).
+        sender_chat_burst (float): Допустимый всплеск сообщений в один чат.
+        sender_workers (int): Количество одновременных запросов отправки.
+        sender_max_retries (int): Сколько раз повторять отправку после FloodWait.
+        reminder_poll_interval (float): Период опроса БД планировщиком напоминаний (сек), 0 - напоминания отключены.
+        reminder_lease (int): Срок, на который экземпляр бота забирает напоминания (сек).
+        reminder_batch_size (int): Сколько напоминаний забирать за один запрос.
+        admin_ids (list[int]): Телеграм ID администраторов бота (JSON-список, например [123, 456]).
+        broadcast_chunk_size (int): Сколько пользователей читать из БД за раз при рассылке, прогресс сохраняется после каждой пачки.
+        broadcast_concurrency (int): Сколько сообщений рассылки одновременно ожидают отправки.
+        bot_workers (int): Количество процессов-воркеров бота, при значении больше 1 обновления раздает супервизор.
+        navigation_edit_in_place (bool): Навигация по кнопкам редактирует сообщение с кнопкой вместо отправки нового.
+        callback_secret (str): Ключ подписи callback_data инлайн-кнопок, по умолчанию выводится из bot_token.
+        log_level (str): Уровень логирования.
+        log_json (bool): Писать логи в формате JSON.
+        log_max_bytes (int): Размер файла логов, после которого он ротируется (байт).
+        log_backup_count (int): Количество хранимых файлов логов после ротации.
+        metrics_port (int): Порт HTTP-эндпоинта /metrics в формате Prometheus, 0 - метрики отключены.
+        metrics_host (str): Адрес, на котором слушает эндпоинт метрик.
     """
     api_id: int
     api_hash: str
     bot_token: str
-    redis_password: str
+    redis_password: str = ""
     postgres_user: str
     postgres_password: str
     postgres_db: str
     postgres_port: int
+    redis_host: str = "redis"
+    redis_port: int = 6379
+    redis_db: int = 0
+    redis_url: str | None = None
+    redis_max_connections: int = 50
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30.0
+    db_pool_pre_ping: bool = True
+    db_statement_timeout: int = 15000
+    db_pool_stats_interval: int = 0
+    warmup_connections: int = 4
+    task_write_buffer: bool = False
+    task_write_window: float = 0.05
+    task_write_max_batch: int = 500
+    user_cache_size: int = 10000
+    user_cache_ttl: int = 300
+    user_cache_shared: bool = False
+    keyboard_cache_size: int = 20000
+    keyboard_cache_ttl: int = 600
+    keyboard_cache_shared: bool = False
+    search_cache_size: int = 10000
+    search_cache_ttl: int = 60
+    fsm_ttl: int = 86400
+    fsm_backend: str = "redis"
+    fsm_memory_max_users: int = 100000
+    fsm_memory_sweep_interval: int = 60
+    fsm_serializer: str = "compact"
+    dispatcher_max_concurrency: int = 64
+    dispatcher_max_pending: int = 10000
+    sender_global_rate: float = 30
+    sender_chat_rate: float = 1
+    sender_chat_burst: float = 3
+    sender_workers: int = 8
+    sender_max_retries: int = 3
+    reminder_poll_interval: float = 5.0
+    reminder_lease: int = 120
+    reminder_batch_size: int = 500
+    admin_ids: list[int] = []
+    broadcast_chunk_size: int = 500
+    broadcast_concurrency: int = 16
+    bot_workers: int = 1
+    navigation_edit_in_place: bool = True
+    callback_secret: str = ""
+    log_level: str = "INFO"
+    log_json: bool = False
+    log_max_bytes: int = 10 * 1024 * 1024
+    log_backup_count: int = 5
+    metrics_port: int = 0
+    metrics_host: str = "127.0.0.1"
+
     def get_db_url(self) -> str:
         return f"postgresql+asyncpg://{self.postgres_user}:{self.postgres_password}@db/{self.postgres_db}"
 
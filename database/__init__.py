@@ -1,23 +1,128 @@
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
 from config.config import settings
+from utils.metrics import metrics
+
+logger = logging.getLogger('test_bot')
+
+
+class PoolMetrics:
+    """
+    Статистика ожидания соединений из пула.
+    Атрибуты:
+        checkouts (int): Количество выданных соединений.
+        wait_total (float): Суммарное время ожидания соединения (сек).
+        wait_max (float): Максимальное время ожидания соединения (сек).
+    """
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def observe(self, wait: float):
+        """Учитывает время ожидания одного соединения."""
+        self.checkouts += 1
+        self.wait_total += wait
+        if wait > self.wait_max:
+            self.wait_max = wait
 
-engine = create_async_engine(settings.get_db_url(), echo=False)
-SessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 
 class Database:
     """
     Класс для управления подключением к базе данных.
+    Каждое обновление работает в собственной сессии (unit of work), которая берет соединение из пула движка.
     Атрибуты:
-        session (AsyncSession): Асинхронная сессия для взаимодействия с базой данных.
+        engine (AsyncEngine): Асинхронный движок SQLAlchemy с пулом соединений.
+        session_factory (async_sessionmaker): Фабрика асинхронных сессий.
+        metrics (PoolMetrics): Статистика ожидания соединений.
     """
     def __init__(self):
-        self.session = None
+        self.engine = None
+        self.session_factory = None
+        self.metrics = PoolMetrics()
 
     async def init(self):
-        self.session = SessionLocal()
+        server_settings = {}
+        if settings.db_statement_timeout:
+            server_settings["statement_timeout"] = str(settings.db_statement_timeout)
+        self.engine = create_async_engine(
+            settings.get_db_url(),
+            echo=False,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_pre_ping=settings.db_pool_pre_ping,
+            connect_args={"server_settings": server_settings},
+        )
+        event.listen(self.engine.sync_engine, "before_cursor_execute", self._count_roundtrip)
+        self.session_factory = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def warm_up(self, connections: int):
+        """
+        Открывает соединения пула параллельно при запуске, чтобы первые обновления не ждали подключения к БД.
+        Ошибка прогрева не останавливает запуск, она только логируется.
+        Аргументы:
+            connections (int): Сколько соединений открыть (не больше DB_POOL_SIZE).
+        """
+        connections = min(connections, settings.db_pool_size)
+        if connections <= 0:
+            return
+        opened = await asyncio.gather(
+            *(self.engine.connect().start() for _ in range(connections)),
+            return_exceptions=True,
+        )
+        for conn in opened:
+            if isinstance(conn, Exception):
+                logger.error("DB pool warm-up failed: %s", conn)
+            else:
+                await conn.close()
+
+    @staticmethod
+    def _count_roundtrip(conn, cursor, statement, parameters, context, executemany):
+        """Учитывает каждый запрос к БД в метриках текущего обновления."""
+        metrics.roundtrip("db")
+
+    @asynccontextmanager
+    async def session(self):
+        """
+        Открывает новую сессию для одной единицы работы.
+        Соединение берется из пула сразу, чтобы учесть время ожидания,
+        при ошибке транзакция откатывается, по выходу соединение возвращается в пул.
+        """
+        async with self.session_factory() as session:
+            started = time.perf_counter()
+            await session.connection()
+            self.metrics.observe(time.perf_counter() - started)
+            try:
+                yield session
+            except Exception:
+                await session.rollback()
+                raise
+
+    def pool_stats(self) -> dict:
+        """
+        Возвращает текущее состояние пула соединений.
+        Возвращает:
+            dict: Размер пула, занятые и свободные соединения, переполнение и время ожидания.
+        """
+        pool = self.engine.pool
+        checkouts = self.metrics.checkouts
+        return {
+            "size": pool.size(),
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "checkouts": checkouts,
+            "wait_avg": self.metrics.wait_total / checkouts if checkouts else 0.0,
+            "wait_max": self.metrics.wait_max,
+        }
 
     async def close(self):
-        if self.session:
-            await self.session.close()
+        if self.engine:
+            await self.engine.dispose()
@@ -1,22 +1,74 @@
 import logging
+from datetime import timedelta
 
 from sqlalchemy.future import select
-from sqlalchemy import update, delete, asc
+from sqlalchemy import update, delete, asc, desc, tuple_, literal, literal_column, func, any_, bindparam, Integer
+from sqlalchemy import or_, values, column
+from sqlalchemy.dialects.postgresql import ARRAY
 
 from models.users import User
-from models.tasks import Task
+from models.tasks import Task, TaskSummary
+from utils.metrics import metrics
 
 logger = logging.getLogger('test_bot')
 
+tasks_table = Task.__table__
+# Колонки задачи для списков и карточки, без описания.
+TASK_SUMMARY_COLUMNS = (
+    tasks_table.c.id, tasks_table.c.name, tasks_table.c.status, tasks_table.c.created_at, tasks_table.c.due_at,
+)
+# Текст поиска задачи. Выражение должно совпадать с выражением индекса "ix_Tasks_search_trgm" (миграция 6),
+# поэтому оно записано SQL-текстом без параметров.
+TASK_SEARCH_TEXT = literal_column(
+    """lower(coalesce("Tasks".name, '') || ' ' || coalesce("Tasks".description, ''))"""
+)
+
+
+def like_pattern(query: str) -> str:
+    """Экранирует спецсимволы LIKE и возвращает шаблон поиска подстроки."""
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+# Выгрузка задач командой COPY: строки идут из PostgreSQL порциями, без ORM и без загрузки всего результата.
+EXPORT_QUERY = (
+    'SELECT id, name, description, status, created_at FROM "Tasks" '
+    'WHERE tg_user_id = $1 ORDER BY created_at, id'
+)
+# JSONL: одна строка row_to_json на задачу. Формат CSV с управляющими символами вместо разделителя и кавычек
+# выводит JSON как есть: в тексте row_to_json такие символы всегда экранированы.
+EXPORT_JSONL_QUERY = f"SELECT row_to_json(t) FROM ({EXPORT_QUERY}) t"
+IMPORT_COLUMNS = ("tg_user_id", "name", "description", "status")
+
 class CRUD:
     """
     Класс для управления базовыми CRUD-операциями с базой данных.
     Атрибуты:
-        async_session: Асинхронная сессия для взаимодействия с базой данных.
+        async_session: Фабрика сессий (Database.session), каждый метод работает в отдельной единице работы.
+        task_listeners (list): Корутины-функции (tg_user_id), вызываемые после изменения задач пользователя.
     """
     def __init__(self, session):
         self.async_session = session
+        self.task_listeners: list = []
 
+    def add_task_listener(self, listener):
+        """
+        Подписывает функцию на изменения задач (создание, изменение, удаление), например для сброса кэша.
+        Аргументы:
+            listener: Корутина-функция с аргументом tg_user_id.
+        """
+        self.task_listeners.append(listener)
+
+    async def _tasks_changed(self, tg_user_id):
+        if tg_user_id is None:
+            return
+        for listener in self.task_listeners:
+            try:
+                await listener(tg_user_id)
+            except Exception as e:
+                logger.error("Task listener %s failed for user %s: %s", listener, tg_user_id, e)
+
+    @metrics.timed("crud")
     async def add_user(self, tg_user_id, username, login):
         """
         Добавляет нового пользователя в базу данных.
@@ -26,14 +78,15 @@ class CRUD:
             login (str): Логин пользователя.
         """
         user = User(tg_user_id=tg_user_id, username=username, login=login)
-        async with self.async_session as session:
+        async with self.async_session() as session:
             try:
                 session.add(user)
             except Exception as e:
-                logger.error(f"The add_user function crashed with an error: {e}")
+                logger.error("The add_user function crashed with an error: %s", e)
                 return
             await session.commit()
 
+    @metrics.timed("crud")
     async def get_user(self, tg_user_id):
         """
         Извлекает пользователя из базы данных по телеграм ID.
@@ -42,14 +95,39 @@ class CRUD:
         Возвращает:
             Объект пользователя или None, если пользователь не найден.
         """
-        async with self.async_session as session:
+        async with self.async_session() as session:
             try:
                 result = await session.execute(select(User).where(User.tg_user_id == tg_user_id))
             except Exception as e:
-                logger.error(f"The get_user function crashed with an error: {e}")
+                logger.error("The get_user function crashed with an error: %s", e)
                 return
             return result.scalars().first()
 
+    async def get_user_ids_after(self, after_id: int = 0, limit: int = 1000) -> list:
+        """
+        Читает следующую пачку Телеграм ID пользователей по возрастанию "Users".id (keyset-пагинация).
+        Каждая пачка читается отдельным коротким запросом, соединение между пачками возвращается в пул.
+        Аргументы:
+            after_id (int): "Users".id последнего прочитанного пользователя (0 - с начала).
+            limit (int): Размер пачки.
+        Возвращает:
+            list: Пары ("Users".id, Телеграм ID), пустой список - пользователи закончились.
+        """
+        statement = (
+            select(User.id, User.tg_user_id)
+            .where(User.id > after_id)
+            .order_by(User.id)
+            .limit(limit)
+        )
+        async with self.async_session() as session:
+            try:
+                result = await session.execute(statement)
+            except Exception as e:
+                logger.error("The get_user_ids_after function crashed with an error: %s", e)
+                raise
+            return [tuple(row) for row in result]
+
+    @metrics.timed("crud")
     async def add_task(self, tg_user_id, name, description):
         """
         Добавляет новую задачу в базу данных.
@@ -59,35 +137,135 @@ class CRUD:
             description (str): Описание задачи.
         """
         task = Task(tg_user_id=tg_user_id, name=name, description=description)
-        async with self.async_session as session:
+        async with self.async_session() as session:
             try:
                 session.add(task)
             except Exception as e:
-                logger.error(f"The add_task function crashed with an error: {e}")
+                logger.error("The add_task function crashed with an error: %s", e)
                 return
             await session.commit()
+        await self._tasks_changed(tg_user_id)
 
+    @metrics.timed("crud")
     async def get_tasks(self, tg_user_id):
         """
         Извлекает все задачи пользователя из базы данных, отсортированные по дате создания.
+        Запрос Core выбирает только колонки TaskSummary, без описания и без создания ORM-объектов.
         Аргументы:
             tg_user_id (int): Телеграм ID пользователя.
         Возвращает:
-            list: Список задач.
+            list[TaskSummary]: Список задач.
+        """
+        query = (
+            select(*TASK_SUMMARY_COLUMNS)
+            .where(tasks_table.c.tg_user_id == tg_user_id)
+            .order_by(asc(tasks_table.c.created_at), asc(tasks_table.c.id))
+        )
+        async with self.async_session() as session:
+            try:
+                connection = await session.connection()
+                result = await connection.execute(query)
+            except Exception as e:
+                logger.error("The get_tasks function crashed with an error: %s", e)
+                return
+            return [TaskSummary(*row) for row in result]
+
+    @metrics.timed("crud")
+    async def get_task_summary(self, task_id, tg_user_id=None):
+        """
+        Извлекает название и статус задачи для карточки задачи без загрузки ORM-объекта.
+        Аргументы:
+            task_id (int): ID задачи.
+            tg_user_id (int, optional): Владелец задачи, задачи других пользователей не возвращаются.
+        Возвращает:
+            TaskSummary или None, если задача не найдена.
         """
-        async with self.async_session as session:
+        query = select(*TASK_SUMMARY_COLUMNS).where(tasks_table.c.id == task_id)
+        if tg_user_id is not None:
+            query = query.where(tasks_table.c.tg_user_id == tg_user_id)
+        async with self.async_session() as session:
             try:
-                result = await session.execute(
-                select(Task)
-                .where(Task.tg_user_id == tg_user_id)
-                .order_by(asc(Task.created_at))
-            )
+                connection = await session.connection()
+                result = await connection.execute(query)
             except Exception as e:
-                logger.error(f"The get_tasks function crashed with an error: {e}")
+                logger.error("The get_task_summary function crashed with an error: %s", e)
                 return
-            return result.scalars().all()
+            row = result.first()
+            return TaskSummary(*row) if row else None
+
+    @metrics.timed("crud")
+    async def get_tasks_page(self, tg_user_id, limit, cursor=None, backward=False):
+        """
+        Извлекает одну страницу задач пользователя методом keyset-пагинации по (created_at, id).
+        Выбираются только id и название задачи и одна дополнительная строка,
+        чтобы понять, есть ли еще задачи в направлении выборки.
+        Аргументы:
+            tg_user_id (int): Телеграм ID пользователя.
+            limit (int): Количество задач на странице.
+            cursor (tuple, optional): Ключ (created_at, id), от которого строится страница.
+            backward (bool): Выбирать задачи перед курсором (страница назад).
+        Возвращает:
+            tuple: Список строк (id, name, created_at) в порядке создания и флаг наличия следующих строк.
+        """
+        columns = tasks_table.c
+        key = tuple_(columns.created_at, columns.id)
+        query = select(columns.id, columns.name, columns.created_at).where(columns.tg_user_id == tg_user_id)
+        if cursor:
+            bound = tuple_(literal(cursor[0], columns.created_at.type), literal(cursor[1], columns.id.type))
+            query = query.where(key < bound if backward else key > bound)
+        if backward:
+            query = query.order_by(desc(columns.created_at), desc(columns.id))
+        else:
+            query = query.order_by(asc(columns.created_at), asc(columns.id))
+        async with self.async_session() as session:
+            try:
+                connection = await session.connection()
+                result = await connection.execute(query.limit(limit + 1))
+            except Exception as e:
+                logger.error("The get_tasks_page function crashed with an error: %s", e)
+                return [], False
+            rows = result.all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if backward:
+            rows.reverse()
+        return rows, has_more
+
+    @metrics.timed("crud")
+    async def search_tasks(self, tg_user_id, query, limit, offset=0):
+        """
+        Ищет задачи пользователя по подстроке в названии и описании.
+        Условие LIKE по TASK_SEARCH_TEXT использует GIN-индекс триграмм (pg_trgm) вместе с tg_user_id,
+        результаты ранжируются по word_similarity, затем по дате создания (новые выше).
+        Аргументы:
+            tg_user_id (int): Телеграм ID пользователя.
+            query (str): Текст поиска в нижнем регистре.
+            limit (int): Количество задач на странице.
+            offset (int): Сколько найденных задач пропустить.
+        Возвращает:
+            tuple: Список TaskSummary и флаг наличия следующей страницы.
+        """
+        rank = func.word_similarity(literal(query), TASK_SEARCH_TEXT)
+        statement = (
+            select(*TASK_SUMMARY_COLUMNS)
+            .where(tasks_table.c.tg_user_id == tg_user_id)
+            .where(TASK_SEARCH_TEXT.like(literal(like_pattern(query))))
+            .order_by(desc(rank), desc(tasks_table.c.created_at), desc(tasks_table.c.id))
+            .offset(offset)
+            .limit(limit + 1)
+        )
+        async with self.async_session() as session:
+            try:
+                connection = await session.connection()
+                result = await connection.execute(statement)
+            except Exception as e:
+                logger.error("The search_tasks function crashed with an error: %s", e)
+                return [], False
+            tasks = [TaskSummary(*row) for row in result]
+        return tasks[:limit], len(tasks) > limit
 
-    async def update_task(self, obj, field, value, update_values: dict):
+    @metrics.timed("crud")
+    async def update_task(self, obj, field, value, update_values: dict, tg_user_id=None):
         """
         Обновляет объект в базе данных.
         Аргументы:
@@ -95,35 +273,267 @@ class CRUD:
             field (str): Поле, по которому выполняется поиск задачи.
             value: Значение поля для поиска.
             update_values (dict): Словарь значений для обновления.
+            tg_user_id (int, optional): Владелец задачи: задачи других пользователей не изменяются.
+                                        Нужен также буферу изменений и подписчикам task_listeners.
         Возвращает:
             bool: True, если обновление прошло успешно, иначе False.
         """
-        async with self.async_session as session:
+        statement = update(obj).where(getattr(obj, field) == value).values(**update_values)
+        if obj is Task and tg_user_id is not None:
+            statement = statement.where(Task.tg_user_id == tg_user_id)
+        async with self.async_session() as session:
             try:
-                result = await session.execute(update(obj).where(getattr(obj, field) == value).values(**update_values))
+                result = await session.execute(statement)
             except Exception as e:
-                logger.error(f"The update_task function crashed with an error: {e}")
+                logger.error("The update_task function crashed with an error: %s", e)
                 return False
             await session.commit()
-            return result.rowcount > 0
+        if obj is Task and result.rowcount:
+            await self._tasks_changed(tg_user_id)
+        return result.rowcount > 0
 
-    async def delete_task(self, task_id):
+    @metrics.timed("crud")
+    async def delete_task(self, task_id, tg_user_id=None):
         """
         Удаляет задачу из базы данных по её ID.
         Аргументы:
             task_id (int): ID задачи.
+            tg_user_id (int, optional): Владелец задачи: задачи других пользователей не удаляются.
+                                        Нужен также буферу изменений и подписчикам task_listeners.
         Возвращает:
             bool: True, если задача была успешно удалена, иначе False.
         """
-        async with self.async_session as session:
+        statement = delete(Task).where(Task.id == task_id)
+        if tg_user_id is not None:
+            statement = statement.where(Task.tg_user_id == tg_user_id)
+        async with self.async_session() as session:
             try:
-                result = await session.execute(delete(Task).where(Task.id == task_id))
+                result = await session.execute(statement)
             except Exception as e:
-                logger.error(f"The delete_task function crashed with an error: {e}")
+                logger.error("The delete_task function crashed with an error: %s", e)
                 return False
             await session.commit()
-            return result.rowcount > 0
+        if result.rowcount:
+            await self._tasks_changed(tg_user_id)
+        return result.rowcount > 0
+
+    @metrics.timed("crud")
+    async def bulk_update_tasks(self, tg_user_id, task_ids, update_values: dict):
+        """
+        Обновляет несколько задач пользователя одним запросом `UPDATE ... WHERE id = ANY(:ids) AND tg_user_id = :uid`.
+        Задачи других пользователей не изменяются, даже если их ID переданы.
+        Аргументы:
+            tg_user_id (int): Телеграм ID владельца задач.
+            task_ids (Iterable[int]): ID задач.
+            update_values (dict): Словарь значений для обновления.
+        Возвращает:
+            int: Количество обновленных задач.
+        """
+        ids = bindparam("ids", list(task_ids), type_=ARRAY(Integer))
+        statement = (
+            update(Task)
+            .where(Task.id == any_(ids))
+            .where(Task.tg_user_id == tg_user_id)
+            .values(**update_values)
+        )
+        async with self.async_session() as session:
+            try:
+                result = await session.execute(statement)
+            except Exception as e:
+                logger.error("The bulk_update_tasks function crashed with an error: %s", e)
+                return 0
+            await session.commit()
+        if result.rowcount:
+            await self._tasks_changed(tg_user_id)
+        return result.rowcount
+
+    @metrics.timed("crud")
+    async def bulk_delete_tasks(self, tg_user_id, task_ids):
+        """
+        Удаляет несколько задач пользователя одним запросом `DELETE ... WHERE id = ANY(:ids) AND tg_user_id = :uid`.
+        Аргументы:
+            tg_user_id (int): Телеграм ID владельца задач.
+            task_ids (Iterable[int]): ID задач.
+        Возвращает:
+            int: Количество удаленных задач.
+        """
+        ids = bindparam("ids", list(task_ids), type_=ARRAY(Integer))
+        statement = delete(Task).where(Task.id == any_(ids)).where(Task.tg_user_id == tg_user_id)
+        async with self.async_session() as session:
+            try:
+                result = await session.execute(statement)
+            except Exception as e:
+                logger.error("The bulk_delete_tasks function crashed with an error: %s", e)
+                return 0
+            await session.commit()
+        if result.rowcount:
+            await self._tasks_changed(tg_user_id)
+        return result.rowcount
+
+    @metrics.timed("crud")
+    async def export_tasks(self, tg_user_id, output, fmt: str = "csv"):
+        """
+        Выгружает все задачи пользователя командой `COPY (SELECT ...) TO STDOUT`.
+        Данные передаются в output порциями по мере получения, поэтому память не зависит от количества задач.
+        Аргументы:
+            tg_user_id (int): Телеграм ID пользователя.
+            output: Корутина-функция (bytes), принимающая очередную порцию выгрузки.
+            fmt (str): "csv" - CSV с заголовком, "jsonl" - одна задача JSON на строку.
+        Возвращает:
+            bool: True, если выгрузка завершена.
+        """
+        if fmt == "jsonl":
+            query, options = EXPORT_JSONL_QUERY, {"format": "csv", "delimiter": "\x02", "quote": "\x01"}
+        else:
+            query, options = EXPORT_QUERY, {"format": "csv", "header": True}
+        async with self.async_session() as session:
+            try:
+                connection = await (await session.connection()).get_raw_connection()
+                metrics.roundtrip("db")
+                await connection.driver_connection.copy_from_query(query, tg_user_id, output=output, **options)
+            except Exception as e:
+                logger.error("The export_tasks function crashed with an error: %s", e)
+                return False
+        return True
+
+    @metrics.timed("crud")
+    async def import_tasks(self, tg_user_id, batches):
+        """
+        Записывает задачи пользователя пачками: одна команда `COPY "Tasks" FROM STDIN` на пачку.
+        Все пачки записываются в одной транзакции, при ошибке не записывается ни одна задача.
+        Аргументы:
+            tg_user_id (int): Телеграм ID пользователя.
+            batches: Асинхронный итератор списков кортежей (name, description, status).
+        Возвращает:
+            int | None: Количество записанных задач, None при ошибке.
+        """
+        imported = 0
+        async with self.async_session() as session:
+            try:
+                connection = await (await session.connection()).get_raw_connection()
+                async for batch in batches:
+                    metrics.roundtrip("db")
+                    await connection.driver_connection.copy_records_to_table(
+                        Task.__tablename__,
+                        records=[(tg_user_id, *record) for record in batch],
+                        columns=IMPORT_COLUMNS,
+                    )
+                    imported += len(batch)
+                await session.commit()
+            except Exception as e:
+                logger.error("The import_tasks function crashed with an error: %s", e)
+                return None
+        if imported:
+            await self._tasks_changed(tg_user_id)
+        return imported
+
+    @metrics.timed("crud")
+    async def claim_reminders(self, horizon: timedelta, lease: timedelta, limit: int):
+        """
+        Забирает напоминания, время которых наступит в пределах horizon, включая пропущенные.
+        Забранные строки получают срок аренды reminder_lease: пока он не истек, другие экземпляры бота
+        их не забирают. Строки, заблокированные другим экземпляром, пропускаются (`FOR UPDATE SKIP LOCKED`).
+        Аргументы:
+            horizon (timedelta): Насколько вперед от текущего времени забирать напоминания.
+            lease (timedelta): Срок аренды забранных напоминаний.
+            limit (int): Максимальное количество напоминаний.
+        Возвращает:
+            list: Кортежи (id задачи, время напоминания, срок аренды) по возрастанию времени напоминания.
+        """
+        candidates = (
+            select(Task.id)
+            .where(Task.remind_at <= func.now() + horizon)
+            .where(or_(Task.reminder_lease.is_(None), Task.reminder_lease < func.now()))
+            .order_by(Task.remind_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        # Служебные изменения напоминаний не меняют last_update задачи, поэтому он передается явно.
+        statement = (
+            update(Task)
+            .where(Task.id.in_(candidates.scalar_subquery()))
+            .values(reminder_lease=func.now() + lease, last_update=Task.last_update)
+            .returning(Task.id, Task.remind_at, Task.reminder_lease)
+            .execution_options(synchronize_session=False)
+        )
+        async with self.async_session() as session:
+            try:
+                result = await session.execute(statement)
+                claimed = sorted(result.all(), key=lambda row: row.remind_at)
+            except Exception as e:
+                logger.error("The claim_reminders function crashed with an error: %s", e)
+                return []
+            await session.commit()
+        return [tuple(row) for row in claimed]
+
+    @staticmethod
+    def _leased(leases: list):
+        return values(
+            column("id", Task.id.type),
+            column("lease", Task.reminder_lease.type),
+            name="leases",
+        ).data(leases)
+
+    @metrics.timed("crud")
+    async def fire_reminders(self, leases):
+        """
+        Отмечает напоминания отправленными, если их аренда все еще принадлежит этому экземпляру бота.
+        Напоминание, которое пользователь изменил или которое забрал другой экземпляр после истечения аренды,
+        не возвращается, поэтому одно напоминание не отправляется дважды.
+        Аргументы:
+            leases (Iterable[tuple]): Пары (id задачи, срок аренды) из claim_reminders.
+        Возвращает:
+            list: Строки (id, tg_user_id, name, status, due_at) напоминаний, которые нужно отправить.
+        """
+        leases = list(leases)
+        if not leases:
+            return []
+        source = self._leased(leases)
+        statement = (
+            update(Task)
+            .where(Task.id == source.c.id)
+            .where(Task.reminder_lease == source.c.lease)
+            .values(remind_at=None, reminder_lease=None, last_update=Task.last_update)
+            .returning(Task.id, Task.tg_user_id, Task.name, Task.status, Task.due_at)
+            .execution_options(synchronize_session=False)
+        )
+        async with self.async_session() as session:
+            try:
+                result = await session.execute(statement)
+                fired = result.all()
+            except Exception as e:
+                logger.error("The fire_reminders function crashed with an error: %s", e)
+                return []
+            await session.commit()
+        return fired
+
+    @metrics.timed("crud")
+    async def release_reminders(self, leases):
+        """
+        Снимает аренду с неотправленных напоминаний при остановке бота, чтобы их сразу забрал другой экземпляр.
+        Аргументы:
+            leases (Iterable[tuple]): Пары (id задачи, срок аренды) из claim_reminders.
+        """
+        leases = list(leases)
+        if not leases:
+            return
+        source = self._leased(leases)
+        statement = (
+            update(Task)
+            .where(Task.id == source.c.id)
+            .where(Task.reminder_lease == source.c.lease)
+            .values(reminder_lease=None, last_update=Task.last_update)
+            .execution_options(synchronize_session=False)
+        )
+        async with self.async_session() as session:
+            try:
+                await session.execute(statement)
+            except Exception as e:
+                logger.error("The release_reminders function crashed with an error: %s", e)
+                return
+            await session.commit()
 
+    @metrics.timed("crud")
     async def get_some_record(self, obj, field, value):
         """
         Извлекает запись из нужной таблицы (передаваемый объект) по указанному полю и значению.
@@ -134,11 +544,13 @@ class CRUD:
         Возвращает:
             object: Найденная запись.
         """
-        async with self.async_session as session:
+        async with self.async_session() as session:
             try:
                 result = await session.execute(select(obj).where(getattr(obj, field) == value))
             except Exception as e:
-                logger.error(f"The get_some_record function crashed with an error: {e}")
+                logger.error("The get_some_record function crashed with an error: %s", e)
                 return
             return result.scalars().first()
 
+    async def close(self):
+        """Завершает работу CRUD при остановке бота (у CRUD без буфера ресурсов нет)."""
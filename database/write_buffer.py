@@ -0,0 +1,365 @@
+import asyncio
+import logging
+
+from sqlalchemy import insert, update, delete, values, column, cast, tuple_
+from sqlalchemy.exc import StatementError, DBAPIError, IntegrityError, DataError
+
+from models.tasks import Task
+from database.databasehelper import CRUD
+from utils.metrics import metrics
+
+logger = logging.getLogger('test_bot')
+
+# Ошибки, с которыми база отклоняет сами данные: повтор той же пачки снова завершится ошибкой.
+REJECTED_ERRORS = (IntegrityError, DataError)
+
+
+def rejected(error: Exception) -> bool:
+    """Проверяет, отклонила ли база сами данные, а не стала недоступной."""
+    if isinstance(error, DBAPIError):
+        return isinstance(error, REJECTED_ERRORS) and not error.connection_invalidated
+    # StatementError без ошибки драйвера - значение не удалось передать в запрос.
+    return isinstance(error, StatementError)
+
+
+class TaskWriteBuffer:
+    """
+    Буфер изменений задач (write-behind).
+    Создание, изменение и удаление задач накапливаются в течение окна window или до max_batch изменений
+    и записываются одной транзакцией: многострочный INSERT ... VALUES, UPDATE ... FROM (VALUES ...) и DELETE.
+    Несколько изменений одной задачи в окне объединяются в одно, изменения удаленной задачи отбрасываются.
+    Изменения и удаления записываются с условием на владельца задачи, как в CRUD.
+    Если база недоступна, изменения возвращаются в буфер и запись повторяется
+    с растущей паузой (не дольше max_retry_delay): пользователю об изменениях уже ответили.
+    Если база отклонила пачку (например, нарушение внешнего ключа), изменения записываются по одному,
+    чтобы одно неверное изменение не задерживало остальные. Изменение, отклоненное max_attempts раз,
+    отбрасывается с записью в лог (dead letter).
+
+    Атрибуты:
+        session: Фабрика сессий (Database.session).
+        window (float): Сколько секунд копить изменения перед записью.
+        max_batch (int): Количество изменений, при котором запись начинается, не дожидаясь окна.
+        flushed (int): Количество записанных изменений.
+        batches (int): Количество выполненных транзакций.
+        failed (int): Количество неудачных попыток записи.
+        dropped (int): Количество изменений, отброшенных после max_attempts отказов базы.
+        max_retry_delay (float): Наибольшая пауза (сек) перед повтором неудачной записи.
+        max_attempts (int): Сколько раз база может отклонить изменение, прежде чем оно будет отброшено.
+    """
+    def __init__(self, session, window: float, max_batch: int, max_retry_delay: float = 30.0,
+                 max_attempts: int = 3):
+        self.session = session
+        self.window = window
+        self.max_batch = max_batch
+        self.max_retry_delay = max_retry_delay
+        self.max_attempts = max_attempts
+        self.flushed = 0
+        self.batches = 0
+        self.failed = 0
+        self.dropped = 0
+        self._retries = 0
+        self._inserts: list = []
+        self._updates: dict = {}
+        self._deletes: set = set()
+        self._users: set = set()
+        # Количество отказов базы по изменениям: ключ - ("insert", id словаря) или (вид, (ID задачи, владелец)).
+        self._attempts: dict = {}
+        self._size = 0
+        self._timer = None
+        self._flushes: set = set()
+        self._lock = asyncio.Lock()
+
+    def add(self, tg_user_id, name, description):
+        """Ставит в очередь создание задачи."""
+        self._inserts.append({"tg_user_id": tg_user_id, "name": name, "description": description})
+        self._enqueued(tg_user_id)
+
+    def update(self, task_id: int, update_values: dict, tg_user_id: int):
+        """Ставит в очередь изменение полей задачи, объединяя его с уже ожидающими изменениями этой задачи."""
+        key = (task_id, tg_user_id)
+        if key in self._deletes:
+            return
+        self._updates.setdefault(key, {}).update(update_values)
+        self._enqueued(tg_user_id)
+
+    def delete(self, task_id: int, tg_user_id: int):
+        """Ставит в очередь удаление задачи, ожидающие изменения этой задачи отбрасываются."""
+        key = (task_id, tg_user_id)
+        self._updates.pop(key, None)
+        self._deletes.add(key)
+        self._enqueued(tg_user_id)
+
+    def _enqueued(self, tg_user_id):
+        self._size += 1
+        self._users.add(tg_user_id)
+        if self._size >= self.max_batch and not self._retries:
+            self._cancel_timer()
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._start_flush)
+
+    def _start_flush(self):
+        """Запускает запись в фоне, сохраняя ссылку на задачу до ее завершения."""
+        task = asyncio.get_running_loop().create_task(self.flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def has_pending(self, tg_user_id=None) -> bool:
+        """
+        Проверяет, есть ли незаписанные изменения, которые может увидеть чтение пользователя.
+        Аргументы:
+            tg_user_id (int, optional): Телеграм ID пользователя, None - чтение без известного пользователя.
+        """
+        if self._lock.locked():
+            # Идет запись: ее изменения еще не видны, дожидаемся ее.
+            return True
+        if not self._size:
+            return False
+        return tg_user_id is None or tg_user_id in self._users
+
+    @property
+    def retrying(self) -> bool:
+        """Запись не удалась из-за недоступности базы и ждет повтора по таймеру."""
+        return self._retries > 0
+
+    def deleted(self, task_id: int, tg_user_id: int) -> bool:
+        """Проверяет, ждет ли задача удаления в буфере."""
+        return (task_id, tg_user_id) in self._deletes
+
+    async def _write(self, inserts: list, updates: dict, deletes: set):
+        """Записывает изменения одной транзакцией."""
+        groups: dict = {}
+        for (task_id, tg_user_id), changes in updates.items():
+            groups.setdefault(tuple(sorted(changes)), []).append(
+                (task_id, tg_user_id, *(changes[key] for key in sorted(changes)))
+            )
+        async with self.session() as session:
+            if inserts:
+                await session.execute(insert(Task).values(inserts))
+            for fields, rows in groups.items():
+                source = values(
+                    column("id", Task.id.type),
+                    column("tg_user_id", Task.tg_user_id.type),
+                    *(column(field, Task.__table__.c[field].type) for field in fields),
+                    name="changes",
+                ).data(rows)
+                # Колонка VALUES, в которой во всех строках NULL, получает в PostgreSQL тип text,
+                # поэтому значения явно приводятся к типу колонки задачи.
+                await session.execute(
+                    update(Task)
+                    .where(Task.id == source.c.id)
+                    .where(Task.tg_user_id == source.c.tg_user_id)
+                    .values({field: cast(source.c[field], Task.__table__.c[field].type) for field in fields})
+                )
+            if deletes:
+                await session.execute(delete(Task).where(tuple_(Task.id, Task.tg_user_id).in_(list(deletes))))
+            await session.commit()
+
+    async def flush(self):
+        """
+        Записывает все накопленные изменения одной транзакцией.
+        Возвращает:
+            bool: True, если изменения записаны (или записывать нечего).
+        """
+        async with self._lock:
+            self._cancel_timer()
+            if not self._size:
+                return True
+            inserts, updates, deletes, size = self._inserts, self._updates, self._deletes, self._size
+            self._inserts, self._updates, self._deletes, self._size, self._users = [], {}, set(), 0, set()
+            try:
+                await self._write(inserts, updates, deletes)
+            except Exception as e:
+                self.failed += 1
+                if rejected(e):
+                    logger.warning("The database rejected %s buffered task changes, writing them one by one: %s",
+                                   size, e)
+                    return await self._write_each(inserts, updates, deletes)
+                return self._retry_later(inserts, updates, deletes, e)
+            self._written(inserts, updates, deletes, size)
+            return True
+
+    def _written(self, inserts: list, updates: dict, deletes: set, size: int):
+        self._retries = 0
+        self.flushed += size
+        self.batches += 1
+        for row in inserts:
+            self._attempts.pop(("insert", id(row)), None)
+        for key in updates:
+            self._attempts.pop(("update", key), None)
+        for key in deletes:
+            self._attempts.pop(("delete", key), None)
+
+    def _retry_later(self, inserts: list, updates: dict, deletes: set, error) -> bool:
+        """Возвращает пачку в буфер и повторяет запись после паузы: база недоступна."""
+        self._retries += 1
+        self._requeue(inserts, updates, deletes)
+        delay = min(self.window * 2 ** self._retries, self.max_retry_delay)
+        logger.error("Failed to flush %s buffered task changes, retrying in %.1f s: %s", self._size, delay, error)
+        self._timer = asyncio.get_running_loop().call_later(delay, self._start_flush)
+        return False
+
+    async def _write_each(self, inserts: list, updates: dict, deletes: set) -> bool:
+        """
+        Записывает изменения отклоненной пачки по одному, каждое в своей транзакции.
+        Отклоненные изменения возвращаются в буфер, после max_attempts отказов - отбрасываются.
+        """
+        items = [("insert", row, ([row], {}, set())) for row in inserts]
+        items += [("update", key, ([], {key: changes}, set())) for key, changes in updates.items()]
+        items += [("delete", key, ([], {}, {key})) for key in deletes]
+        pending = ([], {}, set())
+        for kind, item, change in items:
+            try:
+                await self._write(*change)
+            except Exception as e:
+                if not rejected(e):
+                    # База стала недоступна: изменение повторяется позже вместе с остальными.
+                    pending[0].extend(change[0])
+                    pending[1].update(change[1])
+                    pending[2].update(change[2])
+                    continue
+                attempt_key = (kind, id(item) if kind == "insert" else item)
+                attempts = self._attempts.get(attempt_key, 0) + 1
+                if attempts >= self.max_attempts:
+                    self._attempts.pop(attempt_key, None)
+                    self.dropped += 1
+                    logger.error("Dropping buffered task %s %s after %s rejections: %s",
+                                 kind, change[1] or change[0] or change[2], attempts, e)
+                    continue
+                self._attempts[attempt_key] = attempts
+                pending[0].extend(change[0])
+                pending[1].update(change[1])
+                pending[2].update(change[2])
+            else:
+                self._written(*change, 1)
+        if any(pending):
+            self._requeue(*pending)
+            if self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.window, self._start_flush)
+            return False
+        return True
+
+    def _requeue(self, inserts: list, updates: dict, deletes: set):
+        """Возвращает незаписанные изменения в буфер перед изменениями, поставленными во время записи."""
+        self._inserts = inserts + self._inserts
+        self._deletes |= deletes
+        for key, changes in updates.items():
+            if key not in self._deletes:
+                self._updates[key] = {**changes, **self._updates.get(key, {})}
+        for key in deletes:
+            self._updates.pop(key, None)
+        self._size += len(inserts) + len(updates) + len(deletes)
+        self._users |= {row["tg_user_id"] for row in inserts}
+        self._users |= {tg_user_id for _, tg_user_id in (*updates, *deletes)}
+
+    async def close(self):
+        """Записывает оставшиеся изменения при остановке бота."""
+        self._cancel_timer()
+        await asyncio.gather(*self._flushes, return_exceptions=True)
+        if not await self.flush():
+            self._cancel_timer()
+            logger.error("%s buffered task changes were not written before shutdown", self._size)
+
+    def stats(self) -> dict:
+        """Возвращает количество ожидающих и записанных изменений."""
+        return {
+            "pending": self._size,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "retries": self._retries,
+        }
+
+
+class BufferedCRUD(CRUD):
+    """
+    CRUD, в котором изменения задач идут через TaskWriteBuffer.
+    Перед чтением задач пользователя его незаписанные изменения сбрасываются в БД,
+    поэтому пользователь всегда видит свои изменения (read-your-writes). Пока база недоступна
+    и буфер ждет повтора записи, чтение не запускает запись заново.
+    Методы изменения проверяют одним запросом, что задача есть у владельца, и возвращают True
+    после постановки изменения в буфер, как CRUD возвращает результат записи.
+
+    Атрибуты:
+        buffer (TaskWriteBuffer): Буфер изменений задач.
+    """
+    def __init__(self, session, window: float, max_batch: int):
+        super().__init__(session)
+        self.buffer = TaskWriteBuffer(session, window, max_batch)
+
+    async def _read_your_writes(self, tg_user_id=None):
+        if self.buffer.has_pending(tg_user_id) and not self.buffer.retrying:
+            await self.buffer.flush()
+
+    async def _owned(self, task_id, tg_user_id) -> bool:
+        """Проверяет, что задача есть у владельца, без записи буфера: новые задачи еще без ID не изменяются."""
+        if self.buffer.deleted(task_id, tg_user_id):
+            return False
+        return await super().get_task_summary(task_id, tg_user_id) is not None
+
+    @metrics.timed("crud")
+    async def add_task(self, tg_user_id, name, description):
+        self.buffer.add(tg_user_id, name, description)
+        await self._tasks_changed(tg_user_id)
+
+    async def update_task(self, obj, field, value, update_values: dict, tg_user_id=None):
+        # Без владельца изменение не попадает в буфер: буфер записывает изменения с условием на владельца.
+        if obj is not Task or field != "id" or tg_user_id is None:
+            return await super().update_task(obj, field, value, update_values, tg_user_id=tg_user_id)
+        if not await self._owned(value, tg_user_id):
+            return False
+        self.buffer.update(value, update_values, tg_user_id)
+        await self._tasks_changed(tg_user_id)
+        return True
+
+    async def delete_task(self, task_id, tg_user_id=None):
+        if tg_user_id is None:
+            return await super().delete_task(task_id)
+        if not await self._owned(task_id, tg_user_id):
+            return False
+        self.buffer.delete(task_id, tg_user_id)
+        await self._tasks_changed(tg_user_id)
+        return True
+
+    async def bulk_update_tasks(self, tg_user_id, task_ids, update_values: dict):
+        # Пакетное изменение выполняется сразу одним запросом, после записи ожидающих изменений пользователя.
+        await self._read_your_writes(tg_user_id)
+        return await super().bulk_update_tasks(tg_user_id, task_ids, update_values)
+
+    async def bulk_delete_tasks(self, tg_user_id, task_ids):
+        await self._read_your_writes(tg_user_id)
+        return await super().bulk_delete_tasks(tg_user_id, task_ids)
+
+    async def export_tasks(self, tg_user_id, output, fmt: str = "csv"):
+        await self._read_your_writes(tg_user_id)
+        return await super().export_tasks(tg_user_id, output, fmt)
+
+    async def get_tasks(self, tg_user_id):
+        await self._read_your_writes(tg_user_id)
+        return await super().get_tasks(tg_user_id)
+
+    async def get_tasks_page(self, tg_user_id, limit, cursor=None, backward=False):
+        await self._read_your_writes(tg_user_id)
+        return await super().get_tasks_page(tg_user_id, limit, cursor, backward)
+
+    async def search_tasks(self, tg_user_id, query, limit, offset=0):
+        await self._read_your_writes(tg_user_id)
+        return await super().search_tasks(tg_user_id, query, limit, offset)
+
+    async def get_task_summary(self, task_id, tg_user_id=None):
+        await self._read_your_writes(tg_user_id)
+        return await super().get_task_summary(task_id, tg_user_id)
+
+    async def get_some_record(self, obj, field, value):
+        if obj is Task:
+            await self._read_your_writes(value if field == "tg_user_id" else None)
+        return await super().get_some_record(obj, field, value)
+
+    async def close(self):
+        await self.buffer.close()
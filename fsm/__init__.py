@@ -0,0 +1,48 @@
+from config.config import settings
+
+from .base import FSMContext, FSMStorage
+from .memory_storage import MemoryStorage
+from .serializers import Serializer, JSONSerializer, MsgpackSerializer, CompactSerializer, create_serializer
+
+
+def create_storage(redis_conn=None) -> FSMStorage:
+    """
+    Создает хранилище FSM, выбранное в настройках (FSM_BACKEND), с сериализатором данных FSM_SERIALIZER.
+    Аргументы:
+        redis_conn (Redis, optional): Общий клиент Redis для хранилища "redis".
+    Возвращает:
+        Экземпляр хранилища FSM.
+    """
+    serializer = create_serializer(settings.fsm_serializer)
+    if settings.fsm_backend == "memory":
+        return MemoryStorage(
+            ttl=settings.fsm_ttl,
+            max_users=settings.fsm_memory_max_users,
+            sweep_interval=settings.fsm_memory_sweep_interval,
+            serializer=serializer,
+        )
+    if settings.fsm_backend == "redis":
+        from .redis_storage import RedisStorage
+        return RedisStorage(redis_conn, ttl=settings.fsm_ttl, serializer=serializer)
+    raise ValueError(f"Unknown FSM backend: {settings.fsm_backend}")
+
+
+def create_redis():
+    """Создает клиент Redis по настройкам (см. redis_storage.create_redis)."""
+    from .redis_storage import create_redis as _create_redis
+    return _create_redis()
+
+
+def __getattr__(name):
+    # Клиент redis импортируется только когда он нужен: при FSM_BACKEND=memory без общих кэшей
+    # процесс бота запускается без него.
+    if name == "RedisStorage":
+        from .redis_storage import RedisStorage
+        return RedisStorage
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = [
+    "FSMContext", "FSMStorage", "MemoryStorage", "RedisStorage", "create_redis", "create_storage",
+    "Serializer", "JSONSerializer", "MsgpackSerializer", "CompactSerializer", "create_serializer",
+]
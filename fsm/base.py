@@ -0,0 +1,154 @@
+import abc
+
+from .serializers import Serializer, JSONSerializer
+
+class FSMContext:
+    """
+    Состояние и данные пользователя, загруженные один раз на обновление.
+    Изменения копятся в памяти и сохраняются в хранилище одним запросом через flush().
+    Данные хранятся закодированными (payload) и разбираются только при первом обращении к data,
+    а кодируются заново, только если были изменены.
+    Атрибуты:
+        storage (FSMStorage): Хранилище, из которого загружен контекст.
+        user_id (int): Телеграм ID пользователя.
+        state (str | None): Текущее состояние пользователя.
+        data (dict): Данные пользователя.
+    """
+    def __init__(self, storage: "FSMStorage", user_id, state, data: dict | None = None, raw: bytes = b""):
+        self.storage = storage
+        self.user_id = user_id
+        self.state = state
+        self._data = data
+        self._raw = raw if data is None else None
+        self._dirty = set()
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            self._data = self.storage.serializer.loads(self._raw) if self._raw else {}
+        return self._data
+
+    def payload(self) -> bytes:
+        """Данные пользователя, закодированные сериализатором хранилища; для пустых данных - пустая строка байт."""
+        if self._raw is None:
+            self._raw = self.storage.serializer.dumps(self._data) if self._data else b""
+        return self._raw
+
+    def set_state(self, state):
+        """Установить состояние для пользователя"""
+        self.state = state
+        self._dirty.add("state")
+
+    def set_data(self, data: dict):
+        """
+        Сохранить данные для пользователя.
+        Данные, равные текущим, ничего не меняют и не записываются. Если текущие данные еще не разобраны,
+        новые кодируются сразу и сравниваются с загруженными байтами, поэтому разбор не нужен,
+        а при сохранении используются уже закодированные данные.
+        Словарь, измененный на месте (тот же объект), всегда записывается.
+        """
+        if data is self._data:
+            self._raw = None
+        elif self._data is not None:
+            if data == self._data:
+                return
+            self._raw = None
+        else:
+            raw = self.storage.serializer.dumps(data) if data else b""
+            if raw == self._raw:
+                return
+            self._raw = raw
+        self._data = data
+        self._dirty.add("data")
+
+    def clear(self):
+        """Очистить состояние и данные пользователя"""
+        if self.state is not None:
+            self.state = None
+            self._dirty.add("state")
+        if self._data or (self._data is None and self._raw):
+            self._dirty.add("data")
+        self._data = {}
+        self._raw = b""
+
+    async def flush(self):
+        """Записать накопленные изменения в хранилище"""
+        if self._dirty:
+            await self.storage.save(self, self._dirty)
+            self._dirty = set()
+
+
+class FSMStorage(abc.ABC):
+    """
+    Базовый класс хранилища состояний и данных пользователей.
+    Конкретные хранилища (Redis, память процесса) реализуют чтение и запись,
+    а загрузка контекста на обновление общая для всех.
+    Данные пользователя хранятся в виде байтов, закодированных serializer.
+
+    Атрибуты:
+        serializer (Serializer): Сериализатор данных пользователя.
+    """
+    serializer: Serializer = JSONSerializer()
+
+    @abc.abstractmethod
+    async def set_state(self, user_id, state):
+        """Установить состояние для пользователя"""
+
+    @abc.abstractmethod
+    async def get_state(self, user_id):
+        """Получить текущее состояние пользователя"""
+
+    @abc.abstractmethod
+    async def set_data(self, user_id, data):
+        """Сохранить данные для пользователя"""
+
+    @abc.abstractmethod
+    async def get_data(self, user_id):
+        """Получить данные пользователя"""
+
+    @abc.abstractmethod
+    async def update_data(self, user_id, changes) -> dict:
+        """
+        Атомарно обновить данные пользователя.
+        Аргументы:
+            changes (dict | callable): Словарь для слияния с данными или функция, возвращающая новые данные.
+        Возвращает:
+            dict: Данные пользователя после обновления.
+        """
+
+    @abc.abstractmethod
+    async def clear_state(self, user_id):
+        """Очистить состояние и данные пользователя"""
+
+    @abc.abstractmethod
+    async def load(self, user_id) -> FSMContext:
+        """Загрузить состояние и данные пользователя за один запрос"""
+
+    @abc.abstractmethod
+    async def save(self, context: FSMContext, fields):
+        """Сохранить измененные поля контекста за один запрос"""
+
+    async def context(self, update) -> FSMContext:
+        """
+        Вернуть контекст FSM для обновления (Message или CallbackQuery).
+        Контекст загружается при первом обращении и прикрепляется к обновлению,
+        чтобы фильтр и обработчики переиспользовали его без повторных запросов.
+        """
+        context = getattr(update, "fsm_context", None)
+        if context is None:
+            context = await self.load(update.from_user.id)
+            update.fsm_context = context
+        return context
+
+    def reset(self, update):
+        """Сбросить контекст обновления, чтобы при следующем обращении он был загружен заново"""
+        update.fsm_context = None
+
+    async def flush(self, update):
+        """Сохранить изменения контекста обновления, если он загружался"""
+        context = getattr(update, "fsm_context", None)
+        if context is not None:
+            await context.flush()
+
+    async def close(self):
+        """Освободить ресурсы хранилища"""
@@ -0,0 +1,127 @@
+import time
+from collections import OrderedDict
+
+from .base import FSMContext, FSMStorage
+from .serializers import Serializer, CompactSerializer
+
+
+class MemoryStorage(FSMStorage):
+    """
+    Хранилище состояний и данных пользователей в памяти процесса, без сетевых запросов.
+    Подходит для развертывания в одном экземпляре и для нагрузочных тестов.
+    Число пользователей ограничено (вытесняются давно неактивные), устаревшие записи
+    удаляются при обращении и периодической очисткой во время записи.
+    Любое обращение к записи (чтение или запись) продлевает ее время жизни.
+    Данные пользователя хранятся закодированными serializer: это меньше памяти на пользователя,
+    чем словари, и изменения данных контекста после записи не попадают в хранилище.
+
+    Атрибуты:
+        ttl (int): Время жизни записи пользователя без активности (сек), 0 - без ограничения.
+        max_users (int): Максимальное количество пользователей в хранилище.
+        sweep_interval (int): Период очистки устаревших записей (сек).
+        serializer (Serializer): Сериализатор данных пользователя.
+    """
+    def __init__(self, ttl: int = 0, max_users: int = 100000, sweep_interval: int = 60,
+                 serializer: Serializer = None) -> None:
+        self.ttl = ttl
+        self.max_users = max_users
+        self.sweep_interval = sweep_interval
+        self.serializer = serializer or CompactSerializer()
+        self._records: OrderedDict = OrderedDict()
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def _get(self, user_id) -> dict | None:
+        """
+        Вернуть запись пользователя, если она есть и не устарела.
+        Чтение, как и в RedisStorage.load, продлевает время жизни записи и переносит ее
+        в конец очереди вытеснения: активный пользователь не теряет сценарий между записями.
+        """
+        record = self._records.get(user_id)
+        if record is None:
+            return None
+        if self.ttl:
+            now = time.monotonic()
+            if record["expires_at"] <= now:
+                del self._records[user_id]
+                return None
+            record["expires_at"] = now + self.ttl
+        self._records.move_to_end(user_id)
+        return record
+
+    def _put(self, user_id, **fields):
+        """Обновить поля записи пользователя и продлить ее время жизни"""
+        now = time.monotonic()
+        record = self._get(user_id) or {"state": None, "data": b""}
+        record.update(fields)
+        if record["state"] is None and not record["data"]:
+            self._records.pop(user_id, None)
+            return
+        record["expires_at"] = now + self.ttl if self.ttl else float("inf")
+        self._records[user_id] = record
+        self._records.move_to_end(user_id)
+        while len(self._records) > self.max_users:
+            self._records.popitem(last=False)
+        if self.ttl and now >= self._next_sweep:
+            self._sweep(now)
+
+    def _sweep(self, now: float):
+        """Удалить все устаревшие записи"""
+        expired = [user_id for user_id, record in self._records.items() if record["expires_at"] <= now]
+        for user_id in expired:
+            del self._records[user_id]
+        self._next_sweep = now + self.sweep_interval
+
+    async def set_state(self, user_id, state):
+        """Установить состояние для пользователя"""
+        self._put(user_id, state=state)
+
+    async def get_state(self, user_id):
+        """Получить текущее состояние пользователя"""
+        record = self._get(user_id)
+        return record["state"] if record else None
+
+    async def set_data(self, user_id, data):
+        """Сохранить данные для пользователя"""
+        self._put(user_id, data=self.serializer.dumps(data) if data else b"")
+
+    async def get_data(self, user_id):
+        """Получить данные пользователя"""
+        record = self._get(user_id)
+        return self.serializer.loads(record["data"]) if record else {}
+
+    async def update_data(self, user_id, changes) -> dict:
+        """
+        Обновить данные пользователя.
+        Операция атомарна, так как выполняется без точек переключения event loop.
+        """
+        data = await self.get_data(user_id)
+        if callable(changes):
+            data = changes(data)
+        else:
+            data.update(changes)
+        await self.set_data(user_id, data)
+        return data
+
+    async def clear_state(self, user_id):
+        """Очистить состояние и данные пользователя"""
+        self._records.pop(user_id, None)
+
+    async def load(self, user_id) -> FSMContext:
+        """Загрузить состояние и данные пользователя"""
+        record = self._get(user_id)
+        if record is None:
+            return FSMContext(self, user_id, None)
+        return FSMContext(self, user_id, record["state"], raw=record["data"])
+
+    async def save(self, context: FSMContext, fields):
+        """Сохранить измененные поля контекста"""
+        values = {}
+        if "state" in fields:
+            values["state"] = context.state
+        if "data" in fields:
+            values["data"] = context.payload()
+        self._put(context.user_id, **values)
+
+    async def close(self):
+        """Очистить хранилище"""
+        self._records.clear()
@@ -0,0 +1,214 @@
+import logging
+
+from redis.asyncio import Redis, ConnectionPool
+from redis.exceptions import WatchError
+
+from config.config import settings
+from utils.metrics import metrics
+from .base import FSMContext, FSMStorage
+from .serializers import Serializer, CompactSerializer
+
+logger = logging.getLogger('test_bot')
+
+
+def create_redis(decode_responses: bool = True) -> Redis:
+    """
+    Создает клиент Redis с пулом соединений по настройкам приложения.
+    Если задан REDIS_URL, используется он, иначе хост, порт и база из настроек.
+    Аргументы:
+        decode_responses (bool): Возвращать строки вместо байтов.
+    Возвращает:
+        Экземпляр асинхронного клиента Redis.
+    """
+    if settings.redis_url:
+        pool = ConnectionPool.from_url(
+            settings.redis_url,
+            max_connections=settings.redis_max_connections,
+            decode_responses=decode_responses,
+        )
+    else:
+        pool = ConnectionPool(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            password=settings.redis_password,
+            db=settings.redis_db,
+            max_connections=settings.redis_max_connections,
+            decode_responses=decode_responses,
+        )
+    return Redis(connection_pool=pool)
+
+
+def binary_redis(redis_conn: Redis) -> Redis:
+    """
+    Создает клиент Redis к тому же серверу, что и redis_conn, но без декодирования ответов:
+    данные FSM хранятся в двоичном виде. У клиента свой пул соединений того же размера.
+    """
+    pool = redis_conn.connection_pool
+    kwargs = {**pool.connection_kwargs, "decode_responses": False}
+    return Redis(connection_pool=ConnectionPool(
+        connection_class=pool.connection_class,
+        max_connections=pool.max_connections,
+        **kwargs,
+    ))
+
+
+class RedisStorage(FSMStorage):
+    """
+    Хранилище состояний и данных пользователей в Redis.
+    Состояние и данные пользователя хранятся в одном хэше `user:{id}` с полями `state` и `data`.
+    Каждая запись продлевает время жизни ключа, поэтому брошенные сценарии удаляются из Redis сами.
+    Поле `data` хранит байты serializer, поэтому хранилище работает через клиент без декодирования ответов.
+    Неизмененные данные при сохранении контекста не кодируются и не отправляются в Redis.
+
+    Атрибуты:
+        redis_conn (Redis): Асинхронное соединение с Redis без декодирования ответов.
+        ttl (int): Время жизни ключа пользователя без активности (сек), 0 - без ограничения.
+        serializer (Serializer): Сериализатор данных пользователя.
+    """
+    def __init__(self, redis_conn: Redis = None, ttl: int = 0, serializer: Serializer = None) -> None:
+        self.redis_conn = binary_redis(redis_conn) if redis_conn else create_redis(decode_responses=False)
+        self.ttl = ttl
+        self.serializer = serializer or CompactSerializer()
+
+    @staticmethod
+    def _key(user_id) -> str:
+        return f"user:{user_id}"
+
+    def _touch(self, pipe, key):
+        """Добавить в пайплайн продление времени жизни ключа"""
+        if self.ttl:
+            pipe.expire(key, self.ttl)
+
+    async def set_state(self, user_id, state):
+        """Установить состояние для пользователя"""
+        key = self._key(user_id)
+        try:
+            async with self.redis_conn.pipeline() as pipe:
+                pipe.hset(key, "state", state)
+                self._touch(pipe, key)
+                metrics.roundtrip("redis")
+                await pipe.execute()
+        except Exception as e:
+            logger.error('An error occurred in the set_state function when working with redis - %s.', e)
+
+    async def get_state(self, user_id):
+        """Получить текущее состояние пользователя"""
+        try:
+            metrics.roundtrip("redis")
+            state = await self.redis_conn.hget(self._key(user_id), "state")
+            return state.decode() if state is not None else None
+        except Exception as e:
+            logger.error('An error occurred in the get_state function when working with redis - %s.', e)
+
+    async def set_data(self, user_id, data):
+        """Сохранить данные для пользователя"""
+        key = self._key(user_id)
+        try:
+            async with self.redis_conn.pipeline() as pipe:
+                if data:
+                    pipe.hset(key, "data", self.serializer.dumps(data))
+                else:
+                    pipe.hdel(key, "data")
+                self._touch(pipe, key)
+                metrics.roundtrip("redis")
+                await pipe.execute()
+        except Exception as e:
+            logger.error('An error occurred in the set_data function when working with redis - %s.', e)
+
+    async def get_data(self, user_id):
+        """Получить данные пользователя"""
+        data = None
+        try:
+            metrics.roundtrip("redis")
+            data = await self.redis_conn.hget(self._key(user_id), "data")
+        except Exception as e:
+            logger.error('An error occurred in the get_data function when working with redis - %s.', e)
+        return self.serializer.loads(data) if data else {}
+
+    async def update_data(self, user_id, changes) -> dict:
+        """
+        Атомарно обновить данные пользователя (WATCH/MULTI).
+        Если ключ изменился между чтением и записью, обновление повторяется.
+        Аргументы:
+            changes (dict | callable): Словарь для слияния с данными или функция, возвращающая новые данные.
+        Возвращает:
+            dict: Данные пользователя после обновления.
+        """
+        key = self._key(user_id)
+        try:
+            async with self.redis_conn.pipeline() as pipe:
+                while True:
+                    try:
+                        metrics.roundtrip("redis")
+                        await pipe.watch(key)
+                        metrics.roundtrip("redis")
+                        raw = await pipe.hget(key, "data")
+                        data = self.serializer.loads(raw) if raw else {}
+                        if callable(changes):
+                            data = changes(data)
+                        else:
+                            data.update(changes)
+                        pipe.multi()
+                        pipe.hset(key, "data", self.serializer.dumps(data))
+                        self._touch(pipe, key)
+                        metrics.roundtrip("redis")
+                        await pipe.execute()
+                        return data
+                    except WatchError:
+                        continue
+        except Exception as e:
+            logger.error('An error occurred in the update_data function when working with redis - %s.', e)
+        return {}
+
+    async def clear_state(self, user_id):
+        """Очистить состояние и данные пользователя"""
+        try:
+            metrics.roundtrip("redis")
+            await self.redis_conn.delete(self._key(user_id))
+        except Exception as e:
+            logger.error('An error occurred in the clear_state function when working with redis - %s.', e)
+
+    async def load(self, user_id) -> FSMContext:
+        """Загрузить состояние и данные пользователя за один запрос"""
+        state, data = None, None
+        key = self._key(user_id)
+        try:
+            async with self.redis_conn.pipeline(transaction=False) as pipe:
+                pipe.hmget(key, "state", "data")
+                self._touch(pipe, key)
+                metrics.roundtrip("redis")
+                (state, data), *_ = await pipe.execute()
+        except Exception as e:
+            logger.error('An error occurred in the load function when working with redis - %s.', e)
+        return FSMContext(self, user_id, state.decode() if state is not None else None, raw=data or b"")
+
+    async def save(self, context: FSMContext, fields):
+        """Сохранить измененные поля контекста за один запрос"""
+        key = self._key(context.user_id)
+        values = {}
+        if "state" in fields and context.state is not None:
+            values["state"] = context.state
+        if "data" in fields:
+            payload = context.payload()
+            if payload:
+                values["data"] = payload
+        removed = [field for field in fields if field not in values]
+        try:
+            async with self.redis_conn.pipeline() as pipe:
+                if context.state is None and not context.payload():
+                    pipe.delete(key)
+                else:
+                    if values:
+                        pipe.hset(key, mapping=values)
+                    if removed:
+                        pipe.hdel(key, *removed)
+                    self._touch(pipe, key)
+                metrics.roundtrip("redis")
+                await pipe.execute()
+        except Exception as e:
+            logger.error('An error occurred in the save function when working with redis - %s.', e)
+
+    async def close(self):
+        """Закрыть соединение хранилища"""
+        if self.redis_conn:
+            await self.redis_conn.close()
@@ -0,0 +1,243 @@
+import abc
+import json
+import struct
+
+# Первый байт закодированных данных определяет формат, поэтому данные, записанные любым сериализатором
+# (и данные в JSON до появления сериализаторов), читаются при любой настройке FSM_SERIALIZER.
+COMPACT_VERSION = 1
+JSON_PREFIX = b"{"
+MSGPACK_PREFIXES = frozenset(range(0x80, 0x90)) | {0xde, 0xdf}
+
+# Теги значений формата compact.
+NONE, FALSE, TRUE, INT, FLOAT, STR, LIST, DICT, BYTES = range(9)
+INTERNED = 0x40
+SMALL_INT = 0x80
+
+# Частые ключи и значения данных FSM кодируются одним байтом.
+# Таблица относится к версии формата: добавлять строки можно только в конец, менять порядок - только с новой версией.
+INTERNED_STRINGS = (
+    "data", "task_id", "task_status", "task_name", "task_due", "field",
+    "selected", "selection_page", "search", "username", "name", "description",
+    "PROG", "DONE", "CANC", "0",
+)
+INTERNED_INDEX = {value: index for index, value in enumerate(INTERNED_STRINGS)}
+
+_float = struct.Struct("<d")
+
+
+class SerializerError(ValueError):
+    """Данные FSM не удалось закодировать или разобрать."""
+
+
+class Serializer(abc.ABC):
+    """
+    Базовый класс сериализатора: кодирует данные пользователя FSM (dict) в байты для хранилища.
+    Чтение общее для всех сериализаторов: формат определяется по первому байту,
+    поэтому смена FSM_SERIALIZER не требует миграции уже сохраненных данных.
+    """
+    name = ""
+
+    @abc.abstractmethod
+    def dumps(self, data: dict) -> bytes:
+        """Закодировать данные пользователя в байты"""
+
+    def loads(self, raw: bytes) -> dict:
+        """
+        Разбирает данные в любом поддерживаемом формате.
+        Аргументы:
+            raw (bytes | str): Закодированные данные.
+        Возвращает:
+            dict: Данные пользователя.
+        """
+        if isinstance(raw, str):
+            raw = raw.encode()
+        if not raw:
+            return {}
+        if raw[0] == COMPACT_VERSION:
+            return CompactSerializer.decode(raw)
+        if raw[:1] == JSON_PREFIX:
+            return json.loads(raw.decode())
+        if raw[0] in MSGPACK_PREFIXES:
+            return MsgpackSerializer.decode(raw)
+        raise SerializerError(f"Unknown FSM data format: 0x{raw[0]:02x}")
+
+
+class JSONSerializer(Serializer):
+    """JSON без пробелов в UTF-8, формат данных до появления сериализаторов."""
+    name = "json"
+
+    def __init__(self):
+        self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def dumps(self, data: dict) -> bytes:
+        return self._encoder.encode(data).encode()
+
+
+class MsgpackSerializer(Serializer):
+    """MessagePack, требует пакет msgpack (pip install msgpack)."""
+    name = "msgpack"
+
+    def __init__(self):
+        try:
+            import msgpack
+        except ImportError:
+            raise ImportError("FSM_SERIALIZER=msgpack requires the msgpack package: pip install msgpack") from None
+        self._packer = msgpack.Packer(use_bin_type=True)
+
+    def dumps(self, data: dict) -> bytes:
+        return self._packer.pack(data)
+
+    @staticmethod
+    def decode(raw: bytes) -> dict:
+        try:
+            import msgpack
+        except ImportError:
+            raise SerializerError("FSM data is encoded with msgpack, but the msgpack package is not installed") from None
+        return msgpack.unpackb(raw, raw=False)
+
+
+class CompactSerializer(Serializer):
+    """
+    Компактный двоичный формат без внешних зависимостей.
+    Первый байт - версия формата, далее значение с однобайтовым тегом: целые числа - zigzag varint
+    (0..127 - в самом теге), строки и байты - длина varint и содержимое, частые ключи и значения
+    из INTERNED_STRINGS - один байт, списки и словари - количество элементов varint и элементы.
+    """
+    name = "compact"
+
+    def dumps(self, data: dict) -> bytes:
+        out = bytearray((COMPACT_VERSION,))
+        _encode(out, data)
+        return bytes(out)
+
+    @staticmethod
+    def decode(raw: bytes) -> dict:
+        try:
+            value, position = _decode(raw, 1)
+        except (IndexError, TypeError, UnicodeDecodeError, struct.error) as e:
+            raise SerializerError(f"Corrupted FSM data: {e}") from None
+        if position != len(raw):
+            raise SerializerError("Corrupted FSM data: length mismatch")
+        return value
+
+
+def _varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _encode(out: bytearray, value):
+    # Проверки типов упорядочены по частоте в данных FSM: строки, целые, словари.
+    kind = type(value)
+    if kind is str:
+        index = INTERNED_INDEX.get(value)
+        if index is not None:
+            out.append(INTERNED | index)
+            return
+        encoded = value.encode()
+        out.append(STR)
+        _varint(out, len(encoded))
+        out += encoded
+    elif kind is int:
+        if 0 <= value < 0x80:
+            out.append(SMALL_INT | value)
+        else:
+            out.append(INT)
+            _varint(out, value << 1 if value >= 0 else (-value << 1) - 1)
+    elif kind is dict:
+        out.append(DICT)
+        _varint(out, len(value))
+        for key, item in value.items():
+            _encode(out, key)
+            _encode(out, item)
+    elif kind is bool:
+        out.append(TRUE if value else FALSE)
+    elif value is None:
+        out.append(NONE)
+    elif kind is list or kind is tuple:
+        out.append(LIST)
+        _varint(out, len(value))
+        for item in value:
+            _encode(out, item)
+    elif kind is float:
+        out.append(FLOAT)
+        out += _float.pack(value)
+    elif kind is bytes or kind is bytearray:
+        out.append(BYTES)
+        _varint(out, len(value))
+        out += value
+    elif isinstance(value, str):
+        # Подклассы (например, строковые Enum) кодируются как базовый тип, как в json.
+        _encode(out, str.__str__(value))
+    elif isinstance(value, (int, float, dict, list, tuple, bytes)):
+        _encode(out, next(base(value) for base in (int, float, dict, list, bytes) if isinstance(value, base)))
+    else:
+        raise SerializerError(f"Object of type {kind.__name__} is not supported in FSM data")
+
+
+def _decode(raw: bytes, position: int):
+    tag = raw[position]
+    position += 1
+    if tag >= SMALL_INT:
+        return tag & 0x7f, position
+    if tag >= INTERNED:
+        return INTERNED_STRINGS[tag & 0x3f], position
+    if tag <= TRUE:
+        return (None, False, True)[tag], position
+    if tag == FLOAT:
+        return _float.unpack_from(raw, position)[0], position + _float.size
+    value = raw[position]
+    position += 1
+    if value >= 0x80:
+        value, shift = value & 0x7f, 7
+        while True:
+            byte = raw[position]
+            position += 1
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+    if tag == STR:
+        end = position + value
+        return raw[position:end].decode(), end
+    if tag == DICT:
+        items = {}
+        for _ in range(value):
+            key, position = _decode(raw, position)
+            items[key], position = _decode(raw, position)
+        return items, position
+    if tag == INT:
+        return (value >> 1) ^ -(value & 1), position
+    if tag == LIST:
+        items = []
+        for _ in range(value):
+            item, position = _decode(raw, position)
+            items.append(item)
+        return items, position
+    if tag == BYTES:
+        end = position + value
+        return bytes(raw[position:end]), end
+    raise SerializerError(f"Corrupted FSM data: unknown tag 0x{tag:02x}")
+
+
+SERIALIZERS = {
+    "json": JSONSerializer,
+    "msgpack": MsgpackSerializer,
+    "compact": CompactSerializer,
+}
+
+
+def create_serializer(name: str) -> Serializer:
+    """
+    Создает сериализатор данных FSM по имени из настроек (FSM_SERIALIZER).
+    Аргументы:
+        name (str): "compact", "json" или "msgpack".
+    Возвращает:
+        Экземпляр сериализатора.
+    """
+    serializer = SERIALIZERS.get(name)
+    if serializer is None:
+        raise ValueError(f"Unknown FSM serializer: {name}")
+    return serializer()
@@ -0,0 +1,75 @@
+import logging
+
+from pyrogram import Client, filters
+from pyrogram.types import Message
+from pyrogram.handlers import MessageHandler
+
+from utils.decorators import error_handler
+from utils.dispatcher import UpdateDispatcher
+from utils.sender import MessageSender
+
+logger = logging.getLogger('test_bot')
+
+
+class AdminHandler:
+    """
+    Команды администраторов бота. Команды доступны только пользователям из ADMIN_IDS,
+    сообщения остальных пользователей эти обработчики не получают.
+
+    Атрибуты:
+        app (Client): Клиент Pyrogram для взаимодействия с телеграм API.
+        dispatcher (UpdateDispatcher): Диспетчер, упорядочивающий обновления каждого пользователя.
+        sender (MessageSender): Очередь исходящих сообщений с ограничением частоты.
+        broadcaster (Broadcaster): Рассылка сообщений всем пользователям.
+        admin_ids (list): Телеграм ID администраторов.
+    Шаблонные аргументы в методах:
+        client (Client): Клиент Pyrogram.
+        message (Message): Сообщение администратора.
+    """
+    def __init__(self, app: Client, dispatcher: UpdateDispatcher, sender: MessageSender, broadcaster,
+                 admin_ids: list):
+        self.app = app
+        self.dispatcher = dispatcher
+        self.sender = sender
+        self.broadcaster = broadcaster
+        self.admin_ids = admin_ids
+
+    def register(self):
+        """Регистрирует обработчик команды рассылки."""
+        self.app.add_handler(MessageHandler(self.dispatcher.wrap(self.broadcast_handler),
+                                            filters.command("broadcast") & filters.user(self.admin_ids)))
+
+    @error_handler
+    async def broadcast_handler(self, client: Client, message: Message):
+        """
+        Управляет рассылкой всем пользователям:
+        `/broadcast <текст>` - начать рассылку, `/broadcast status` - прогресс,
+        `/broadcast cancel` - остановить, `/broadcast resume` - продолжить прерванную рассылку.
+        """
+        parts = (message.text or "").split(maxsplit=1)
+        argument = parts[1].strip() if len(parts) > 1 else ""
+        if not argument:
+            await self.sender.reply(message, "Usage: /broadcast <text> | status | cancel | resume")
+            return
+        action = argument.lower()
+        if action == "status":
+            progress = await self.broadcaster.load()
+            if progress is None:
+                await self.sender.reply(message, "No broadcast in progress.")
+            else:
+                await self.sender.reply(message, f"Broadcast {progress.broadcast_id}: {progress.report()}")
+        elif action == "cancel":
+            if await self.broadcaster.cancel():
+                await self.sender.reply(message, "The broadcast will stop after the current batch.")
+            else:
+                await self.sender.reply(message, "No broadcast in progress.")
+        elif action == "resume":
+            if await self.broadcaster.resume():
+                await self.sender.reply(message, "Broadcast resumed.")
+            else:
+                await self.sender.reply(message, "There is no interrupted broadcast or it is already running.")
+        elif await self.broadcaster.start(message.from_user.id, argument):
+            await self.sender.reply(message, "Broadcast started. You will get a report when it is finished.")
+            logger.info("Admin %s has started a broadcast", message.from_user.id)
+        else:
+            await self.sender.reply(message, "Another broadcast is in progress. Check /broadcast status.")
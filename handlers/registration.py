@@ -4,13 +4,16 @@ from pyrogram import Client, filters
 from pyrogram.types import Message, BotCommand
 from pyrogram.handlers import MessageHandler
 
-from states.state_filter import state_filter
+from states.state_filter import StateRouter
 from states.registration import RegistrationState
-from utils.decorators import error_handler
+from utils.decorators import error_handler, flush_fsm
+from utils.cache import UserCache
+from utils.dispatcher import UpdateDispatcher
+from utils.sender import MessageSender
+from utils.metrics import metrics
 
 from fsm import FSMStorage
 from models.users import User
-from database import Database
 from database.databasehelper import CRUD
 
 logger = logging.getLogger('test_bot')
@@ -20,9 +23,12 @@ class RegistrationHandler:
     Класс для обработки регистрации пользователей через Telegram-бота.
     Атрибуты:
         app (Client): Клиент Pyrogram для взаимодействия с телеграм API.
-        db (Database): Экземпляр базы данных.
         __session (CRUD): Вспомогательный объект для операций с базой данных.
         storage (FSMStorage): Хранилище состояний FSM.
+        user_cache (UserCache): Кэш зарегистрированных пользователей.
+        dispatcher (UpdateDispatcher): Диспетчер, упорядочивающий обновления каждого пользователя.
+        sender (MessageSender): Очередь исходящих сообщений с ограничением частоты.
+        state_router (StateRouter): Выбор обработчика сообщения по состоянию FSM в очереди пользователя.
         message_handler (dict): Словарь обработчиков для сообщений на разных этапах регистрации.
     Шаблонные аргументы в методах:
         client (Client): Клиент Pyrogram.
@@ -30,11 +36,15 @@ class RegistrationHandler:
     """
     __stages = [value for key, value in vars(RegistrationState).items() if not key.startswith("__")]
 
-    def __init__(self, app: Client, db: Database, storage: FSMStorage):
+    def __init__(self, app: Client, crud: CRUD, storage: FSMStorage, user_cache: UserCache,
+                 dispatcher: UpdateDispatcher, sender: MessageSender, state_router: StateRouter):
         self.app = app
-        self.db = db
-        self.__session = CRUD(db.session)
+        self.__session = crud
         self.storage = storage
+        self.user_cache = user_cache
+        self.dispatcher = dispatcher
+        self.sender = sender
+        self.state_router = state_router
         self.message_handler: dict = {
             "waiting_for_username": self.get_username,
             "waiting_for_login": self.get_user_login,
@@ -47,6 +57,9 @@ class RegistrationHandler:
         commands = [
             BotCommand("create_task", "Create a new task"),
             BotCommand("my_tasks", "View your tasks"),
+            BotCommand("search", "Search your tasks"),
+            BotCommand("export", "Download your tasks as a file"),
+            BotCommand("import", "Upload tasks from a file"),
         ]
         await self.app.set_bot_commands(commands)
 
@@ -54,53 +67,55 @@ class RegistrationHandler:
         """
         Регистрирует обработчики для команд регистрации, отмены и обработки сообщений.
         """
-        self.app.add_handler(MessageHandler(self.start_handler, filters.command("start")))
-        self.app.add_handler(MessageHandler(self.cancel_handler, filters.command("cancel")))
-        self.app.add_handler(MessageHandler(self.handle_message, state_filter(self.__stages)))
+        self.app.add_handler(MessageHandler(self.dispatcher.wrap(self.start_handler), filters.command("start")))
+        self.app.add_handler(MessageHandler(self.dispatcher.wrap(self.cancel_handler), filters.command("cancel")))
+        self.state_router.add(self.__stages, self.handle_message)
 
+    @metrics.timed("handler")
+    @flush_fsm
     async def start_handler(self, client: Client, message: Message):
         """Обрабатывает команду /start, начиная процесс регистрации."""
         user_id = message.from_user.id
-        user = await self.__session.get_user(user_id)
-        if user:
-            await message.reply("You are already registered! Select an action in menu")
+        if await self.user_cache.is_registered(user_id, self.__session.get_user):
+            await self.sender.reply(message, "You are already registered! Select an action in menu")
         else:
-            await self.storage.set_state(user_id, RegistrationState.WAITING_FOR_USERNAME)
-            await message.reply("Enter your name:")
+            context = await self.storage.context(message)
+            context.set_state(RegistrationState.WAITING_FOR_USERNAME)
+            await self.sender.reply(message, "Enter your name:")
 
     @error_handler
+    @flush_fsm
     async def handle_message(self, client: Client, message: Message):
         """
         Обрабатывает текстовые сообщения пользователя в зависимости от его текущего состояния.
         Вызывает нужные методы для дальнейшей работы.
+        Контекст FSM уже загружен маршрутизатором состояний, изменения сохраняются один раз в конце.
         """
-        user_id = message.from_user.id
-        state = await self.storage.get_state(user_id)
-        handler = self.message_handler.get(state)
+        context = await self.storage.context(message)
+        handler = self.message_handler.get(context.state)
         if handler:
             await handler(client, message)
         else:
-            await message.reply("Unknown action.")
+            await self.sender.reply(message, "Unknown action.")
 
     @error_handler
     async def get_username(self, client: Client, message: Message):
         """Сохраняет имя пользователя и переходит к запросу логина."""
-        user_id = message.from_user.id
-        await self.storage.set_data(user_id, {"username": message.text})
-        await self.storage.set_state(user_id, RegistrationState.WAITING_FOR_LOGIN)
-        await message.reply("Enter your login:")
+        context = await self.storage.context(message)
+        context.set_data({"username": message.text})
+        context.set_state(RegistrationState.WAITING_FOR_LOGIN)
+        await self.sender.reply(message, "Enter your login:")
 
     @error_handler
     async def get_user_login(self, client: Client, message: Message):
         """Проверяет уникальность логина и завершает регистрацию."""
-        user_id = message.from_user.id
         login = message.text
         existing_user = await self.__session.get_some_record(User, "login", login)
         if existing_user:
-            await message.reply("This login is already taken. Please enter a different login:")
+            await self.sender.reply(message, "This login is already taken. Please enter a different login:")
             return 
-        data = await self.storage.get_data(user_id)
-        username = data.get("username")
+        context = await self.storage.context(message)
+        username = context.data.get("username")
         await self.save_user_data_to_db(client, message, username, login)
 
     @error_handler
@@ -114,19 +129,21 @@ class RegistrationHandler:
         """
         user_id = message.from_user.id
         await self.__session.add_user(message.from_user.id, username, login)
-        await self.storage.clear_state(user_id)
-        await message.reply(f"Registration is complete! Name: {username}, login: {login}! Select an action in menu")
-        logger.info(f"Registration is complete! Name: {username}, login: {login}")
+        await self.user_cache.add(user_id)
+        context = await self.storage.context(message)
+        context.clear()
+        await self.sender.reply(message, f"Registration is complete! Name: {username}, login: {login}! Select an action in menu")
+        logger.info("Registration is complete! Name: %s, login: %s", username, login)
         await self.set_bot_commands()
-        await message.reply("Bot commands have been set! Use the menu to start working.")
+        await self.sender.reply(message, "Bot commands have been set! Use the menu to start working.")
 
     @error_handler
+    @flush_fsm
     async def cancel_handler(self, client: Client, message: Message):
         """Отменяет текущий процесс регистрации."""
-        user_id = message.from_user.id
-        state = await self.storage.get_state(user_id)
-        if state:
-            await self.storage.clear_state(user_id)
-            await message.reply("The process has been cancelled.")
+        context = await self.storage.context(message)
+        if context.state:
+            context.clear()
+            await self.sender.reply(message, "The process has been cancelled.")
         else:
-            await message.reply("No active process.")
\ No newline at end of file
+            await self.sender.reply(message, "No active process.")
\ No newline at end of file
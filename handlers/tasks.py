@@ -1,18 +1,28 @@
+import os
+import asyncio
 import logging
+import tempfile
+from datetime import datetime, timezone
 
 from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery, BotCommand
-from pyrogram.handlers import MessageHandler, CallbackQueryHandler
+from pyrogram.types import InlineQuery, InlineQueryResultArticle, InputTextMessageContent
+from pyrogram.handlers import MessageHandler, CallbackQueryHandler, InlineQueryHandler
 
 from fsm import FSMStorage
 from models.tasks import Task
-from utils.utils import chunk_tasks, TaskValidator
-from utils.decorators import error_handler
+from utils.utils import chunk_tasks, encode_cursor, decode_cursor, encode_ids, decode_ids, parse_due_date, TaskValidator
+from utils.callback_data import ACTIONS, CallbackCodec, CallbackData
+from utils.decorators import error_handler, flush_fsm
+from utils.cache import UserCache, KeyboardCache, SearchCache
+from utils.dispatcher import UpdateDispatcher
+from utils.sender import MessageSender
+from utils.metrics import metrics
+from utils.task_files import file_format, record_batches, ImportReport
 
 from states.tasks import TaskState
-from states.state_filter import state_filter
+from states.state_filter import StateRouter
 
-from database import Database
 from database.databasehelper import CRUD
 
 
@@ -24,39 +34,71 @@ class TaskHandler:
 
     Атрибуты:
         app (Client): Клиент Pyrogram для взаимодействия с телеграм API.
-        db (Database): Экземпляр базы данных.
         __session (CRUD): Вспомогательный объект для выполнения операций с базой данных.
         storage (FSMStorage): Хранилище состояний FSM.
+        user_cache (UserCache): Кэш зарегистрированных пользователей.
+        dispatcher (UpdateDispatcher): Диспетчер, упорядочивающий обновления каждого пользователя.
+        sender (MessageSender): Очередь исходящих сообщений с ограничением частоты.
+        state_router (StateRouter): Выбор обработчика сообщения по состоянию FSM в очереди пользователя.
+        keyboard_cache (KeyboardCache | None): Кэш готовых страниц списка задач.
+        search_cache (SearchCache | None): Кэш результатов поиска задач.
+        edit_in_place (bool): Навигация по кнопкам редактирует сообщение с кнопкой, а не отправляет новое.
+        callbacks (CallbackCodec): Кодирование и проверка подписи callback_data инлайн-кнопок.
         callback_handlers (dict): Карта обработчиков для обработки инлайн-кнопок.
         message_handler (dict): Карта обработчиков для обработки текстовых сообщений.
     Шаблонные аргументы в методах:
         client (Client): Клиент Pyrogram.
         message (Message): Сообщение пользователя.
         callback_query (CallbackQuery): Объект инлайн-кнопки.
-        param (None): Дополнительный параметр.
+        inline_query (InlineQuery): Инлайн-запрос `@bot <текст>`.
+        param (CallbackData): Данные нажатой кнопки.
     """
     __stages = [value for key, value in vars(TaskState).items() if not key.startswith("__")]
-    keyboard_template = [
-                [InlineKeyboardButton("Cancel", callback_data="cancel_task")]
-            ]
     STATUS_CHOICES = [
                     ("PROG", "In progress"),
                     ("DONE", "Accepted, satisfying"),
                       ]
+    TASKS_PER_PAGE = 10
+    INLINE_RESULTS = 20
+    SEARCH_MAX_LENGTH = 64
+    MAX_SELECTION = 500
+    EXPORT_FORMATS = ("csv", "jsonl")
+    IMPORT_BATCH_SIZE = 1000
+    # Ограничение Bot API на скачивание файлов ботом.
+    IMPORT_MAX_SIZE = 20 * 1024 * 1024
 
-    def __init__(self, app: Client, db: Database, storage: FSMStorage):
+    def __init__(self, app: Client, crud: CRUD, storage: FSMStorage, user_cache: UserCache,
+                 dispatcher: UpdateDispatcher, sender: MessageSender, state_router: StateRouter,
+                 keyboard_cache: KeyboardCache = None, edit_in_place: bool = False, search_cache: SearchCache = None, callbacks: CallbackCodec = None):
         self.app = app
-        self.db = db
-        self.__session = CRUD(db.session)
+        self.__session = crud
         self.storage = storage
+        self.user_cache = user_cache
+        self.dispatcher = dispatcher
+        self.sender = sender
+        self.state_router = state_router
+        self.keyboard_cache = keyboard_cache
+        self.edit_in_place = edit_in_place
+        self.search_cache = search_cache
+        # Без общего ключа кнопки действуют только до перезапуска процесса.
+        self.callbacks = callbacks or CallbackCodec(os.urandom(32))
         self.callback_handlers: dict = {
             "my_tasks": self.my_tasks_handler,
+            "search": self.search_page_handler,
+            "select_tasks": self.select_tasks_handler,
+            "toggle_task": self.toggle_task_handler,
+            "select_page": self.select_page_handler,
+            "bulk_status": self.bulk_status_handler,
+            "bulk_delete": self.bulk_delete_handler,
+            "confirm_bulk_delete": self.confirm_bulk_delete_handler,
             "cancel_task": self.cancel_task_handler,
             "back_stage": self.back_stage_handler,
             "detail_task": self.detail_task_handler,
             "choose_task_status": self.choose_task_status_handler,
             "choose_task_data": self.choose_task_data_handler,
             "change_task_status": self.change_task_status_handler,
+            "choose_due_date": self.choose_due_date_handler,
+            "clear_due_date": self.clear_due_date_handler,
             "delete_task": self.delete_task_handler,
             "confirm_deletion": self.confirm_deletion_handler,
         }
@@ -64,75 +106,109 @@ class TaskHandler:
             "waiting_for_name": self.get_task_name,
             "waiting_for_description": self.get_task_description,
             "change_task_field": self.change_task_field_handler,
+            "waiting_for_import": self.get_import_file,
+            "waiting_for_due_date": self.get_due_date,
         }
+        # Таблица диспетчеризации по коду действия из callback_data.
+        self.callback_routes = tuple(self.callback_handlers[action] for action in ACTIONS)
 
     def register(self):
         """
-        Регистрирует обработчики для команды создания задач, просмотра задач, инлайн-кнопок и отслеживания текста.
+        Регистрирует обработчики для команды создания задач, просмотра, поиска, выгрузки и загрузки задач, инлайн-кнопок,
+        инлайн-запросов и отслеживания текста.
         """
-        self.app.add_handler(MessageHandler(self.create_task_handler, filters.command("create_task")))
-        self.app.add_handler(MessageHandler(self.my_tasks_handler, filters.command("my_tasks")))
-        self.app.add_handler(CallbackQueryHandler(self.handle_callback))
-        self.app.add_handler(MessageHandler(self.handle_message, state_filter(self.__stages)))
+        self.app.add_handler(MessageHandler(self.dispatcher.wrap(self.create_task_handler), filters.command("create_task")))
+        self.app.add_handler(MessageHandler(self.dispatcher.wrap(self.my_tasks_handler), filters.command("my_tasks")))
+        self.app.add_handler(MessageHandler(self.dispatcher.wrap(self.search_handler), filters.command("search")))
+        self.app.add_handler(MessageHandler(self.dispatcher.wrap(self.export_handler), filters.command("export")))
+        self.app.add_handler(MessageHandler(self.dispatcher.wrap(self.import_handler), filters.command("import")))
+        self.app.add_handler(CallbackQueryHandler(self.dispatcher.wrap(self.handle_callback)))
+        self.app.add_handler(InlineQueryHandler(self.dispatcher.wrap(self.inline_search_handler)))
+        self.state_router.add(self.__stages, self.handle_message)
 
     @error_handler
+    @flush_fsm
     async def handle_callback(self, client: Client, callback_query: CallbackQuery):
         """
         Обрабатывает действия, вызванные инлайн-кнопками.
-        Обработчик вызывает нужные методы для работы с дальнешей логикой.
+        Данные кнопки проверяются по подписи и передаются обработчику из таблицы по коду действия.
+        Контекст навигации (ID задачи, страница, поле) приходит в данных кнопки, поэтому навигация не обращается к FSM.
         """
         user_id = callback_query.from_user.id
-        data = callback_query.data
-        user = await self.__session.get_user(user_id)
-        if user:
-            if ":" in data:
-                action, param = data.split(":")
-            else:
-                action, param = data, None
-            handler = self.callback_handlers.get(action)
-            if handler:
-                await handler(client, callback_query, param)
+        # Ответ на нажатие уходит сразу, параллельно с обработкой, чтобы у кнопки пропал индикатор загрузки.
+        answer = asyncio.create_task(callback_query.answer())
+        try:
+            if await self.user_cache.is_registered(user_id, self.__session.get_user):
+                param = self.callbacks.unpack(callback_query.data, user_id)
+                if param is not None:
+                    await self.callback_routes[param.code](client, callback_query, param)
+                else:
+                    logger.warning("User %s pressed a button with invalid callback data", user_id)
+                    await self.sender.reply(callback_query.message, "This button is no longer valid.")
+                    await self.cancel_command(client, callback_query)
             else:
-                await callback_query.message.reply("Unknown action.")
-                await self.cancel_command(client, callback_query)
-        else:
-            await callback_query.message.reply("Sign up first. Enter the /start command")
-        await callback_query.answer()  
+                await self.sender.reply(callback_query.message, "Sign up first. Enter the /start command")
+        finally:
+            await answer
 
     @error_handler
+    @flush_fsm
     async def handle_message(self, client: Client, message: Message):
         """
         Обрабатывает текстовые сообщения пользователя в зависимости от его текущего состояния.
         Вызывает нужные методы для дальнейшей работы.
+        Контекст FSM уже загружен маршрутизатором состояний, изменения сохраняются один раз в конце.
         """
-        user_id = message.from_user.id
-        state = await self.storage.get_state(user_id)
-        handler = self.message_handler.get(state)
+        context = await self.storage.context(message)
+        handler = self.message_handler.get(context.state)
         if handler:
             await handler(client, message)
         else:
-            await message.reply("Unknown action.")
+            await self.sender.reply(message, "Unknown action.")
 
     async def cancel_command(self, client: Client, message: Message):
         """
         Отменяет текущее действие пользователя и очищает состояние и данные пользователя.
         """
-        user_id = message.from_user.id
-        await self.storage.clear_state(user_id)
-        await message.message.reply("Choose an action in menu")
+        context = await self.storage.context(message)
+        context.clear()
+        await self.sender.reply(message.message, "Choose an action in menu")
+
+    def cancel_button(self, user_id: int) -> InlineKeyboardButton:
+        """Кнопка отмены текущего действия, подписанная для пользователя."""
+        return InlineKeyboardButton("Cancel", callback_data=self.callbacks.pack(user_id, "cancel_task"))
+
+    def keyboard_template(self, user_id: int) -> list:
+        """Новая клавиатура с кнопкой отмены, к которой экран добавляет свои кнопки."""
+        return [[self.cancel_button(user_id)]]
+
+    async def show(self, update, text: str, reply_markup: InlineKeyboardMarkup = None):
+        """
+        Показывает экран навигации (список задач, карточку задачи, выбор действия).
+        На нажатие кнопки при edit_in_place редактирует сообщение с этой кнопкой, иначе отправляет новое сообщение.
+        Аргументы:
+            update (Message | CallbackQuery): Обновление, на которое отвечает бот.
+            text (str): Текст экрана.
+            reply_markup (InlineKeyboardMarkup, optional): Клавиатура экрана.
+        """
+        if self.edit_in_place and isinstance(update, CallbackQuery) and update.message:
+            await self.sender.edit(update.message, text, reply_markup)
+        else:
+            await self.sender.reply(getattr(update, 'message', update), text, reply_markup=reply_markup)
 
     @error_handler
+    @flush_fsm
     async def create_task_handler(self, client: Client, message: Message):
         """Начинает процесс создания новой задачи."""
         user_id = message.from_user.id
-        user = await self.__session.get_user(user_id)
-        if user:
-            await self.storage.set_state(user_id, TaskState.WAITING_FOR_NAME)
-            await message.reply(
+        if await self.user_cache.is_registered(user_id, self.__session.get_user):
+            context = await self.storage.context(message)
+            context.set_state(TaskState.WAITING_FOR_NAME)
+            await self.sender.reply(message,
                 TaskState.CREATE_TASK_STAGE[TaskState.WAITING_FOR_NAME],
-                reply_markup=InlineKeyboardMarkup(self.keyboard_template))
+                reply_markup=InlineKeyboardMarkup(self.keyboard_template(user_id)))
         else:
-            await message.reply("Sign up first. Enter the /start command")
+            await self.sender.reply(message, "Sign up first. Enter the /start command")
 
     @error_handler
     async def get_task_name(self, client: Client, message: Message):
@@ -140,20 +216,20 @@ class TaskHandler:
         user_id = message.from_user.id
         is_valid, error_msg = TaskValidator.validate("name", message.text)
         if not is_valid:
-            await message.reply(error_msg)
+            await self.sender.reply(message, error_msg)
             return
-        await self.storage.set_data(user_id, {"task_name": message.text})
-        await self.storage.set_state(user_id, TaskState.WAITING_FOR_DESCRIPTION)
-        keyboard = self.keyboard_template.copy()
-        keyboard.append([InlineKeyboardButton("Back", callback_data="back_stage")])
-        await message.reply(TaskState.CREATE_TASK_STAGE[TaskState.WAITING_FOR_DESCRIPTION], reply_markup=InlineKeyboardMarkup(keyboard))
+        context = await self.storage.context(message)
+        context.set_data({"task_name": message.text})
+        context.set_state(TaskState.WAITING_FOR_DESCRIPTION)
+        keyboard = self.keyboard_template(user_id)
+        keyboard.append([InlineKeyboardButton("Back", callback_data=self.callbacks.pack(user_id, "back_stage"))])
+        await self.sender.reply(message, TaskState.CREATE_TASK_STAGE[TaskState.WAITING_FOR_DESCRIPTION], reply_markup=InlineKeyboardMarkup(keyboard))
 
     @error_handler
     async def get_task_description(self, client: Client, message: Message):
         """Получает описание задачи и запускает метод для сохранения данных в БД."""
-        user_id = message.from_user.id
-        data = await self.storage.get_data(user_id)
-        task_name = data.get("task_name")
+        context = await self.storage.context(message)
+        task_name = context.data.get("task_name")
         task_description = message.text
         await self.save_task_data(client, message, task_name, task_description)
 
@@ -166,208 +242,657 @@ class TaskHandler:
             task_name (str): Название задачи.
             task_description (str): Описание задачи.
         """
-        user_id = message.from_user.id
         await self.__session.add_task(message.from_user.id, task_name, task_description)
-        await self.storage.clear_state(user_id)
-        await message.reply(f"Task ‘{task_name}’ has been successfully created!")
-        logger.info(f"Task ‘{task_name}’ has been successfully created!")
+        context = await self.storage.context(message)
+        context.clear()
+        await self.sender.reply(message, f"Task ‘{task_name}’ has been successfully created!")
+        logger.info("Task ‘%s’ has been successfully created!", task_name)
 
     @error_handler
     async def change_task_field_handler(self, client: Client, message: Message):
         """Обновляет данные в задаче, в передаваемом поле."""
         user_id = message.from_user.id
         new_task_data = message.text
-        data = await self.storage.get_data(user_id)
-        task_data = data.get("data")
+        context = await self.storage.context(message)
+        task_data = context.data.get("data")
         task_id = task_data["task_id"]
         field = task_data["field"]
         is_valid, error_msg = TaskValidator.validate(field, new_task_data)
         if not is_valid:
-            await message.reply(error_msg)
+            await self.sender.reply(message, error_msg)
             return
         result = await self.__session.update_task(Task, "id", int(task_id),
-                                                  {field:new_task_data})
+                                                  {field:new_task_data}, tg_user_id=user_id)
         if result:
-            await message.reply(f"You changed the {field} of task `{new_task_data}`")
-            logger.info(f"User {user_id} has successfully updated the task {field} on {new_task_data}")
+            await self.sender.reply(message, f"You changed the {field} of task `{new_task_data}`")
+            logger.info("User %s has successfully updated the task %s on %s", user_id, field, new_task_data)
         else:
-            await message.reply(f"There's been an error. Try again later.")
-        await self.storage.clear_state(user_id)
-        await message.reply("Choose an action in menu")
+            await self.sender.reply(message, f"There's been an error. Try again later.")
+        context.clear()
+        await self.sender.reply(message, "Choose an action in menu")
     
     @error_handler
-    async def my_tasks_handler(self, client: Client, message: Message, param=0):
+    @flush_fsm
+    async def my_tasks_handler(self, client: Client, message: Message, param: CallbackData = None):
         """
         Показывает список задач пользователя с разбивкой на страницы.
         Каждая страница показывает по 10 задач.
-        Есть возможность перехода по страницам
+        Есть возможность перехода по страницам, курсор страницы передается в callback_data.
+        Команда /my_tasks сбрасывает состояние FSM, листание страниц кнопками к FSM не обращается.
+        Готовые страницы берутся из кэша, пока задачи пользователя не изменились.
         Аргументы:
-            param (int, optional): Принимает номер страницы. По умолчанию 0.
+            param (CallbackData, optional): Данные кнопки с курсором страницы: `n<ключ>` - вперед от задачи,
+                                            `p<ключ>` - назад. Без кнопки - первая страница.
         """
         user_id = message.from_user.id
-        target_message = getattr(message, 'message', message)
-        await self.storage.clear_state(user_id)
-        tasks = await self.__session.get_tasks(user_id)
+        if param is None:
+            context = await self.storage.context(message)
+            context.clear()
+        page = (param and param.page) or "0"
+        version = None
+        if self.keyboard_cache:
+            version, text, markup = await self.keyboard_cache.get(user_id, page)
+            if text is not None:
+                await self.show(message, text, markup)
+                return
+        text, markup = await self.render_tasks_page(user_id, page)
+        if self.keyboard_cache:
+            await self.keyboard_cache.set(user_id, page, version, text, markup)
+        await self.show(message, text, markup)
+
+    async def load_tasks_page(self, user_id: int, page: str):
+        """
+        Загружает страницу списка задач и курсоры соседних страниц.
+        Аргументы:
+            user_id (int): Телеграм ID пользователя.
+            page (str): Курсор страницы: "0" - первая страница, `n<ключ>` - вперед от задачи, `p<ключ>` - назад.
+        Возвращает:
+            tuple: Задачи страницы, курсор предыдущей и следующей страницы (None, если страницы нет).
+        """
+        cursor, backward = None, False
+        if page != "0":
+            cursor, backward = decode_cursor(page[1:]), page[0] == "p"
+        tasks, has_more = await self.__session.get_tasks_page(user_id, self.TASKS_PER_PAGE, cursor, backward)
+        if cursor and (not tasks or (backward and not has_more)):
+            # Страница опустела или начало списка достигнуто раньше - показываем первую страницу.
+            cursor, backward = None, False
+            tasks, has_more = await self.__session.get_tasks_page(user_id, self.TASKS_PER_PAGE)
         if not tasks:
-            await target_message.reply("You don't have any tasks yet.")
-            return 
-        page = int(param)
-        tasks_per_page = 10
-        start = page * tasks_per_page
-        end = start + tasks_per_page
-        tasks_on_page = tasks[start:end]
+            return tasks, None, None
+        has_previous = has_more if backward else cursor is not None
+        has_next = cursor is not None if backward else has_more
+        previous_page = f"p{encode_cursor(tasks[0].created_at, tasks[0].id)}" if has_previous else None
+        next_page = f"n{encode_cursor(tasks[-1].created_at, tasks[-1].id)}" if has_next else None
+        return tasks, previous_page, next_page
+
+    async def render_tasks_page(self, user_id: int, page: str):
+        """
+        Строит текст и клавиатуру страницы списка задач.
+        Аргументы:
+            user_id (int): Телеграм ID пользователя.
+            page (str): Курсор страницы: "0" - первая страница, `n<ключ>` - вперед от задачи, `p<ключ>` - назад.
+        Возвращает:
+            tuple: Текст ответа и клавиатура (None, если задач нет).
+        """
+        tasks, previous_page, next_page = await self.load_tasks_page(user_id, page)
+        if not tasks:
+            return "You don't have any tasks yet.", None
+        pack = self.callbacks.packer(user_id)
+        # Кнопка задачи несет курсор страницы, чтобы "Back" в карточке вернул на эту же страницу.
         task_buttons = [
-            InlineKeyboardButton(task.name, callback_data=f"detail_task:{task.id}")
-            for task in tasks_on_page
+            InlineKeyboardButton(task.name, callback_data=pack("detail_task", task_id=task.id, page=page))
+            for task in tasks
         ]
         task_buttons_grouped = chunk_tasks(task_buttons, 2)
-        task_buttons_grouped.insert(0, [InlineKeyboardButton("Cancel", callback_data="cancel_task")])
+        task_buttons_grouped.insert(0, [
+            self.cancel_button(user_id),
+            InlineKeyboardButton("Select", callback_data=pack("select_tasks", page=page, flag=True)),
+        ])
         navigation_buttons = []
-        if page > 0:
-            navigation_buttons.append(InlineKeyboardButton("Previous", callback_data=f"my_tasks:{page - 1}"))
-        if end < len(tasks):
-            navigation_buttons.append(InlineKeyboardButton("Next", callback_data=f"my_tasks:{page + 1}"))
+        if previous_page:
+            navigation_buttons.append(InlineKeyboardButton("Previous", callback_data=pack("my_tasks", page=previous_page)))
+        if next_page:
+            navigation_buttons.append(InlineKeyboardButton("Next", callback_data=pack("my_tasks", page=next_page)))
+
+        if navigation_buttons:
+            task_buttons_grouped.append(navigation_buttons)
+        return "Your tasks:", InlineKeyboardMarkup(task_buttons_grouped)
+
+    @error_handler
+    async def select_tasks_handler(self, client: Client, callback_query: CallbackQuery, param: CallbackData):
+        """
+        Включает режим выбора нескольких задач или листает его страницы.
+        Выбранные задачи хранятся в данных FSM компактной строкой (encode_ids) и сохраняются при смене страницы.
+        Аргументы:
+            param (CallbackData): Курсор страницы, как в my_tasks; flag - начать новый выбор.
+        """
+        context = await self.storage.context(callback_query)
+        keep = not param.flag and "selection_page" in context.data
+        selected = context.data.get("selected", "") if keep else ""
+        context.set_data({"selected": selected, "selection_page": param.page or "0"})
+        await self.show_selection_page(callback_query, context)
+
+    @error_handler
+    async def toggle_task_handler(self, client: Client, callback_query: CallbackQuery, param: CallbackData):
+        """
+        Добавляет задачу в выбор или убирает ее из выбора.
+        Аргументы:
+            param (CallbackData): ID задачи.
+        """
+        context = await self.storage.context(callback_query)
+        if "selection_page" not in context.data:
+            await self.sender.reply(callback_query.message, "The selection has expired. Open /my_tasks again.")
+            return
+        selected = decode_ids(context.data.get("selected"))
+        selected ^= {param.task_id}
+        if len(selected) > self.MAX_SELECTION:
+            await self.sender.reply(callback_query.message, f"You can select up to {self.MAX_SELECTION} tasks.")
+            return
+        context.set_data({**context.data, "selected": encode_ids(selected)})
+        await self.show_selection_page(callback_query, context)
 
+    @error_handler
+    async def select_page_handler(self, client: Client, callback_query: CallbackQuery, param: CallbackData):
+        """Выбирает все задачи текущей страницы, а если они уже выбраны - снимает с них выбор."""
+        context = await self.storage.context(callback_query)
+        if "selection_page" not in context.data:
+            await self.sender.reply(callback_query.message, "The selection has expired. Open /my_tasks again.")
+            return
+        selected = decode_ids(context.data.get("selected"))
+        tasks, _, _ = await self.load_tasks_page(callback_query.from_user.id, context.data["selection_page"])
+        page_ids = {task.id for task in tasks}
+        if page_ids <= selected:
+            selected -= page_ids
+        else:
+            selected |= page_ids
+        if len(selected) > self.MAX_SELECTION:
+            await self.sender.reply(callback_query.message, f"You can select up to {self.MAX_SELECTION} tasks.")
+            return
+        context.set_data({**context.data, "selected": encode_ids(selected)})
+        await self.show_selection_page(callback_query, context)
+
+    async def show_selection_page(self, update, context):
+        """Показывает страницу списка задач в режиме выбора: отметки выбранных задач и действия над выбором."""
+        user_id = update.from_user.id
+        selected = decode_ids(context.data.get("selected"))
+        page = context.data["selection_page"]
+        tasks, previous_page, next_page = await self.load_tasks_page(update.from_user.id, page)
+        if not tasks:
+            await self.show(update, "You don't have any tasks yet.")
+            return
+        pack = self.callbacks.packer(user_id)
+        task_buttons_grouped = chunk_tasks([
+            InlineKeyboardButton(f"{'✅' if task.id in selected else '▫️'} {task.name}",
+                                 callback_data=pack("toggle_task", task_id=task.id))
+            for task in tasks
+        ], 2)
+        task_buttons_grouped.insert(0, [
+            self.cancel_button(user_id),
+            InlineKeyboardButton("Select page", callback_data=pack("select_page")),
+        ])
+        navigation_buttons = []
+        if previous_page:
+            navigation_buttons.append(InlineKeyboardButton("Previous", callback_data=pack("select_tasks", page=previous_page)))
+        if next_page:
+            navigation_buttons.append(InlineKeyboardButton("Next", callback_data=pack("select_tasks", page=next_page)))
         if navigation_buttons:
             task_buttons_grouped.append(navigation_buttons)
-        await target_message.reply("Your tasks:", reply_markup=InlineKeyboardMarkup(task_buttons_grouped))
+        if selected:
+            task_buttons_grouped.extend(
+                [InlineKeyboardButton(f"Set: {label}", callback_data=pack("bulk_status", status=status))]
+                for status, label in self.STATUS_CHOICES
+            )
+            task_buttons_grouped.append([InlineKeyboardButton(f"Delete selected ({len(selected)})",
+                                                              callback_data=pack("bulk_delete"))])
+        await self.show(update, f"Select tasks ({len(selected)} selected):", InlineKeyboardMarkup(task_buttons_grouped))
+
+    @error_handler
+    async def bulk_status_handler(self, client: Client, callback_query: CallbackQuery, param: CallbackData):
+        """
+        Меняет статус всех выбранных задач одним запросом.
+        Аргументы:
+            param (CallbackData): Новый статус задач.
+        """
+        user_id = callback_query.from_user.id
+        context = await self.storage.context(callback_query)
+        selected = decode_ids(context.data.get("selected"))
+        if not selected:
+            await self.sender.reply(callback_query.message, "No tasks selected.")
+            return
+        count = await self.__session.bulk_update_tasks(user_id, selected, {"status": param.status})
+        await self.sender.reply(callback_query.message, f"Status of {count} tasks changed to {param.status}.")
+        logger.info("User %s changed the status of %s tasks to %s", user_id, count, param.status)
+        await self.cancel_command(client, callback_query)
+
+    @error_handler
+    async def bulk_delete_handler(self, client: Client, callback_query: CallbackQuery, param: CallbackData):
+        """Запрашивает подтверждение удаления выбранных задач."""
+        user_id = callback_query.from_user.id
+        context = await self.storage.context(callback_query)
+        selected = decode_ids(context.data.get("selected"))
+        if not selected:
+            await self.sender.reply(callback_query.message, "No tasks selected.")
+            return
+        pack = self.callbacks.packer(user_id)
+        keyboard = self.keyboard_template(user_id)
+        keyboard.extend([
+            [InlineKeyboardButton("Back", callback_data=pack("select_tasks", page=context.data["selection_page"]))],
+            [InlineKeyboardButton(f"Yes, delete {len(selected)} tasks.", callback_data=pack("confirm_bulk_delete"))],
+        ])
+        await self.show(callback_query, f"Are you sure you want to delete {len(selected)} tasks?",
+                        InlineKeyboardMarkup(keyboard))
+
+    @error_handler
+    async def confirm_bulk_delete_handler(self, client: Client, callback_query: CallbackQuery, param: CallbackData):
+        """Удаляет все выбранные задачи одним запросом."""
+        user_id = callback_query.from_user.id
+        context = await self.storage.context(callback_query)
+        selected = decode_ids(context.data.get("selected"))
+        if not selected:
+            await self.sender.reply(callback_query.message, "No tasks selected.")
+            return
+        count = await self.__session.bulk_delete_tasks(user_id, selected)
+        await self.sender.reply(callback_query.message, f"{count} tasks successfully deleted.")
+        logger.info("User %s deleted %s tasks", user_id, count)
+        await self.cancel_command(client, callback_query)
+
+    def normalize_query(self, text: str) -> str:
+        """Приводит текст поиска к нижнему регистру, схлопывает пробелы и ограничивает длину."""
+        return " ".join((text or "").split()).lower()[:self.SEARCH_MAX_LENGTH]
 
-    async def cancel_task_handler(self, client: Client, callback_query: CallbackQuery, param: None):
+    async def search_tasks(self, user_id: int, query: str, page: int, limit: int):
+        """
+        Возвращает страницу результатов поиска задач пользователя, повторные запросы берутся из кэша.
+        Аргументы:
+            user_id (int): Телеграм ID пользователя.
+            query (str): Нормализованный текст поиска.
+            page (int): Номер страницы, начиная с 0.
+            limit (int): Количество задач на странице.
+        Возвращает:
+            tuple: Список TaskSummary и флаг наличия следующей страницы.
+        """
+        key = (query, page, limit)
+        if self.search_cache:
+            result = self.search_cache.get(user_id, key)
+            if result is not None:
+                return result
+        result = await self.__session.search_tasks(user_id, query, limit, page * limit)
+        if self.search_cache:
+            self.search_cache.set(user_id, key, result)
+        return result
+
+    @error_handler
+    @flush_fsm
+    async def search_handler(self, client: Client, message: Message):
+        """
+        Ищет задачи пользователя по тексту команды `/search <текст>`.
+        Текст запроса сохраняется в данных FSM, кнопки страниц передают только номер страницы.
+        """
+        user_id = message.from_user.id
+        if not await self.user_cache.is_registered(user_id, self.__session.get_user):
+            await self.sender.reply(message, "Sign up first. Enter the /start command")
+            return
+        query = self.normalize_query(" ".join(message.command[1:]))
+        context = await self.storage.context(message)
+        context.clear()
+        if not query:
+            await self.sender.reply(message, "Enter a search text: /search <text>")
+            return
+        context.set_data({"search": query})
+        await self.show_search_page(message, user_id, query, 0)
+
+    @error_handler
+    async def search_page_handler(self, client: Client, callback_query: CallbackQuery, param: CallbackData):
+        """
+        Показывает страницу результатов последнего поиска пользователя.
+        Текст поиска может быть длиннее, чем вмещает callback_data, поэтому он хранится в данных FSM.
+        Аргументы:
+            param (CallbackData): Номер страницы.
+        """
+        context = await self.storage.context(callback_query)
+        query = context.data.get("search")
+        if not query:
+            await self.sender.reply(callback_query.message, "The search has expired. Enter /search <text> again.")
+            return
+        await self.show_search_page(callback_query, callback_query.from_user.id, query, param.number or 0)
+
+    async def show_search_page(self, update, user_id: int, query: str, page: int):
+        """Строит и показывает страницу результатов поиска с кнопками задач и навигацией."""
+        tasks, has_more = await self.search_tasks(user_id, query, page, self.TASKS_PER_PAGE)
+        if not tasks:
+            await self.show(update, f"No tasks found for ‘{query}’.")
+            return
+        pack = self.callbacks.packer(user_id)
+        task_buttons_grouped = chunk_tasks([
+            InlineKeyboardButton(task.name, callback_data=pack("detail_task", task_id=task.id))
+            for task in tasks
+        ], 2)
+        task_buttons_grouped.insert(0, [self.cancel_button(user_id)])
+        navigation_buttons = []
+        if page:
+            navigation_buttons.append(InlineKeyboardButton("Previous", callback_data=pack("search", number=page - 1)))
+        if has_more:
+            navigation_buttons.append(InlineKeyboardButton("Next", callback_data=pack("search", number=page + 1)))
+        if navigation_buttons:
+            task_buttons_grouped.append(navigation_buttons)
+        await self.show(update, f"Search results for ‘{query}’:", InlineKeyboardMarkup(task_buttons_grouped))
+
+    @error_handler
+    async def inline_search_handler(self, client: Client, inline_query: InlineQuery):
+        """
+        Ищет задачи пользователя в инлайн-режиме (`@bot <текст>`).
+        Следующая страница запрашивается Telegram по next_offset (номер страницы).
+        """
+        user_id = inline_query.from_user.id
+        if not await self.user_cache.is_registered(user_id, self.__session.get_user):
+            await inline_query.answer([], cache_time=5, is_personal=True,
+                                      switch_pm_text="Sign up first", switch_pm_parameter="start")
+            return
+        query = self.normalize_query(inline_query.query)
+        if not query:
+            await inline_query.answer([], cache_time=5, is_personal=True)
+            return
+        page = int(inline_query.offset or 0)
+        tasks, has_more = await self.search_tasks(user_id, query, page, self.INLINE_RESULTS)
+        statuses = dict(self.STATUS_CHOICES)
+        results = [
+            InlineQueryResultArticle(
+                title=task.name,
+                description=statuses.get(task.status, task.status),
+                input_message_content=InputTextMessageContent(
+                    f"Task: {task.name}\nStatus: {statuses.get(task.status, task.status)}"
+                ),
+                id=str(task.id),
+            )
+            for task in tasks
+        ]
+        await inline_query.answer(results, cache_time=5, is_personal=True,
+                                  next_offset=str(page + 1) if has_more else "")
+
+    @error_handler
+    @flush_fsm
+    async def export_handler(self, client: Client, message: Message):
+        """
+        Отправляет пользователю файл со всеми его задачами: `/export` - CSV, `/export jsonl` - JSONL.
+        Выгрузка идет из БД порциями во временный файл, который клиент отправляет частями,
+        поэтому память не зависит от количества задач. Файл пишется в отдельном потоке, не задерживая цикл событий.
+        """
+        user_id = message.from_user.id
+        if not await self.user_cache.is_registered(user_id, self.__session.get_user):
+            await self.sender.reply(message, "Sign up first. Enter the /start command")
+            return
+        fmt = message.command[1].lower() if len(message.command) > 1 else "csv"
+        if fmt not in self.EXPORT_FORMATS:
+            await self.sender.reply(message, "Usage: /export [csv|jsonl]")
+            return
+        context = await self.storage.context(message)
+        context.clear()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, f"tasks.{fmt}")
+            file = await asyncio.to_thread(open, path, "wb")
+            try:
+                async def write(chunk: bytes):
+                    await asyncio.to_thread(file.write, chunk)
+                exported = await self.__session.export_tasks(user_id, write, fmt)
+            finally:
+                await asyncio.to_thread(file.close)
+            if not exported:
+                await self.sender.reply(message, "There's been an error. Try again later.")
+                return
+            await self.sender.call(message.chat.id, client.send_document, chat_id=message.chat.id,
+                                   document=path, file_name=f"tasks.{fmt}", caption="Your tasks")
+        logger.info("User %s has exported the tasks as %s", user_id, fmt)
+
+    @error_handler
+    @flush_fsm
+    async def import_handler(self, client: Client, message: Message):
+        """Начинает загрузку задач из файла и ждет от пользователя документ CSV или JSONL."""
+        user_id = message.from_user.id
+        if not await self.user_cache.is_registered(user_id, self.__session.get_user):
+            await self.sender.reply(message, "Sign up first. Enter the /start command")
+            return
+        context = await self.storage.context(message)
+        context.clear()
+        context.set_state(TaskState.WAITING_FOR_IMPORT)
+        await self.sender.reply(message,
+            "Send a .csv, .jsonl or .json (an array of objects) file with the fields name, description and optional status "
+            f"({', '.join(status for status, _ in self.STATUS_CHOICES)}).",
+            reply_markup=InlineKeyboardMarkup(self.keyboard_template(user_id)))
+
+    @error_handler
+    async def get_import_file(self, client: Client, message: Message):
+        """
+        Загружает задачи из присланного файла.
+        Файл читается построчно в отдельном потоке, строки проверяются TaskValidator и записываются пачками
+        по IMPORT_BATCH_SIZE, по одной команде COPY на пачку. Неверные строки пропускаются, пользователь получает отчет о них.
+        """
+        user_id = message.from_user.id
+        document = message.document
+        if not document:
+            await self.sender.reply(message, "Send the tasks as a file.")
+            return
+        fmt = file_format(document.file_name)
+        if not fmt:
+            await self.sender.reply(message, "Only .csv, .jsonl and .json files are supported.")
+            return
+        if (document.file_size or 0) > self.IMPORT_MAX_SIZE:
+            await self.sender.reply(message, f"The file is too large. The maximum size - {self.IMPORT_MAX_SIZE // 2 ** 20} MB")
+            return
+        context = await self.storage.context(message)
+        context.clear()
+        report = ImportReport()
+        with tempfile.TemporaryDirectory() as directory:
+            path = await client.download_media(message, file_name=os.path.join(directory, f"import.{fmt}"))
+            statuses = [status for status, _ in self.STATUS_CHOICES]
+            imported = await self.__session.import_tasks(
+                user_id, record_batches(path, fmt, statuses, self.IMPORT_BATCH_SIZE, report)
+            )
+        if imported is None:
+            await self.sender.reply(message, "There's been an error. No tasks were imported. Try again later.")
+            return
+        text = f"Imported tasks: {imported}."
+        if report.skipped:
+            text += f"\nSkipped invalid rows: {report.skipped}.\n" + "\n".join(report.errors)
+        await self.sender.reply(message, text)
+        logger.info("User %s has imported %s tasks, skipped %s rows", user_id, imported, report.skipped)
+
+    @metrics.timed("handler")
+    async def cancel_task_handler(self, client: Client, callback_query: CallbackQuery, param: CallbackData):
         """Обрабатывает отмену действия, вызываемое инлайн-кнопкой."""
         await self.cancel_command(client, callback_query)
 
     @error_handler
-    async def back_stage_handler(self, client: Client, callback_query: CallbackQuery, param: None):
+    async def back_stage_handler(self, client: Client, callback_query: CallbackQuery, param: CallbackData):
         """
-        Возвращает пользователя на предыдущий этап создания, редактирования задачи или к списку с задачами.
+        Возвращает пользователя на предыдущий этап создания задачи.
+        Остальные кнопки "Back" сами несут экран, на который возвращают, в callback_data.
         """
         user_id = callback_query.from_user.id
-        state = await self.storage.get_state(user_id)
+        context = await self.storage.context(callback_query)
+        state = context.state
         if state in TaskState.CREATE_TASK_STEP:
             current_index = TaskState.CREATE_TASK_STEP.index(state)
             current_step = TaskState.CREATE_TASK_STEP[current_index - 1]
-            await self.storage.set_state(user_id, current_step)
-            await callback_query.message.reply(
-                TaskState.CREATE_TASK_STAGE[current_step],
-                reply_markup=InlineKeyboardMarkup(self.keyboard_template),
-            )
+            context.set_state(current_step)
+            await self.show(callback_query, TaskState.CREATE_TASK_STAGE[current_step],
+                            InlineKeyboardMarkup(self.keyboard_template(user_id)))
         else:
-            if ":" in state:
-                action, param = state.split(":")
-            else:
-                action, param = state, None
-            handler = self.callback_handlers.get(action)
-            if handler:
-                await handler(client, callback_query, param)
+            await self.my_tasks_handler(client, callback_query)
 
     @error_handler
-    async def detail_task_handler(self, client: Client, callback_query: CallbackQuery, param: None):
-        """Показывает подробности о задаче и предоставляет меню для её редактирования."""
+    async def detail_task_handler(self, client: Client, callback_query: CallbackQuery, param: CallbackData):
+        """
+        Показывает подробности о задаче и предоставляет меню для её редактирования.
+        ID задачи и страница списка, с которой открыта карточка, передаются в кнопках меню, FSM не используется.
+        Аргументы:
+            param (CallbackData): ID задачи и курсор страницы списка.
+        """
         user_id = callback_query.from_user.id
-        task_id = int(param)
-        task_data = await self.__session.get_some_record(Task, "id", int(task_id))
-        await self.storage.set_state(user_id, TaskState.CHANGE_TASK_DATA)
-        await self.storage.set_data(user_id, {
-                                "data":{
-                                        "task_id": task_id,
-                                        "task_status": task_data.status, 
-                                        "task_name": task_data.name, 
-                                    }
-                                })
-        keyboard = self.keyboard_template.copy()
+        task_id = param.task_id
+        task_data = await self.__session.get_task_summary(task_id, callback_query.from_user.id)
+        if task_data is None:
+            await self.sender.reply(callback_query.message, "Task not found.")
+            return
+        pack = self.callbacks.packer(user_id)
+        keyboard = self.keyboard_template(user_id)
         keyboard.extend([
-                [InlineKeyboardButton("Back", callback_data="back_stage")],
-                [InlineKeyboardButton("Change task name", callback_data="choose_task_data:name")],
-                [InlineKeyboardButton("Change task description", callback_data="choose_task_data:description")],
-                [InlineKeyboardButton("Change task status", callback_data="choose_task_status")],
-                [InlineKeyboardButton("Delete tasks", callback_data="delete_task")],
+                [InlineKeyboardButton("Back", callback_data=pack("my_tasks", page=param.page or "0"))],
+                [InlineKeyboardButton("Change task name",
+                                      callback_data=pack("choose_task_data", task_id=task_id, field="name"))],
+                [InlineKeyboardButton("Change task description",
+                                      callback_data=pack("choose_task_data", task_id=task_id, field="description"))],
+                [InlineKeyboardButton("Change task status",
+                                      callback_data=pack("choose_task_status", task_id=task_id, page=param.page,
+                                                         status=task_data.status))],
+                [InlineKeyboardButton("Set due date",
+                                      callback_data=pack("choose_due_date", task_id=task_id,
+                                                         flag=bool(task_data.due_at)))],
+                [InlineKeyboardButton("Delete tasks",
+                                      callback_data=pack("delete_task", task_id=task_id, page=param.page))],
             ])
-        await callback_query.message.reply(f"Select action for `{task_data.name}`:",
-            reply_markup=InlineKeyboardMarkup(keyboard),
-        )
+        text = f"Select action for `{task_data.name}`:"
+        if task_data.due_at:
+            text = f"Due: {task_data.due_at:%Y-%m-%d %H:%M} UTC\n{text}"
+        await self.show(callback_query, text, InlineKeyboardMarkup(keyboard))
 
     @error_handler
-    async def choose_task_status_handler(self, client: Client, callback_query: CallbackQuery, param: None):
+    async def choose_task_status_handler(self, client: Client, callback_query: CallbackQuery, param: CallbackData):
         """
         Позволяет пользователю выбрать новый статус задачи.
-        Передаем список всех возможных статусов из STATUS_CHOICES
+        Передаем список всех возможных статусов из STATUS_CHOICES, кроме текущего статуса из данных кнопки.
         """
         user_id = callback_query.from_user.id
-        data = await self.storage.get_data(user_id)
-        task_data = data.get("data")
-        task_status = task_data["task_status"]
-        await self.storage.set_state(user_id, TaskState.CHANGE_DETAIL_TASK.format(taskId=task_data["task_id"]))
+        pack = self.callbacks.packer(user_id)
         keyboard = [
-                [InlineKeyboardButton(status[1], callback_data=f"change_task_status:{status[0]}")]
+                [InlineKeyboardButton(status[1],
+                                      callback_data=pack("change_task_status", task_id=param.task_id, status=status[0]))]
                 for status in self.STATUS_CHOICES
-                if status[0] != task_status
+                if status[0] != param.status
             ]
-        keyboard.insert(0, [InlineKeyboardButton("Cancel", callback_data="cancel_task")])
-        keyboard.insert(1, [InlineKeyboardButton("Back", callback_data="back_stage")])
-        await callback_query.message.reply("Select a status:",
-            reply_markup=InlineKeyboardMarkup(keyboard),
-        )
+        keyboard.insert(0, [self.cancel_button(user_id)])
+        keyboard.insert(1, [InlineKeyboardButton(
+            "Back", callback_data=pack("detail_task", task_id=param.task_id, page=param.page)
+        )])
+        await self.show(callback_query, "Select a status:", InlineKeyboardMarkup(keyboard))
 
     @error_handler
-    async def choose_task_data_handler(self, client: Client, callback_query: CallbackQuery, param: None):
+    async def choose_task_data_handler(self, client: Client, callback_query: CallbackQuery, param: CallbackData):
         """
         Устанавливает поле задачи, которое пользователь хочет изменить.
-        Ожидает текстового ответа от пользователя
+        Ожидает текстового ответа от пользователя, поэтому ID задачи и поле сохраняются в FSM.
         Аргументы:
-            param (int, optional): Хранит название поля, которое нужно изменить.
+            param (CallbackData): ID задачи и название поля, которое нужно изменить.
         """
         user_id = callback_query.from_user.id
-        data = await self.storage.get_data(user_id)
-        data["data"]["field"] = param
-        await self.storage.set_data(user_id, data)
-        await self.storage.set_state(user_id, TaskState.CHANGE_TASK_FIELD)
-        await callback_query.message.reply(f"Enter a new {param} for the task.", 
-                                            reply_markup=InlineKeyboardMarkup(self.keyboard_template))
+        context = await self.storage.context(callback_query)
+        context.set_data({"data": {"task_id": param.task_id, "field": param.field}})
+        context.set_state(TaskState.CHANGE_TASK_FIELD)
+        await self.sender.reply(callback_query.message, f"Enter a new {param.field} for the task.",
+                                reply_markup=InlineKeyboardMarkup(self.keyboard_template(user_id)))
     
     @error_handler
-    async def change_task_status_handler(self, client: Client, callback_query: CallbackQuery, param: None):
+    async def choose_due_date_handler(self, client: Client, callback_query: CallbackQuery, param: CallbackData):
+        """
+        Запрашивает срок задачи, в который бот пришлет напоминание.
+        Аргументы:
+            param (CallbackData): ID задачи; flag - у задачи уже есть срок.
+        """
+        user_id = callback_query.from_user.id
+        context = await self.storage.context(callback_query)
+        context.set_state(TaskState.WAITING_FOR_DUE_DATE)
+        context.set_data({"data": {"task_id": param.task_id}})
+        keyboard = self.keyboard_template(user_id)
+        if param.flag:
+            keyboard.append([InlineKeyboardButton(
+                "Remove due date", callback_data=self.callbacks.pack(user_id, "clear_due_date", task_id=param.task_id)
+            )])
+        await self.sender.reply(callback_query.message,
+            "Enter the due date in UTC: YYYY-MM-DD HH:MM, YYYY-MM-DD or in how long: +30m, +2h, +3d, +1w. "
+            "You will get a reminder at that time.",
+            reply_markup=InlineKeyboardMarkup(keyboard))
+
+    @error_handler
+    async def get_due_date(self, client: Client, message: Message):
+        """Сохраняет срок задачи и ставит напоминание на это время."""
+        try:
+            due_at = parse_due_date(message.text or "", datetime.now(timezone.utc))
+        except ValueError:
+            await self.sender.reply(message, "Couldn't read the date. Example: 2030-01-31 18:00 or +2h")
+            return
+        context = await self.storage.context(message)
+        await self.save_due_date(message, message.from_user.id, context.data["data"]["task_id"], due_at)
+
+    @error_handler
+    async def clear_due_date_handler(self, client: Client, callback_query: CallbackQuery, param: CallbackData):
+        """Убирает срок задачи и ее напоминание."""
+        await self.save_due_date(callback_query, callback_query.from_user.id, param.task_id, None)
+
+    async def save_due_date(self, update, user_id: int, task_id: int, due_at):
+        """
+        Записывает срок задачи. Напоминание ставится на срок, аренда прежнего напоминания снимается,
+        поэтому уже забранное планировщиком старое напоминание не будет отправлено.
+        Аргументы:
+            update (Message | CallbackQuery): Обновление пользователя.
+            user_id (int): Телеграм ID пользователя.
+            task_id (int): ID задачи.
+            due_at (datetime | None): Новый срок, None - убрать срок.
+        """
+        result = await self.__session.update_task(Task, "id", int(task_id),
+                                                  {"due_at": due_at, "remind_at": due_at, "reminder_lease": None},
+                                                  tg_user_id=user_id)
+        message = update.message if isinstance(update, CallbackQuery) else update
+        if not result:
+            await self.sender.reply(message, "There's been an error. Try again later.")
+        elif due_at:
+            await self.sender.reply(message, f"The task is due {due_at:%Y-%m-%d %H:%M} UTC.")
+            logger.info("User %s has set the due date of task %s", user_id, task_id)
+        else:
+            await self.sender.reply(message, "The task no longer has a due date.")
+        context = await self.storage.context(update)
+        context.clear()
+        await self.sender.reply(message, "Choose an action in menu")
+
+    @error_handler
+    async def change_task_status_handler(self, client: Client, callback_query: CallbackQuery, param: CallbackData):
         """
         Обновляет статус задачи.
         Аргументы:
-            param (str): Новый статус задачи.
+            param (CallbackData): ID задачи и новый статус.
         """
         user_id = callback_query.from_user.id
-        status = param
-        data = await self.storage.get_data(user_id)
-        task_data = data.get("data")
-        task_id = task_data["task_id"]
+        status = param.status
+        task_id = param.task_id
         result = await self.__session.update_task(Task, "id", int(task_id),
-                                                  {"status":status})
+                                                  {"status":status}, tg_user_id=user_id)
         if result:
-            await callback_query.message.reply(f"Task `{task_data['task_name']}` has successfully updated the status on {status}.")
-            logger.info(f"User {user_id} has successfully updated the status of task {task_data['task_name']}")
+            await self.sender.reply(callback_query.message, f"The task status has been successfully updated to {status}.")
+            logger.info("User %s has successfully updated the status of task %s", user_id, task_id)
         else:
-            await callback_query.message.reply(f"There's been an error. Try again later.")
+            await self.sender.reply(callback_query.message, f"There's been an error. Try again later.")
         await self.cancel_command(client, callback_query)
     
-    async def delete_task_handler(self, client: Client, callback_query: CallbackQuery, param: None):
+    @metrics.timed("handler")
+    async def delete_task_handler(self, client: Client, callback_query: CallbackQuery, param: CallbackData):
         """Подтверждает удаление задачи пользователем."""
         user_id = callback_query.from_user.id
-        data = await self.storage.get_data(user_id)
-        task_data = data.get("data")
-        await self.storage.set_state(user_id, TaskState.CHANGE_DETAIL_TASK.format(taskId=task_data["task_id"]))
-        keyboard = self.keyboard_template.copy()
-        keyboard.extend([[InlineKeyboardButton("Back", callback_data="back_stage")],
-                         [InlineKeyboardButton("Yes, delete it.", callback_data="confirm_deletion")],
+        pack = self.callbacks.packer(user_id)
+        keyboard = self.keyboard_template(user_id)
+        keyboard.extend([[InlineKeyboardButton("Back", callback_data=pack("detail_task", task_id=param.task_id,
+                                                                             page=param.page))],
+                         [InlineKeyboardButton("Yes, delete it.",
+                                               callback_data=pack("confirm_deletion", task_id=param.task_id))],
             ])
-        await callback_query.message.reply(f"Are you sure you want to delete the task?",
-                                           reply_markup=InlineKeyboardMarkup(keyboard))
+        await self.show(callback_query, "Are you sure you want to delete the task?", InlineKeyboardMarkup(keyboard))
     
-    async def confirm_deletion_handler(self, client: Client, callback_query: CallbackQuery, param: None):
+    @metrics.timed("handler")
+    async def confirm_deletion_handler(self, client: Client, callback_query: CallbackQuery, param: CallbackData):
         """Удаляет задачу из базы данных."""
         user_id = callback_query.from_user.id
-        data = await self.storage.get_data(user_id)
-        task_data = data.get("data")
-        task_id = data.get("data")["task_id"]
-        result = await self.__session.delete_task(int(task_id))
+        task_id = param.task_id
+        result = await self.__session.delete_task(int(task_id), tg_user_id=user_id)
         if result:
-            await callback_query.message.reply(f"Task `{task_data['task_name']}` successfully deleted.")
-            logger.info(f"User {user_id} successfully deleted task {task_data['task_name']}")
+            await self.sender.reply(callback_query.message, "The task has been successfully deleted.")
+            logger.info("User %s successfully deleted task %s", user_id, task_id)
         else:
-            await callback_query.message.reply(f"There's been an error. Try again later.")
-        await self.cancel_command(client, callback_query)
\ No newline at end of file
+            await self.sender.reply(callback_query.message, f"There's been an error. Try again later.")
+        await self.cancel_command(client, callback_query)
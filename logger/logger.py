@@ -1,7 +1,11 @@
-
 import os
+import json
 import errno
+import queue
 import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from config.config import settings
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.abspath(os.path.join(SCRIPT_DIR, os.pardir))
@@ -9,35 +13,102 @@ parent_dir = os.path.abspath(os.path.join(SCRIPT_DIR, os.pardir))
 log_dir = os.path.join(parent_dir, 'logs')
 log_file = os.path.join(log_dir, 'app.log')
 
-if not os.path.exists(log_dir):
-    try:
-        os.makedirs(log_dir)
-        os.chmod(log_dir, 0o777)
-    except OSError as e:
-        if e.errno != errno.EEXIST:
-            raise
-
-if not os.path.exists(log_file):
-    with open(log_file, 'a'):
-        os.utime(log_file, None)
-os.chmod(log_file, 0o666)
-
-
-logging.getLogger("pyrogram").setLevel(logging.WARNING)
-logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)  
-logging.getLogger("sqlalchemy").setLevel(logging.WARNING)   
-
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.DEBUG,
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler()
-    ]
-)
-error_handler = logging.StreamHandler()
-error_handler.setLevel(logging.ERROR)
-error_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 
 logger = logging.getLogger("test_bot")
-logger.addHandler(error_handler)
\ No newline at end of file
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись лога в одну строку JSON для систем сбора логов."""
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+def _prepare_log_file():
+    """Создает директорию и файл логов с нужными правами, если их еще нет."""
+    if not os.path.exists(log_dir):
+        try:
+            os.makedirs(log_dir)
+            os.chmod(log_dir, 0o777)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    if not os.path.exists(log_file):
+        with open(log_file, 'a'):
+            os.utime(log_file, None)
+    os.chmod(log_file, 0o666)
+
+
+def setup_logging() -> QueueListener:
+    """
+    Настраивает неблокирующее логирование.
+    Обработчики в event loop только кладут запись в очередь (QueueHandler),
+    а запись в файл с ротацией по размеру и в консоль выполняет фоновый поток (QueueListener).
+    Возвращает:
+        QueueListener: Запущенный слушатель очереди, его нужно остановить при завершении работы.
+    """
+    _prepare_log_file()
+
+    logging.getLogger("pyrogram").setLevel(logging.WARNING)
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+    logging.getLogger("sqlalchemy").setLevel(logging.WARNING)
+
+    formatter = JsonFormatter() if settings.log_json else logging.Formatter(LOG_FORMAT)
+    file_handler = RotatingFileHandler(
+        log_file,
+        maxBytes=settings.log_max_bytes,
+        backupCount=settings.log_backup_count,
+        encoding="utf-8",
+    )
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(log_queue)]
+    root.setLevel(settings.log_level.upper())
+
+    listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def setup_worker_logging(log_queue):
+    """
+    Настраивает логирование в дочернем процессе: записи передаются через очередь процессу,
+    который пишет их в файл и в консоль (см. forward_worker_logs), поэтому файл лога
+    открывает и ротирует только один процесс.
+    Аргументы:
+        log_queue (multiprocessing.Queue): Очередь записей лога родительского процесса.
+    """
+    logging.getLogger("pyrogram").setLevel(logging.WARNING)
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+    logging.getLogger("sqlalchemy").setLevel(logging.WARNING)
+
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(log_queue)]
+    root.setLevel(settings.log_level.upper())
+
+
+def forward_worker_logs(log_queue) -> QueueListener:
+    """
+    Запускает фоновый поток, передающий записи дочерних процессов обработчикам корневого логгера
+    текущего процесса (после setup_logging - в его очередь, в файл и в консоль).
+    Аргументы:
+        log_queue (multiprocessing.Queue): Очередь, переданная в setup_worker_logging дочерних процессов.
+    Возвращает:
+        QueueListener: Запущенный слушатель очереди, его нужно остановить после завершения дочерних процессов.
+    """
+    listener = QueueListener(log_queue, *logging.getLogger().handlers, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -1,21 +1,36 @@
+import time
+# Начало запуска процесса, от него считается время импортов и общее время запуска.
+STARTED_AT = time.perf_counter()
+
 import logging
 import asyncio
 
 from pyrogram import Client
 
 from config.config import settings
-from logger.logger import logger
+from logger.logger import setup_logging
 
 from database import Database
-from fsm import FSMStorage
+from database.databasehelper import CRUD
+from fsm import create_redis, create_storage
+from utils.cache import UserCache, KeyboardCache, SearchCache
+from utils.dispatcher import UpdateDispatcher
+from utils.sender import MessageSender
+from utils.reminders import ReminderScheduler
+from utils.metrics import metrics, MetricsServer
+from utils.startup import StartupTimer
+from utils.callback_data import CallbackCodec
 
 from models.migrations.create_tables import run_migrations
 from handlers.registration import RegistrationHandler
 from handlers.tasks import TaskHandler
+from handlers.admin import AdminHandler
+from states.state_filter import StateRouter
+
+IMPORTS_DONE_AT = time.perf_counter()
 
 BOT_NAME = "my_test_bot"
 logger = logging.getLogger('test_bot')
-storage = FSMStorage()
 
 def create_client(bot_name: str) -> Client:
     """
@@ -43,6 +58,45 @@ def create_app(client: Client = None) -> "BotApp":
     """
     return BotApp(client or create_client(BOT_NAME))
 
+async def create_worker_app(shard: int) -> "BotApp":
+    """
+    Создает и запускает приложение бота в процессе-воркере супервизора.
+    Клиент воркера не получает обновления от Telegram (их раздает супервизор), а только отправляет ответы.
+    Миграции применяет супервизор до запуска воркеров.
+    Аргументы:
+        - shard - номер воркера.
+    Возвращаем:
+        Запущенный экземляр приложения бота.
+    """
+    client = Client(
+        name=f"{BOT_NAME}_worker{shard}",
+        api_id=settings.api_id,
+        api_hash=settings.api_hash,
+        bot_token=settings.bot_token,
+        no_updates=True,
+    )
+    app = BotApp(client)
+    await app.setup(migrate=False)
+    if settings.metrics_port:
+        await app.start_metrics(settings.metrics_port + shard)
+    with app.startup.phase("client_start"):
+        await client.start()
+    await app.start_background_jobs()
+    app.startup.log()
+    return app
+
+def create_supervisor(workers: int) -> "Supervisor":
+    """
+    Создает супервизор, раздающий обновления процессам-воркерам по Телеграм ID пользователя.
+    Аргументы:
+        - workers - количество процессов-воркеров.
+    Возвращаем:
+        Экземляр супервизора.
+    """
+    # Модуль супервизора нужен только в режиме нескольких процессов.
+    from utils.supervisor import Supervisor
+    return Supervisor(create_client(BOT_NAME), workers, create_worker_app, prepare=run_migrations)
+
 
 class BotApp:
     """
@@ -51,27 +105,162 @@ class BotApp:
         app (client): Клиент Pyrogram для взаимодействия с телеграм API.
         stop_event (asyncio.Event): Событие для остановки бота.
         db (Database): Экземпляр базы данных для работы с данными.
+        crud (CRUD): Операции с базой данных, общие для всех обработчиков.
+                     При TASK_WRITE_BUFFER изменения задач записываются пачками (BufferedCRUD).
+        redis (Redis | None): Общий клиент Redis, если он нужен хранилищу FSM или кэшу.
+        storage (FSMStorage): Хранилище состояний FSM, выбранное в настройках.
+        user_cache (UserCache): Кэш зарегистрированных пользователей, общий для всех обработчиков.
+        keyboard_cache (KeyboardCache | None): Кэш страниц списка задач, сбрасывается при изменении задач.
+        search_cache (SearchCache | None): Кэш результатов поиска задач, сбрасывается при изменении задач.
+        dispatcher (UpdateDispatcher): Диспетчер обновлений: по порядку для пользователя, параллельно между пользователями.
+        sender (MessageSender): Очередь исходящих сообщений с учетом лимитов Telegram.
+        callbacks (CallbackCodec): Подпись и разбор callback_data инлайн-кнопок, ключ общий для всех экземпляров бота.
+        reminders (ReminderScheduler | None): Планировщик напоминаний о сроках задач.
+        broadcaster (Broadcaster | None): Рассылка сообщений всем пользователям, если заданы администраторы.
+        metrics_server (MetricsServer | None): HTTP-эндпоинт метрик, если он включен в настройках.
+        startup (StartupTimer): Время этапов запуска.
     """
     def __init__(self, client):
         self.app = client
         self.stop_event = asyncio.Event()
+        self.startup = StartupTimer(STARTED_AT)
+        self.startup.add("imports", IMPORTS_DONE_AT - STARTED_AT)
         self.db = Database()
+        if settings.task_write_buffer:
+            from database.write_buffer import BufferedCRUD
+            self.crud = BufferedCRUD(self.db.session, settings.task_write_window, settings.task_write_max_batch)
+        else:
+            self.crud = CRUD(self.db.session)
+        self.redis = None
+        if settings.fsm_backend == "redis" or settings.user_cache_shared or settings.keyboard_cache_shared:
+            self.redis = create_redis()
+        self.storage = create_storage(self.redis)
+        self.user_cache = UserCache(
+            settings.user_cache_size,
+            settings.user_cache_ttl,
+            redis=self.redis if settings.user_cache_shared else None,
+        )
+        self.keyboard_cache = None
+        if settings.keyboard_cache_size:
+            self.keyboard_cache = KeyboardCache(
+                settings.keyboard_cache_size,
+                settings.keyboard_cache_ttl,
+                redis=self.redis if settings.keyboard_cache_shared else None,
+            )
+        self.search_cache = None
+        if settings.search_cache_size:
+            self.search_cache = SearchCache(settings.search_cache_size, settings.search_cache_ttl)
+        self.dispatcher = UpdateDispatcher(
+            settings.dispatcher_max_concurrency,
+            settings.dispatcher_max_pending,
+            storage=self.storage,
+        )
+        self.sender = MessageSender(
+            client,
+            global_rate=settings.sender_global_rate,
+            chat_rate=settings.sender_chat_rate,
+            chat_burst=settings.sender_chat_burst,
+            workers=settings.sender_workers,
+            max_retries=settings.sender_max_retries,
+        )
+        self.callbacks = CallbackCodec(settings.callback_secret or settings.bot_token)
+        self.reminders = None
+        if settings.reminder_poll_interval:
+            self.reminders = ReminderScheduler(
+                self.crud,
+                self.sender,
+                poll_interval=settings.reminder_poll_interval,
+                lease=settings.reminder_lease,
+                batch_size=settings.reminder_batch_size,
+            )
+        self.broadcaster = None
+        if settings.admin_ids:
+            # Модуль рассылки нужен только при заданных администраторах.
+            from utils.broadcast import Broadcaster
+            self.broadcaster = Broadcaster(
+                self.crud,
+                self.sender,
+                redis=self.redis,
+                chunk_size=settings.broadcast_chunk_size,
+                concurrency=settings.broadcast_concurrency,
+            )
+        self.metrics_server = None
 
-    async def setup(self,):
+    async def setup(self, migrate: bool = True):
         """
         Настраивает приложение перед запуском:
-        - Применяет миграции базы данных (если нужно).
         - Инициализирует подключение к базе данных.
+        - Применяет миграции базы данных (если нужно) через тот же движок.
+        - Параллельно с миграциями открывает соединения пула БД и Redis.
         - Регистрирует обработчики событий.
+        Аргументы:
+            migrate (bool): Применять миграции (в воркерах супервизора их уже применил супервизор).
+        """
+        with self.startup.phase("db_init"):
+            await self.db.init()
+
+        steps = []
+        if migrate:
+            # Проверяет версию схемы одним запросом и применяет недостающие миграции.
+            logger.info("Applying migrations...")
+            steps.append(self.startup.timed("migrations", run_migrations(self.db.engine)))
+        if settings.warmup_connections:
+            steps.append(self.startup.timed("db_warmup", self.db.warm_up(settings.warmup_connections)))
+            if self.redis:
+                steps.append(self.startup.timed("redis_warmup", self._warm_up_redis(settings.warmup_connections)))
+        await asyncio.gather(*steps)
+
+        with self.startup.phase("handlers"):
+            self.register_handlers()
+
+    async def _warm_up_redis(self, connections: int):
+        """
+        Открывает соединения с Redis параллельно, в том числе пул хранилища FSM (без декодирования ответов).
+        Ошибка прогрева только логируется.
         """
-        # Проверяет, есть ли нужные таблицы для работы бота, если нет, то создает их.
-        logger.info("Applying migrations...")
-        await run_migrations()
+        connections = min(connections, settings.redis_max_connections)
+        clients = [self.redis]
+        if getattr(self.storage, "redis_conn", None) is not None:
+            clients.append(self.storage.redis_conn)
+        results = await asyncio.gather(
+            *(client.ping() for client in clients for _ in range(connections)), return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            logger.error("Redis warm-up failed: %s", errors[0])
 
-        await self.db.init()
+    def register_handlers(self):
+        """Регистрирует обработчики событий в клиенте Pyrogram."""
         logger.info("Registering handlers...")
-        RegistrationHandler(self.app, self.db, storage).register()
-        TaskHandler(self.app, self.db, storage).register()
+        state_router = StateRouter(self.storage, self.dispatcher)
+        handler_args = (self.app, self.crud, self.storage, self.user_cache, self.dispatcher, self.sender, state_router)
+        if self.keyboard_cache:
+            self.crud.add_task_listener(self.keyboard_cache.invalidate)
+        if self.search_cache:
+            self.crud.add_task_listener(self.search_cache.invalidate)
+        RegistrationHandler(*handler_args).register()
+        if self.broadcaster:
+            AdminHandler(self.app, self.dispatcher, self.sender, self.broadcaster, settings.admin_ids).register()
+        TaskHandler(
+            *handler_args,
+            keyboard_cache=self.keyboard_cache,
+            edit_in_place=settings.navigation_edit_in_place,
+            search_cache=self.search_cache,
+            callbacks=self.callbacks,
+        ).register()
+        # Сообщения по состоянию FSM маршрутизируются последними, после всех команд.
+        state_router.register(self.app)
+
+    async def start_background_jobs(self):
+        """
+        Запускает планировщик напоминаний и продолжает прерванную рассылку.
+        Их можно запускать в каждом экземпляре и процессе бота: напоминания распределяются между ними
+        через аренду в БД, а рассылку ведет только владелец блокировки в Redis.
+        """
+        if self.reminders:
+            self.reminders.start()
+        if self.broadcaster:
+            await self.broadcaster.resume()
 
     async def _run_bot(self):
         """
@@ -79,26 +268,106 @@ class BotApp:
         Выполняет настройку, запускает бота и ожидает события остановки.
         """
         await self.setup()
+        if settings.metrics_port:
+            await self.start_metrics()
         logger.info("Starting bot...")
-        await self.app.start()
+        with self.startup.phase("client_start"):
+            await self.app.start()
+        await self.start_background_jobs()
+        self.startup.log()
+        stats_task = None
+        if settings.db_pool_stats_interval:
+            stats_task = asyncio.create_task(self._log_stats(settings.db_pool_stats_interval))
         try:
             await self.stop_event.wait()
         finally:
-            await self.app.stop()
-            await self.db.close()
-            await storage.close()
-            logger.info("Bot stopped gracefully..")
+            if stats_task:
+                stats_task.cancel()
+            await self.shutdown()
+
+    async def shutdown(self):
+        """
+        Останавливает клиент и дожидается обработки принятых обновлений, напоминаний,
+        отправки сообщений и записи изменений, затем закрывает соединения.
+        """
+        await self.app.stop()
+        if self.metrics_server:
+            await self.metrics_server.close()
+        await self.dispatcher.join()
+        if self.reminders:
+            await self.reminders.close()
+        if self.broadcaster:
+            await self.broadcaster.close()
+        await self.sender.close()
+        await self.crud.close()
+        await self.db.close()
+        await self.storage.close()
+        if self.redis:
+            await self.redis.close()
+        logger.info("Bot stopped gracefully..")
+
+    async def start_metrics(self, port: int = None):
+        """
+        Включает сбор метрик и запускает HTTP-эндпоинт /metrics.
+        Кроме метрик обработчиков, эндпоинт отдает текущее состояние пула БД, кэша, диспетчера, очереди отправки
+        и напоминаний.
+        Аргументы:
+            port (int, optional): Порт эндпоинта, по умолчанию METRICS_PORT.
+        """
+        metrics.enabled = True
+        metrics.register_collector("db_pool", self.db.pool_stats)
+        metrics.register_collector("user_cache", self.user_cache.stats)
+        metrics.register_collector("dispatcher", self.dispatcher.stats)
+        metrics.register_collector("sender", self.sender.stats)
+        if self.keyboard_cache:
+            metrics.register_collector("keyboard_cache", self.keyboard_cache.stats)
+        if self.search_cache:
+            metrics.register_collector("search_cache", self.search_cache.stats)
+        if settings.task_write_buffer:
+            metrics.register_collector("task_writes", self.crud.buffer.stats)
+        if self.reminders:
+            metrics.register_collector("reminders", self.reminders.stats)
+        if self.broadcaster:
+            metrics.register_collector("broadcast", self.broadcaster.stats)
+        self.metrics_server = MetricsServer(metrics, settings.metrics_host, port or settings.metrics_port)
+        await self.metrics_server.start()
+
+    async def _log_stats(self, interval: int):
+        """
+        Периодически логирует состояние пула соединений с БД, кэша и очередей обновлений.
+        Аргументы:
+            interval (int): Период логирования в секундах.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            logger.info("DB pool stats: %s", self.db.pool_stats())
+            logger.info("User cache stats: %s", self.user_cache.stats())
+            if self.keyboard_cache:
+                logger.info("Keyboard cache stats: %s", self.keyboard_cache.stats())
+            if self.search_cache:
+                logger.info("Search cache stats: %s", self.search_cache.stats())
+            logger.info("Dispatcher stats: %s", self.dispatcher.stats())
+            logger.info("Sender stats: %s", self.sender.stats())
+            if self.reminders:
+                logger.info("Reminder stats: %s", self.reminders.stats())
 
     def run(self):
         """
         Запускает асинхронный цикл событий для работы бота.
         """
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(self._run_bot())
+        log_listener = setup_logging()
+        try:
+            loop = asyncio.get_event_loop()
+            loop.run_until_complete(self._run_bot())
+        finally:
+            log_listener.stop()
     
 
 if __name__ == "__main__":
-    bot_app = create_app()
-    bot_app.run()
+    if settings.bot_workers > 1:
+        create_supervisor(settings.bot_workers).run()
+    else:
+        bot_app = create_app()
+        bot_app.run()
 
 
@@ -1,4 +1,5 @@
 
+from logger.logger import setup_logging
 from models.migrations.create_tables import run_migrations
 
 async def main():
@@ -6,4 +7,8 @@ async def main():
 
 if __name__ == "__main__":
     import asyncio
-    asyncio.run(main())
\ No newline at end of file
+    log_listener = setup_logging()
+    try:
+        asyncio.run(main())
+    finally:
+        log_listener.stop()
\ No newline at end of file
@@ -1,14 +1,13 @@
 import asyncio
 
 from sqlalchemy.ext.asyncio import create_async_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import text
 
 from config.config import settings
+from models.migrations.runner import Migration, MigrationRunner
 
-Base = declarative_base()
-
-MIGRATION_SCRIPT = ["""
+# Шаги миграций применяются по возрастанию версии. Уже выпущенные шаги не меняем - только добавляем новые.
+MIGRATIONS = [
+    Migration(1, "create Users table", ["""
 create table if not exists "Users"
 (
     id         serial
@@ -19,9 +18,9 @@ create table if not exists "Users"
     tg_user_id bigint unique,
     status     varchar(10)               default 'Active',
     created_at timestamp with time zone default now()
-); """,
+); """]),
 
-"""create table if not exists public."Tasks"
+    Migration(2, "create Tasks table", ["""create table if not exists public."Tasks"
 (
     id               serial
     constraint "Tasks_pkey"
@@ -33,15 +32,63 @@ create table if not exists "Users"
     created_at       timestamp with time zone default now(),
     last_update      timestamp with time zone default now()::timestamp with time zone
 );
-"""]
-
-async def run_migrations():
-    engine = create_async_engine(settings.get_db_url(), echo=True)
-    async with engine.begin() as conn:
-        for script in MIGRATION_SCRIPT:
-            await conn.execute(text(script))
-            print("Migration applied successfully.")
-    await engine.dispose()
+"""]),
+
+    Migration(3, "index Tasks by user and creation order", ["""
+create index concurrently if not exists "ix_Tasks_tg_user_id_created_at_id"
+    on "Tasks" (tg_user_id, created_at, id);
+"""], concurrently=True),
+
+    Migration(4, "index Users by login", ["""
+create index concurrently if not exists "ix_Users_login"
+    on "Users" (login);
+"""], concurrently=True),
+
+    Migration(5, "enable pg_trgm and btree_gin", [
+        "create extension if not exists pg_trgm;",
+        "create extension if not exists btree_gin;",
+    ]),
+
+    # Выражение индекса совпадает с TASK_SEARCH_TEXT в database/databasehelper.py.
+    Migration(6, "trigram search index on Tasks name and description", ["""
+create index concurrently if not exists "ix_Tasks_search_trgm"
+    on "Tasks" using gin (
+        tg_user_id,
+        (lower(coalesce(name, '') || ' ' || coalesce(description, ''))) gin_trgm_ops
+    );
+"""], concurrently=True),
+
+    Migration(7, "due dates and reminders on Tasks", ["""
+alter table "Tasks"
+    add column if not exists due_at         timestamp with time zone,
+    add column if not exists remind_at      timestamp with time zone,
+    add column if not exists reminder_lease timestamp with time zone;
+"""]),
+
+    # Частичный индекс содержит только неотправленные напоминания, его размер не зависит от количества задач.
+    Migration(8, "index pending reminders", ["""
+create index concurrently if not exists "ix_Tasks_remind_at"
+    on "Tasks" (remind_at)
+    where remind_at is not null;
+"""], concurrently=True),
+]
+
+
+async def run_migrations(engine=None):
+    """
+    Применяет недостающие миграции.
+    Аргументы:
+        engine (AsyncEngine, optional): Движок бота. Если не указан, создается отдельный движок,
+                                        который закрывается после миграций (запуск из командной строки).
+    """
+    if engine is not None:
+        await MigrationRunner(engine, MIGRATIONS).run()
+        return
+    engine = create_async_engine(settings.get_db_url(), echo=False)
+    try:
+        await MigrationRunner(engine, MIGRATIONS).run()
+    finally:
+        await engine.dispose()
 
 if __name__ == "__main__":
     asyncio.run(run_migrations())
@@ -0,0 +1,142 @@
+import re
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger('test_bot')
+
+# Имя индекса в шаге `CREATE INDEX CONCURRENTLY IF NOT EXISTS`.
+CONCURRENT_INDEX = re.compile(
+    r'create\s+(?:unique\s+)?index\s+concurrently\s+if\s+not\s+exists\s+"?([^"\s]+)"?', re.IGNORECASE
+)
+
+# Ключ advisory-блокировки, чтобы миграции не выполнялись одновременно несколькими экземплярами бота.
+MIGRATION_LOCK_ID = 7310418
+
+VERSION_TABLE_SCRIPT = """
+create table if not exists "SchemaVersion"
+(
+    version    integer primary key,
+    name       varchar(255) not null,
+    applied_at timestamp with time zone default now()
+);
+"""
+
+
+class Migration:
+    """
+    Описание одного шага миграции.
+    Атрибуты:
+        version (int): Номер версии схемы, который устанавливает шаг.
+        name (str): Короткое описание шага.
+        statements (list): Идемпотентные SQL-скрипты шага.
+        concurrently (bool): Шаг содержит `CREATE INDEX CONCURRENTLY` и выполняется вне транзакции.
+    """
+    def __init__(self, version: int, name: str, statements: list, concurrently: bool = False):
+        self.version = version
+        self.name = name
+        self.statements = statements
+        self.concurrently = concurrently
+
+
+class MigrationRunner:
+    """
+    Применяет версионированные миграции по порядку и записывает версию схемы в таблицу "SchemaVersion".
+    Атрибуты:
+        engine (AsyncEngine): Движок, через который выполняются миграции.
+        migrations (list): Список шагов Migration.
+    """
+    def __init__(self, engine, migrations: list):
+        self.engine = engine
+        self.migrations = sorted(migrations, key=lambda migration: migration.version)
+
+    @property
+    def latest_version(self) -> int:
+        return self.migrations[-1].version if self.migrations else 0
+
+    async def current_version(self, conn) -> int:
+        """
+        Возвращает текущую версию схемы одним запросом.
+        Если таблицы версий еще нет, схема считается пустой (версия 0).
+        """
+        try:
+            result = await conn.execute(text('select max(version) from "SchemaVersion"'))
+        except DBAPIError:
+            return 0
+        return result.scalar() or 0
+
+    async def run(self) -> int:
+        """
+        Применяет недостающие миграции.
+        Если схема актуальна, никакой DDL не выполняется.
+        Возвращает:
+            int: Количество примененных шагов.
+        """
+        async with self.engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            if await self.current_version(conn) >= self.latest_version:
+                logger.info("Database schema is up to date (version %s).", self.latest_version)
+                return 0
+            await conn.execute(text("select pg_advisory_lock(:lock_id)"), {"lock_id": MIGRATION_LOCK_ID})
+            try:
+                await conn.execute(text(VERSION_TABLE_SCRIPT))
+                # Версию перечитываем под блокировкой: миграции мог применить другой экземпляр.
+                current = await self.current_version(conn)
+                pending = [migration for migration in self.migrations if migration.version > current]
+                for migration in pending:
+                    await self._apply(conn, migration)
+            finally:
+                await conn.execute(text("select pg_advisory_unlock(:lock_id)"), {"lock_id": MIGRATION_LOCK_ID})
+        return len(pending)
+
+    async def _apply(self, conn, migration: Migration):
+        """
+        Применяет один шаг миграции и записывает его версию.
+        Обычные шаги выполняются в одной транзакции вместе с записью версии,
+        шаги с `CONCURRENTLY` - на соединении в режиме autocommit.
+        """
+        logger.info("Applying migration %s: %s", migration.version, migration.name)
+        if migration.concurrently:
+            for script in migration.statements:
+                match = CONCURRENT_INDEX.search(script)
+                if match:
+                    await self._create_index(conn, match.group(1), script)
+                else:
+                    await conn.execute(text(script))
+            await conn.execute(
+                text('insert into "SchemaVersion" (version, name) values (:version, :name) on conflict do nothing'),
+                {"version": migration.version, "name": migration.name},
+            )
+        else:
+            async with self.engine.begin() as transaction:
+                for script in migration.statements:
+                    await transaction.execute(text(script))
+                await transaction.execute(
+                    text('insert into "SchemaVersion" (version, name) values (:version, :name) on conflict do nothing'),
+                    {"version": migration.version, "name": migration.name},
+                )
+        logger.info("Migration %s applied successfully.", migration.version)
+
+    async def _index_valid(self, conn, name: str):
+        """Возвращает pg_index.indisvalid индекса или None, если индекса нет."""
+        result = await conn.execute(
+            text("select indisvalid from pg_index where indexrelid = to_regclass(:name)"),
+            {"name": f'"{name}"'},
+        )
+        return result.scalar()
+
+    async def _create_index(self, conn, name: str, script: str, attempts: int = 2):
+        """
+        Создает индекс скриптом `CREATE INDEX CONCURRENTLY IF NOT EXISTS` и проверяет, что он готов.
+        Прерванное или неудачное построение оставляет индекс INVALID, который `IF NOT EXISTS` пропускает,
+        поэтому такой индекс удаляется и строится заново. Если индекс так и не готов, версия не записывается.
+        """
+        for _ in range(attempts):
+            if await self._index_valid(conn, name) is False:
+                logger.warning("Index %s is invalid, rebuilding it.", name)
+                await conn.execute(text(f'drop index concurrently if exists "{name}"'))
+            await conn.execute(text(script))
+            if await self._index_valid(conn, name):
+                return
+        raise RuntimeError(f"Index {name} is still invalid after {attempts} attempts")
@@ -1,5 +1,6 @@
 
-from sqlalchemy import Column, Integer, String, Text, BigInteger, TIMESTAMP, text
+from sqlalchemy import Column, Integer, String, Text, BigInteger, TIMESTAMP, Index, text
+from sqlalchemy.orm import deferred
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -7,11 +8,41 @@ Base = declarative_base()
 class Task(Base):
     """Модель для представления задач в базе данных."""
     __tablename__ = "Tasks"
+    __table_args__ = (
+        Index("ix_Tasks_tg_user_id_created_at_id", "tg_user_id", "created_at", "id"),
+        Index("ix_Tasks_remind_at", "remind_at", postgresql_where=text("remind_at is not null")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(50), nullable=False)
-    description = Column(Text, nullable=False)
+    # Описание нужно только при редактировании, полные загрузки задачи его не читают.
+    description = deferred(Column(Text, nullable=False))
     tg_user_id = Column(BigInteger, nullable=False)
     status = Column(String(6), nullable=False, default="PROG")
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
     last_update = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"), onupdate=text("now()"))
+    due_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    # Время неотправленного напоминания и срок, до которого его забрал один из экземпляров бота.
+    remind_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    reminder_lease = Column(TIMESTAMP(timezone=True), nullable=True)
+
+
+class TaskSummary:
+    """
+    Легкое представление задачи для списков и карточки задачи.
+    Создается из строки Core-запроса без ORM: без описания, identity map и отслеживания изменений.
+    Атрибуты:
+        id (int): ID задачи.
+        name (str): Название задачи.
+        status (str): Статус задачи.
+        created_at (datetime): Дата создания.
+        due_at (datetime | None): Срок выполнения.
+    """
+    __slots__ = ("id", "name", "status", "created_at", "due_at")
+
+    def __init__(self, id, name, status, created_at, due_at=None):
+        self.id = id
+        self.name = name
+        self.status = status
+        self.created_at = created_at
+        self.due_at = due_at
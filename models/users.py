@@ -9,7 +9,7 @@ class User(Base):
     __tablename__ = "Users"
 
     id = Column(Integer, primary_key=True, index=True)
-    login = Column(String(255), nullable=False)
+    login = Column(String(255), nullable=False, index=True)
     username = Column(String(255), nullable=False)
     tg_user_id = Column(BigInteger, unique=True, nullable=False)
     status = Column(String(10), nullable=False, default="Active")
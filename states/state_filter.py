@@ -1,22 +1,51 @@
-
-from pyrogram.filters import create
+from pyrogram import Client, filters
 from pyrogram.types import Message
+from pyrogram.handlers import MessageHandler
 
 from fsm import FSMStorage
+from utils.dispatcher import UpdateDispatcher
 
-storage = FSMStorage()
 
-def state_filter(expected_state):
+class StateRouter:
     """
-    Создает пользовательский фильтр для проверки состояния пользователя в процессе работы FSM.
-    Аргументы:
-        expected_state (list or str): Состояние или список состояний, которые должны быть у пользователя 
-                                      для прохождения фильтра.
-    Возвращает:
-        Filter: Кастомный фильтр для использования с обработчиками Pyrogram.
+    Выбирает обработчик сообщения по состоянию FSM пользователя.
+    В отличие от фильтра Pyrogram, который проверяется до постановки обновления в очередь,
+    состояние читается в очереди пользователя диспетчера, когда предыдущие обновления пользователя
+    уже обработаны. Поэтому сообщение, отправленное сразу после команды (например, название задачи
+    после /create_task), обрабатывается в новом состоянии, а не теряется.
+    Загруженный контекст FSM прикрепляется к сообщению и переиспользуется обработчиком.
+
+    Атрибуты:
+        storage (FSMStorage): Хранилище состояний FSM.
+        dispatcher (UpdateDispatcher): Диспетчер, упорядочивающий обновления каждого пользователя.
+        routes (list): Пары (состояния, обработчик) в порядке добавления.
     """
-    async def func(_, __, message: Message):
-        user_id = message.from_user.id
-        state = await storage.get_state(user_id)
-        return state in expected_state
-    return create(func)
+    def __init__(self, storage: FSMStorage, dispatcher: UpdateDispatcher):
+        self.storage = storage
+        self.dispatcher = dispatcher
+        self.routes: list = []
+
+    def add(self, expected_state, callback):
+        """
+        Добавляет обработчик сообщений для состояний.
+        Аргументы:
+            expected_state (list or str): Состояние или список состояний, в которых сообщение передается обработчику.
+            callback (function): Обработчик с аргументами (client, message).
+        """
+        self.routes.append((expected_state, callback))
+
+    def register(self, app: Client):
+        """
+        Регистрирует маршрутизатор в клиенте Pyrogram. Вызывается после регистрации команд,
+        чтобы команды обрабатывались своими обработчиками в любом состоянии.
+        """
+        app.add_handler(MessageHandler(self.dispatcher.wrap(self.handle_message),
+                                       filters.create(lambda _, __, message: message.from_user is not None)))
+
+    async def handle_message(self, client: Client, message: Message):
+        """Передает сообщение первому обработчику, чьи состояния включают текущее состояние пользователя."""
+        context = await self.storage.context(message)
+        for expected_state, callback in self.routes:
+            if context.state in expected_state:
+                await callback(client, message)
+                return
@@ -13,6 +13,8 @@ class TaskState:
         CHANGE_TASK_DATA (str): Состояние для изменения списка задач.
         CHANGE_DETAIL_TASK (str): Шаблон состояния для изменения деталей задачи с указанием ID задачи.
         CHANGE_TASK_FIELD (str): Состояние для изменения поля задачи (сейчас используется для имени и описания).
+        WAITING_FOR_IMPORT (str): Состояние, при котором ожидается файл задач для импорта.
+        WAITING_FOR_DUE_DATE (str): Состояние, при котором ожидается срок задачи.
     """
     CREATE_TASK_STAGE = {
         "waiting_for_name": "Enter the name of the task (length maximum 50 characters):",
@@ -26,4 +28,6 @@ class TaskState:
     ]
     CHANGE_TASK_DATA = "my_tasks:0"
     CHANGE_DETAIL_TASK = "detail_task:{taskId}"
-    CHANGE_TASK_FIELD = "change_task_field"
\ No newline at end of file
+    CHANGE_TASK_FIELD = "change_task_field"
+    WAITING_FOR_IMPORT = "waiting_for_import"
+    WAITING_FOR_DUE_DATE = "waiting_for_due_date"
@@ -0,0 +1,322 @@
+import time
+import uuid
+import asyncio
+import logging
+
+from pyrogram.errors import Forbidden, UserIsBlocked, InputUserDeactivated, PeerIdInvalid
+from redis.exceptions import WatchError
+
+from utils.sender import BACKGROUND
+from utils.metrics import metrics
+
+logger = logging.getLogger('test_bot')
+
+# Пользователь заблокировал бота или удалил аккаунт - повторять отправку бесполезно.
+BLOCKED_ERRORS = (Forbidden, UserIsBlocked, InputUserDeactivated, PeerIdInvalid)
+
+
+class BroadcastProgress:
+    """
+    Состояние рассылки, которое сохраняется в Redis после каждой пачки пользователей.
+    Атрибуты:
+        broadcast_id (str): ID рассылки.
+        text (str): Текст рассылки.
+        admin_id (int): Телеграм ID администратора, который получит отчет.
+        last_user_id (int): "Users".id последнего обработанного пользователя.
+        delivered (int): Количество доставленных сообщений.
+        failed (int): Количество сообщений, которые не удалось отправить.
+        blocked (int): Количество пользователей, заблокировавших бота или удаливших аккаунт.
+        elapsed (float): Время рассылки (сек), включая прерванные запуски.
+    """
+    FIELDS = ("broadcast_id", "text", "admin_id", "last_user_id", "delivered", "failed", "blocked", "elapsed")
+
+    def __init__(self, broadcast_id: str, text: str, admin_id: int, last_user_id: int = 0,
+                 delivered: int = 0, failed: int = 0, blocked: int = 0, elapsed: float = 0.0):
+        self.broadcast_id = broadcast_id
+        self.text = text
+        self.admin_id = int(admin_id)
+        self.last_user_id = int(last_user_id)
+        self.delivered = int(delivered)
+        self.failed = int(failed)
+        self.blocked = int(blocked)
+        self.elapsed = float(elapsed)
+
+    @property
+    def processed(self) -> int:
+        return self.delivered + self.failed + self.blocked
+
+    def to_dict(self) -> dict:
+        return {field: str(getattr(self, field)) for field in self.FIELDS}
+
+    def report(self) -> str:
+        """Возвращает строку отчета: счетчики и скорость рассылки."""
+        rate = self.processed / self.elapsed if self.elapsed else 0.0
+        return (f"delivered {self.delivered}, failed {self.failed}, blocked {self.blocked}, "
+                f"{self.processed} users in {self.elapsed:.0f} s ({rate:.1f} msg/s)")
+
+
+class Broadcaster:
+    """
+    Рассылка сообщения всем зарегистрированным пользователям.
+    Телеграм ID пользователей читаются из БД пачками по chunk_size после "Users".id последнего обработанного
+    пользователя, каждая пачка - отдельным коротким запросом, в памяти только одна пачка.
+    Сообщения уходят через MessageSender с фоновым приоритетом (общий лимит и лимит чата, FloodWait),
+    одновременно ожидают отправки не больше concurrency сообщений.
+    После каждой пачки прогресс сохраняется в Redis, и прерванная рассылка продолжается
+    с последнего сохраненного пользователя (resume). Рассылку ведет один экземпляр бота - владелец блокировки в Redis.
+    Отмена записывается в Redis, поэтому ее может запросить любой экземпляр, а ведущий проверяет ее перед каждой пачкой.
+    Без Redis прогресс и отмена хранятся только в памяти процесса.
+
+    Атрибуты:
+        crud (CRUD): Операции с базой данных.
+        sender (MessageSender): Очередь исходящих сообщений.
+        redis (Redis | None): Клиент Redis для сохранения прогресса.
+        chunk_size (int): Количество пользователей в пачке.
+        concurrency (int): Сколько сообщений рассылки одновременно ожидают отправки.
+        lock_ttl (int): Время жизни блокировки рассылки (сек), продлевается после каждой пачки.
+        current (BroadcastProgress | None): Рассылка, которую ведет этот экземпляр.
+    """
+    STATE_KEY = "broadcast:state"
+    LOCK_KEY = "broadcast:lock"
+    CANCEL_KEY = "broadcast:cancel"
+
+    def __init__(self, crud, sender, redis=None, chunk_size: int = 500, concurrency: int = 16, lock_ttl: int = 300):
+        self.crud = crud
+        self.sender = sender
+        self.redis = redis
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.lock_ttl = lock_ttl
+        self.current = None
+        self._token = uuid.uuid4().hex
+        self._task = None
+        self._cancelled = False
+        self._stopping = False
+        self._interrupted = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self, admin_id: int, text: str) -> bool:
+        """
+        Запускает новую рассылку в фоне.
+        Возвращает:
+            bool: False, если уже идет рассылка (в этом или другом экземпляре бота).
+        """
+        if self.running or (self.redis and await self.load() is not None):
+            return False
+        progress = BroadcastProgress(uuid.uuid4().hex[:8], text, admin_id)
+        if not await self._acquire() or not await self._save(progress):
+            return False
+        self._launch(progress)
+        return True
+
+    async def resume(self) -> bool:
+        """
+        Продолжает прерванную рассылку из сохраненного в Redis прогресса, если ее не ведет другой экземпляр.
+        Возвращает:
+            bool: True, если рассылка продолжена.
+        """
+        if self.running:
+            return False
+        progress = await self.load()
+        if progress is None or not await self._acquire():
+            return False
+        logger.info("Resuming broadcast %s after user %s", progress.broadcast_id, progress.last_user_id)
+        self._launch(progress)
+        return True
+
+    async def cancel(self) -> bool:
+        """
+        Останавливает рассылку перед следующей пачкой, в каком бы экземпляре бота она ни шла.
+        Прерванная рассылка завершается как отмененная при следующем resume.
+        Возвращает:
+            bool: False, если рассылки нет.
+        """
+        if self.running:
+            self._cancelled = True
+        if not self.redis:
+            return self.running
+        progress = await self.load()
+        if progress is None:
+            return self.running
+        try:
+            metrics.roundtrip("redis")
+            await self.redis.set(self.CANCEL_KEY, progress.broadcast_id)
+        except Exception as e:
+            logger.error('An error occurred in the Broadcaster.cancel function when working with redis - %s.', e)
+            return self.running
+        return True
+
+    async def _cancel_requested(self, progress: BroadcastProgress) -> bool:
+        """Проверяет, запрошена ли отмена рассылки в этом или другом экземпляре бота."""
+        if self._cancelled or not self.redis:
+            return self._cancelled
+        try:
+            metrics.roundtrip("redis")
+            return await self.redis.get(self.CANCEL_KEY) == progress.broadcast_id
+        except Exception as e:
+            logger.error('An error occurred in the Broadcaster.cancel_requested function when working with redis - %s.', e)
+            return False
+
+    async def load(self):
+        """Возвращает сохраненный прогресс рассылки (BroadcastProgress) или None."""
+        if not self.redis:
+            return self.current if self._interrupted else None
+        try:
+            metrics.roundtrip("redis")
+            state = await self.redis.hgetall(self.STATE_KEY)
+        except Exception as e:
+            logger.error('An error occurred in the Broadcaster.load function when working with redis - %s.', e)
+            return None
+        return BroadcastProgress(**state) if state else None
+
+    def _launch(self, progress: BroadcastProgress):
+        self.current = progress
+        self._cancelled = self._stopping = self._interrupted = False
+        self._task = asyncio.create_task(self._run(progress))
+
+    async def _acquire(self) -> bool:
+        if not self.redis:
+            return True
+        try:
+            metrics.roundtrip("redis")
+            return bool(await self.redis.set(self.LOCK_KEY, self._token, nx=True, ex=self.lock_ttl))
+        except Exception as e:
+            logger.error('An error occurred in the Broadcaster.acquire function when working with redis - %s.', e)
+            return False
+
+    async def _save(self, progress: BroadcastProgress, finished: bool = False) -> bool:
+        """
+        Сохраняет прогресс и продлевает блокировку одной транзакцией, если блокировка все еще принадлежит
+        этому экземпляру. По завершении рассылки удаляет прогресс и блокировку.
+        Возвращает:
+            bool: False, если блокировкой завладел другой экземпляр - рассылку нужно остановить.
+        """
+        if not self.redis:
+            return True
+        try:
+            metrics.roundtrip("redis")
+            async with self.redis.pipeline() as pipe:
+                await pipe.watch(self.LOCK_KEY)
+                if await pipe.get(self.LOCK_KEY) != self._token:
+                    await pipe.unwatch()
+                    return False
+                pipe.multi()
+                if finished:
+                    pipe.delete(self.STATE_KEY, self.LOCK_KEY, self.CANCEL_KEY)
+                else:
+                    pipe.hset(self.STATE_KEY, mapping=progress.to_dict())
+                    pipe.expire(self.LOCK_KEY, self.lock_ttl)
+                await pipe.execute()
+        except WatchError:
+            return False
+        except Exception as e:
+            logger.error('An error occurred in the Broadcaster.save function when working with redis - %s.', e)
+            return False
+        return True
+
+    async def _release(self):
+        """Снимает блокировку без удаления прогресса: прерванную рассылку можно продолжить."""
+        if not self.redis:
+            return
+        try:
+            metrics.roundtrip("redis")
+            async with self.redis.pipeline() as pipe:
+                await pipe.watch(self.LOCK_KEY)
+                if await pipe.get(self.LOCK_KEY) == self._token:
+                    pipe.multi()
+                    pipe.delete(self.LOCK_KEY)
+                    await pipe.execute()
+                else:
+                    await pipe.unwatch()
+        except Exception as e:
+            logger.error('An error occurred in the Broadcaster.release function when working with redis - %s.', e)
+
+    async def _deliver(self, semaphore: asyncio.Semaphore, tg_user_id: int, text: str) -> str:
+        async with semaphore:
+            try:
+                await self.sender.send_message(tg_user_id, text, priority=BACKGROUND)
+            except BLOCKED_ERRORS:
+                return "blocked"
+            except Exception as e:
+                logger.warning("Broadcast message to user %s failed: %s", tg_user_id, e)
+                return "failed"
+        return "delivered"
+
+    async def _run(self, progress: BroadcastProgress):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        started, elapsed = time.monotonic(), progress.elapsed
+        status = "finished"
+        try:
+            while True:
+                if await self._cancel_requested(progress):
+                    status = "cancelled"
+                    break
+                chunk = await self.crud.get_user_ids_after(progress.last_user_id, self.chunk_size)
+                if not chunk:
+                    break
+                results = await asyncio.gather(
+                    *(self._deliver(semaphore, tg_user_id, progress.text) for _, tg_user_id in chunk)
+                )
+                for result in results:
+                    setattr(progress, result, getattr(progress, result) + 1)
+                progress.last_user_id = chunk[-1][0]
+                progress.elapsed = elapsed + time.monotonic() - started
+                if not await self._save(progress):
+                    logger.warning("Broadcast %s lock lost, stopping", progress.broadcast_id)
+                    self._interrupted = True
+                    return
+                if self._stopping:
+                    self._interrupted = True
+                    await self._release()
+                    return
+        except asyncio.CancelledError:
+            # Пачка не успела отправиться при остановке бота: прогресс сохранен после предыдущей пачки,
+            # и при продолжении часть пользователей этой пачки получит сообщение повторно.
+            self._interrupted = True
+            await self._release()
+            raise
+        except Exception as e:
+            logger.error("Broadcast %s stopped after user %s: %s", progress.broadcast_id, progress.last_user_id, e)
+            self._interrupted = True
+            await self._release()
+            await self._notify(progress, f"Broadcast interrupted, send /broadcast resume to continue: {progress.report()}")
+            return
+        progress.elapsed = elapsed + time.monotonic() - started
+        await self._save(progress, finished=True)
+        logger.info("Broadcast %s %s: %s", progress.broadcast_id, status, progress.report())
+        await self._notify(progress, f"Broadcast {status}: {progress.report()}")
+
+    async def _notify(self, progress: BroadcastProgress, text: str):
+        try:
+            await self.sender.send_message(progress.admin_id, text)
+        except Exception as e:
+            logger.error("Failed to send the broadcast report to %s: %s", progress.admin_id, e)
+
+    async def close(self, timeout: float = 30):
+        """
+        Останавливает рассылку при остановке бота после текущей пачки (не дольше timeout),
+        сохраненный прогресс остается для resume.
+        """
+        if not self.running:
+            return
+        self._stopping = True
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def stats(self) -> dict:
+        """Возвращает счетчики текущей рассылки."""
+        progress = self.current
+        if progress is None:
+            return {"running": 0, "delivered": 0, "failed": 0, "blocked": 0}
+        return {
+            "running": int(self.running),
+            "delivered": progress.delivered,
+            "failed": progress.failed,
+            "blocked": progress.blocked,
+        }
@@ -0,0 +1,314 @@
+import json
+import time
+import logging
+import itertools
+from collections import OrderedDict
+
+from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from utils.metrics import metrics
+
+logger = logging.getLogger('test_bot')
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Ограниченный по размеру кэш в памяти процесса с вытеснением LRU и временем жизни записей.
+    Атрибуты:
+        maxsize (int): Максимальное количество записей.
+        ttl (float): Время жизни записи в секундах.
+        hits (int): Количество попаданий.
+        misses (int): Количество промахов.
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key, default=None):
+        """Возвращает значение по ключу, если запись есть и не устарела."""
+        item = self._data.get(key, _MISSING)
+        if item is not _MISSING:
+            value, expires_at = item
+            if expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return default
+
+    def set(self, key, value):
+        """Сохраняет значение, при переполнении вытесняет давно не использованную запись."""
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key):
+        """Удаляет запись, если она есть."""
+        self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class UserCache:
+    """
+    Кэш факта регистрации пользователя, чтобы не ходить в БД на каждое нажатие кнопки.
+    Кэшируются только зарегистрированные пользователи. При наличии Redis кэш
+    разделяется между несколькими экземплярами бота.
+    Атрибуты:
+        local (TTLCache): Кэш в памяти процесса.
+        redis: Асинхронный клиент Redis или None.
+        redis_hits (int): Количество попаданий в кэш Redis.
+    """
+    KEY = "user_cache:{user_id}"
+
+    def __init__(self, maxsize: int, ttl: float, redis=None):
+        self.local = TTLCache(maxsize, ttl)
+        self.redis = redis
+        self.redis_hits = 0
+
+    async def is_registered(self, user_id: int, loader) -> bool:
+        """
+        Проверяет, зарегистрирован ли пользователь.
+        Аргументы:
+            user_id (int): Телеграм ID пользователя.
+            loader: Корутина-функция, загружающая пользователя из БД при промахе кэша.
+        Возвращает:
+            bool: True, если пользователь зарегистрирован.
+        """
+        if self.local.get(user_id):
+            return True
+        if self.redis:
+            try:
+                metrics.roundtrip("redis")
+                if await self.redis.exists(self.KEY.format(user_id=user_id)):
+                    self.redis_hits += 1
+                    self.local.set(user_id, True)
+                    return True
+            except Exception as e:
+                logger.error('An error occurred in the is_registered function when working with redis - %s.', e)
+        user = await loader(user_id)
+        if user:
+            await self.add(user_id)
+        return user is not None
+
+    async def add(self, user_id: int):
+        """Отмечает пользователя как зарегистрированного."""
+        self.local.set(user_id, True)
+        if self.redis:
+            try:
+                metrics.roundtrip("redis")
+                await self.redis.set(self.KEY.format(user_id=user_id), 1, ex=int(self.local.ttl))
+            except Exception as e:
+                logger.error('An error occurred in the add function when working with redis - %s.', e)
+
+    def stats(self) -> dict:
+        """Возвращает счетчики попаданий и промахов кэша."""
+        return {
+            "size": len(self.local),
+            "hits": self.local.hits + self.redis_hits,
+            "local_hits": self.local.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.local.misses - self.redis_hits,
+        }
+
+
+class KeyboardCache:
+    """
+    Кэш готовых ответов на страницы списка задач: текст и клавиатура для каждой пары (пользователь, страница).
+    Записи помечены версией задач пользователя. Любое изменение задач пользователя (CRUD.task_listeners)
+    выдает ему новую версию, и все его записи перестают совпадать с ней.
+    Локальные версии берутся из общего возрастающего счетчика, поэтому вытесненная версия
+    никогда не совпадет со старыми записями. При наличии Redis версия хранится в `tasks_version:{id}`
+    (INCR при изменении), а страницы - в хэше `tasks_keyboard:{id}`, общем для всех экземпляров бота.
+
+    Атрибуты:
+        local (TTLCache): Страницы в памяти процесса: (версия, текст, клавиатура).
+        versions (TTLCache): Текущие версии задач пользователей (без Redis).
+        redis: Асинхронный клиент Redis или None.
+        invalidations (int): Количество сбросов кэша.
+    """
+    VERSION_KEY = "tasks_version:{user_id}"
+    PAGES_KEY = "tasks_keyboard:{user_id}"
+
+    def __init__(self, maxsize: int, ttl: float, redis=None):
+        self.local = TTLCache(maxsize, ttl)
+        self.versions = TTLCache(maxsize, ttl)
+        self.redis = redis
+        self.invalidations = 0
+        self._stamps = itertools.count(1)
+
+    def _local_version(self, user_id):
+        version = self.versions.get(user_id)
+        if version is None:
+            version = next(self._stamps)
+            self.versions.set(user_id, version)
+        return version
+
+    async def get(self, user_id: int, page: str):
+        """
+        Возвращает закэшированный ответ на страницу списка задач.
+        Аргументы:
+            user_id (int): Телеграм ID пользователя.
+            page (str): Параметр страницы из callback_data ("0", "n<курсор>", "p<курсор>").
+        Возвращает:
+            tuple: (версия, текст, клавиатура или None). При промахе текст None,
+                   а версию нужно передать в set после построения ответа.
+        """
+        if not self.redis:
+            version = self._local_version(user_id)
+            entry = self.local.get((user_id, page))
+            if entry and entry[0] == version:
+                return entry
+            return version, None, None
+        try:
+            metrics.roundtrip("redis")
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.get(self.VERSION_KEY.format(user_id=user_id))
+                pipe.hget(self.PAGES_KEY.format(user_id=user_id), page)
+                version, raw = await pipe.execute()
+        except Exception as e:
+            logger.error('An error occurred in the KeyboardCache.get function when working with redis - %s.', e)
+            return None, None, None
+        if version is None:
+            # Версии еще нет (или она истекла) - создаем ее до чтения задач из БД.
+            try:
+                metrics.roundtrip("redis")
+                version = await self.redis.incr(self.VERSION_KEY.format(user_id=user_id))
+            except Exception as e:
+                logger.error('An error occurred in the KeyboardCache.get function when working with redis - %s.', e)
+                return None, None, None
+        version = int(version)
+        entry = self.local.get((user_id, page))
+        if entry and entry[0] == version:
+            return entry
+        if raw:
+            stored = json.loads(raw)
+            if stored["version"] == version:
+                entry = (version, stored["text"], self._markup(stored["rows"]))
+                self.local.set((user_id, page), entry)
+                return entry
+        return version, None, None
+
+    async def set(self, user_id: int, page: str, version, text: str, markup: InlineKeyboardMarkup = None):
+        """
+        Сохраняет ответ на страницу с версией, полученной из get до построения ответа.
+        Если задачи успели измениться, запись просто не совпадет с новой версией.
+        """
+        if not self.redis:
+            self.local.set((user_id, page), (version, text, markup))
+            return
+        if version is None:
+            return
+        try:
+            self.local.set((user_id, page), (version, text, markup))
+            stored = json.dumps({"version": version, "text": text, "rows": self._rows(markup)})
+            key = self.PAGES_KEY.format(user_id=user_id)
+            metrics.roundtrip("redis")
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.hset(key, page, stored)
+                pipe.expire(key, int(self.local.ttl))
+                pipe.expire(self.VERSION_KEY.format(user_id=user_id), int(self.local.ttl) * 10)
+                await pipe.execute()
+        except Exception as e:
+            logger.error('An error occurred in the KeyboardCache.set function when working with redis - %s.', e)
+
+    async def invalidate(self, user_id: int):
+        """Сбрасывает все страницы пользователя (подписчик CRUD.task_listeners)."""
+        self.invalidations += 1
+        if not self.redis:
+            self.versions.set(user_id, next(self._stamps))
+            return
+        try:
+            version_key = self.VERSION_KEY.format(user_id=user_id)
+            metrics.roundtrip("redis")
+            async with self.redis.pipeline() as pipe:
+                pipe.incr(version_key)
+                pipe.expire(version_key, int(self.local.ttl) * 10)
+                pipe.delete(self.PAGES_KEY.format(user_id=user_id))
+                await pipe.execute()
+        except Exception as e:
+            logger.error('An error occurred in the KeyboardCache.invalidate function when working with redis - %s.', e)
+
+    @staticmethod
+    def _rows(markup: InlineKeyboardMarkup):
+        if markup is None:
+            return None
+        return [[(button.text, button.callback_data) for button in row] for row in markup.inline_keyboard]
+
+    @staticmethod
+    def _markup(rows):
+        if rows is None:
+            return None
+        return InlineKeyboardMarkup([[InlineKeyboardButton(text, callback_data=data) for text, data in row] for row in rows])
+
+    def stats(self) -> dict:
+        """Возвращает счетчики кэша страниц."""
+        return {
+            "size": len(self.local),
+            "hits": self.local.hits,
+            "misses": self.local.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+class SearchCache:
+    """
+    Кэш результатов поиска задач в памяти процесса: для каждого пользователя хранит
+    до per_user последних запросов (текст, страница, размер страницы).
+    Все результаты пользователя сбрасываются при изменении его задач (CRUD.task_listeners).
+
+    Атрибуты:
+        local (TTLCache): Результаты поиска по пользователям.
+        per_user (int): Сколько последних запросов хранить для одного пользователя.
+        hits (int): Количество найденных в кэше запросов.
+        misses (int): Количество запросов, которых не было в кэше.
+        invalidations (int): Количество сбросов кэша.
+    """
+    def __init__(self, maxsize: int, ttl: float, per_user: int = 16):
+        self.local = TTLCache(maxsize, ttl)
+        self.per_user = per_user
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id: int, key: tuple):
+        """Возвращает закэшированный результат запроса или None."""
+        entries = self.local.get(user_id)
+        result = entries.get(key) if entries is not None else None
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def set(self, user_id: int, key: tuple, result):
+        """Сохраняет результат запроса, вытесняя самый старый запрос пользователя при переполнении."""
+        entries = self.local.get(user_id)
+        if entries is None:
+            entries = OrderedDict()
+        entries[key] = result
+        while len(entries) > self.per_user:
+            entries.popitem(last=False)
+        self.local.set(user_id, entries)
+
+    async def invalidate(self, user_id: int):
+        """Сбрасывает результаты поиска пользователя (подписчик CRUD.task_listeners)."""
+        self.invalidations += 1
+        self.local.delete(user_id)
+
+    def stats(self) -> dict:
+        """Возвращает счетчики кэша поиска."""
+        return {
+            "size": len(self.local),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
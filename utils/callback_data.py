@@ -0,0 +1,241 @@
+import hmac
+import base64
+import struct
+import hashlib
+import binascii
+from functools import partial
+
+# Версия формата - первый байт данных кнопки. Кнопки другой версии считаются устаревшими.
+VERSION = 1
+# Ограничение Telegram на длину callback_data.
+MAX_LENGTH = 64
+SIGNATURE_SIZE = 8
+_user_id = struct.Struct("<q")
+
+# Код действия - индекс в таблице. Таблица относится к версии формата: новые действия добавляются только в конец.
+ACTIONS = (
+    "cancel_task", "back_stage", "my_tasks", "search", "select_tasks", "toggle_task", "select_page",
+    "bulk_status", "bulk_delete", "confirm_bulk_delete", "detail_task", "choose_task_status",
+    "choose_task_data", "change_task_status", "choose_due_date", "clear_due_date", "delete_task",
+    "confirm_deletion",
+)
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+# Частые значения полей field и status кодируются одним байтом.
+STRINGS = ("name", "description", "PROG", "DONE", "CANC")
+STRING_CODES = {value: code for code, value in enumerate(STRINGS)}
+
+# Флаги присутствующих полей.
+TASK_ID, PAGE, NUMBER, FIELD, STATUS, FLAG = (1 << bit for bit in range(6))
+# Вид курсора страницы: первая страница, вперед от задачи, назад от задачи.
+PAGE_KINDS = ("0", "n", "p")
+
+
+class CallbackData:
+    """
+    Данные инлайн-кнопки: действие и контекст навигации, которые раньше хранились в FSM.
+    Атрибуты:
+        action (str): Действие из ACTIONS.
+        code (int): Код действия, индекс обработчика в таблице диспетчеризации.
+        task_id (int | None): ID задачи.
+        page (str | None): Курсор страницы списка задач ("0", `n<ключ>`, `p<ключ>`).
+        number (int | None): Номер страницы результатов поиска.
+        field (str | None): Поле задачи.
+        status (str | None): Статус задачи.
+        flag (bool): Признак, смысл которого задает действие.
+    """
+    __slots__ = ("action", "code", "task_id", "page", "number", "field", "status", "flag")
+
+    def __init__(self, action: str, task_id: int = None, page: str = None, number: int = None,
+                 field: str = None, status: str = None, flag: bool = False):
+        self.action = action
+        self.code = ACTION_CODES[action]
+        self.task_id = task_id
+        self.page = page
+        self.number = number
+        self.field = field
+        self.status = status
+        self.flag = flag
+
+    def __str__(self) -> str:
+        """Читаемый вид `действие:значение:...` для логов и нагрузочного теста."""
+        values = (self.task_id, self.page, self.number, self.field, self.status)
+        return ":".join([self.action, *(str(value) for value in values if value is not None)])
+
+    def __repr__(self) -> str:
+        return f"CallbackData({self}{', flag' if self.flag else ''})"
+
+
+def _write_varint(out: bytearray, value: int):
+    if value < 0:
+        raise ValueError("Negative numbers are not supported in callback data")
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(raw: bytes, position: int) -> tuple[int, int]:
+    value, shift = 0, 0
+    while True:
+        byte = raw[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def _write_string(out: bytearray, value: str):
+    code = STRING_CODES.get(value)
+    if code is not None:
+        out.append(0x80 | code)
+        return
+    encoded = value.encode()
+    if len(encoded) >= 0x80:
+        raise ValueError("The string is too long for callback data")
+    out.append(len(encoded))
+    out += encoded
+
+
+def _read_string(raw: bytes, position: int) -> tuple[str, int]:
+    size = raw[position]
+    position += 1
+    if size & 0x80:
+        return STRINGS[size & 0x7f], position
+    end = position + size
+    if end > len(raw):
+        raise IndexError("string out of range")
+    return raw[position:end].decode(), end
+
+
+class CallbackCodec:
+    """
+    Кодирует действие и контекст навигации в callback_data инлайн-кнопки и проверяет их при нажатии.
+    Данные: байт версии, код действия, флаги полей, поля (числа - varint, частые строки - один байт)
+    и подпись HMAC-SHA256, укороченная до SIGNATURE_SIZE байт, все в base64url без выравнивания.
+    Подпись покрывает и Телеграм ID пользователя, которому показана кнопка (сам ID в данные не входит),
+    поэтому пересланная или подсмотренная кнопка у другого пользователя не проходит проверку.
+    Подпись не дает подделать кнопку с чужим ID задачи, поэтому обработчики доверяют данным кнопки
+    и не читают контекст из FSM. Кнопки с неверной подписью или другой версией формата отклоняются.
+
+    Атрибуты:
+        rejected (int): Количество отклоненных callback_data.
+    """
+    def __init__(self, secret):
+        if isinstance(secret, str):
+            secret = secret.encode()
+        # Ключ выводится из секрета, чтобы один секрет (например, токен бота) не использовался напрямую в разных целях.
+        key = hashlib.sha256(b"callback_data:" + secret).digest()
+        # Состояние HMAC с обработанным ключом копируется для каждой подписи, ключ не хэшируется заново.
+        self._hmac = hmac.new(key, digestmod=hashlib.sha256)
+        self.rejected = 0
+
+    def _sign(self, payload, user_id: int) -> bytes:
+        signer = self._hmac.copy()
+        signer.update(_user_id.pack(user_id))
+        signer.update(payload)
+        return signer.digest()[:SIGNATURE_SIZE]
+
+    def packer(self, user_id: int):
+        """Возвращает функцию pack для кнопок пользователя user_id."""
+        return partial(self.pack, user_id)
+
+    def pack(self, user_id: int, action: str, task_id: int = None, page: str = None, number: int = None,
+             field: str = None, status: str = None, flag: bool = False) -> str:
+        """
+        Кодирует данные кнопки.
+        Аргументы:
+            user_id (int): Телеграм ID пользователя, которому показывается кнопка.
+            action (str): Действие из ACTIONS.
+            task_id (int, optional): ID задачи.
+            page (str, optional): Курсор страницы списка задач ("0", `n<ключ>`, `p<ключ>`).
+            number (int, optional): Номер страницы результатов поиска.
+            field (str, optional): Поле задачи.
+            status (str, optional): Статус задачи.
+            flag (bool): Признак, смысл которого задает действие.
+        Возвращает:
+            str: callback_data не длиннее MAX_LENGTH символов.
+        """
+        flags = 0
+        body = bytearray()
+        if task_id is not None:
+            flags |= TASK_ID
+            _write_varint(body, task_id)
+        if page is not None:
+            flags |= PAGE
+            kind = PAGE_KINDS.index(page[0]) if page != "0" else 0
+            body.append(kind)
+            if kind:
+                micros, cursor_id = page[1:].split(".")
+                _write_varint(body, int(micros))
+                _write_varint(body, int(cursor_id))
+        if number is not None:
+            flags |= NUMBER
+            _write_varint(body, number)
+        if field is not None:
+            flags |= FIELD
+            _write_string(body, field)
+        if status is not None:
+            flags |= STATUS
+            _write_string(body, status)
+        if flag:
+            flags |= FLAG
+        payload = bytes((VERSION, ACTION_CODES[action], flags)) + body
+        data = base64.urlsafe_b64encode(payload + self._sign(payload, user_id)).rstrip(b"=").decode()
+        if len(data) > MAX_LENGTH:
+            raise ValueError(f"Callback data for {action} is {len(data)} characters long, the limit is {MAX_LENGTH}")
+        return data
+
+    def unpack(self, data, user_id: int) -> CallbackData | None:
+        """
+        Проверяет подпись и разбирает данные кнопки.
+        Аргументы:
+            data (str | bytes): callback_data нажатой кнопки.
+            user_id (int): Телеграм ID пользователя, нажавшего кнопку.
+        Возвращает:
+            CallbackData или None, если данные подделаны, повреждены, устарели или кнопка показана другому пользователю.
+        """
+        try:
+            if isinstance(data, str):
+                data = data.encode()
+            raw = base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+        except (binascii.Error, ValueError, UnicodeEncodeError):
+            self.rejected += 1
+            return None
+        payload, signature = raw[:-SIGNATURE_SIZE], raw[-SIGNATURE_SIZE:]
+        if (len(payload) < 3 or payload[0] != VERSION
+                or not hmac.compare_digest(signature, self._sign(payload, user_id))):
+            self.rejected += 1
+            return None
+        try:
+            return self._parse(payload)
+        except (IndexError, ValueError):
+            # Подпись верна, но данные не разбираются: ключ подписи общий с другой версией кода.
+            self.rejected += 1
+            return None
+
+    @staticmethod
+    def _parse(payload: bytes) -> CallbackData:
+        action, flags, position = ACTIONS[payload[1]], payload[2], 3
+        task_id = page = number = field = status = None
+        if flags & TASK_ID:
+            task_id, position = _read_varint(payload, position)
+        if flags & PAGE:
+            kind = payload[position]
+            position += 1
+            if kind:
+                micros, position = _read_varint(payload, position)
+                cursor_id, position = _read_varint(payload, position)
+                page = f"{PAGE_KINDS[kind]}{micros}.{cursor_id}"
+            else:
+                page = "0"
+        if flags & NUMBER:
+            number, position = _read_varint(payload, position)
+        if flags & FIELD:
+            field, position = _read_string(payload, position)
+        if flags & STATUS:
+            status, position = _read_string(payload, position)
+        if position != len(payload):
+            raise ValueError("trailing bytes")
+        return CallbackData(action, task_id, page, number, field, status, bool(flags & FLAG))
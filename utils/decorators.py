@@ -1,14 +1,18 @@
+import time
 import logging
 
 from pyrogram import Client
 from pyrogram.types import Message, CallbackQuery
 
+from utils.metrics import metrics
+
 logger = logging.getLogger("test_bot")
 
 def error_handler(handler):
     """
     Декоратор для обработки ошибок, возникающих в обработчиках Pyrogram.
     Если возникает исключение, декоратор логирует ошибку и отправляет пользователю сообщение об ошибке.
+    Время выполнения и ошибки обработчика записываются в метрики, если они включены.
     Аргументы:
         handler (function): Функция-обработчик, к которой применяется декоратор.
     """
@@ -22,10 +26,13 @@ def error_handler(handler):
         if not client:
             logger.error("Client object not found in arguments!")
             return
+        started = time.perf_counter()
+        failed = False
         try:
             await handler(*args, **kwargs)
         except Exception as e:
-            logger.error(f"Error in handler '{handler.__name__}': {e}")
+            failed = True
+            logger.error("Error in handler '%s': %s", handler.__name__, e)
             target = None
             for arg in args:
                 if isinstance(arg, (Message, CallbackQuery)):
@@ -33,17 +40,45 @@ def error_handler(handler):
                     break
             if target:
                 user_id = target.from_user.id if isinstance(target, Message) else target.message.chat.id
-                await send_error_message(client, user_id)
+                await send_error_message(client, user_id, getattr(args[0], "sender", None))
             else:
                 logger.error("Could not determine the target for the error message.")
+        finally:
+            if metrics.enabled:
+                metrics.observe("handler", handler.__name__, time.perf_counter() - started, failed)
+    wrapper.__name__ = handler.__name__
+    return wrapper
+
+
+def flush_fsm(handler):
+    """
+    Декоратор для методов-обработчиков, которые работают с контекстом FSM обновления.
+    После работы обработчика все изменения состояния и данных сохраняются одним запросом.
+    Аргументы:
+        handler (function): Метод обработчика с аргументами (self, client, update, ...).
+    """
+    async def wrapper(self, client, update, *args, **kwargs):
+        try:
+            return await handler(self, client, update, *args, **kwargs)
+        finally:
+            await self.storage.flush(update)
+    wrapper.__name__ = handler.__name__
     return wrapper
 
 
-async def send_error_message(client: Client, user_id):
+async def send_error_message(client: Client, user_id, sender=None):
+    """
+    Отправляет пользователю сообщение об ошибке.
+    Если у обработчика есть очередь отправки (MessageSender), сообщение идет через нее с учетом лимитов.
+    """
+    text = "An error occurred. Please try again later."
     try:
-        await client.send_message(
-            chat_id=user_id,
-            text="An error occurred. Please try again later."
-        )
+        if sender:
+            await sender.send_message(user_id, text)
+        else:
+            await client.send_message(
+                chat_id=user_id,
+                text=text
+            )
     except Exception as e:
-        logger.error(f"Failed to send error message to user {user_id}: {e}")
+        logger.error("Failed to send error message to user %s: %s", user_id, e)
@@ -0,0 +1,113 @@
+import time
+import asyncio
+import logging
+from collections import deque
+
+from utils.metrics import metrics
+
+logger = logging.getLogger('test_bot')
+
+
+class UpdateDispatcher:
+    """
+    Прослойка между Pyrogram и обработчиками бота.
+    Обновления одного пользователя выполняются строго по очереди (у каждого пользователя своя очередь),
+    обновления разных пользователей - параллельно, но не больше max_concurrency одновременно.
+    Если в очередях накопилось max_pending обновлений, прием новых ждет освобождения места.
+
+    Атрибуты:
+        storage (FSMStorage | None): Хранилище FSM. Контекст обновления сбрасывается перед обработкой,
+                                     чтобы обработчик читал состояние после предыдущих обновлений пользователя.
+        processed (int): Количество обработанных обновлений.
+        wait_total (float): Суммарное время ожидания обновлений в очереди (сек).
+        wait_max (float): Максимальное время ожидания обновления в очереди (сек).
+    """
+    def __init__(self, max_concurrency: int, max_pending: int, storage=None):
+        self.storage = storage
+        self.processed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._queues: dict = {}
+        self._drainers: dict = {}
+        self._running = asyncio.Semaphore(max_concurrency)
+        self._slots = asyncio.Semaphore(max_pending)
+        self._pending = 0
+
+    def wrap(self, callback):
+        """
+        Оборачивает обработчик Pyrogram так, чтобы обновления шли через очереди диспетчера.
+        Аргументы:
+            callback (function): Обработчик с аргументами (client, update).
+        """
+        async def wrapper(client, update):
+            await self.submit(callback, client, update)
+        wrapper.__name__ = getattr(callback, "__name__", "wrapper")
+        return wrapper
+
+    async def submit(self, callback, client, update):
+        """
+        Ставит обновление в очередь его пользователя.
+        Обновления без пользователя выполняются сразу.
+        """
+        user = getattr(update, "from_user", None)
+        if user is None:
+            await metrics.track_update(callback.__name__, callback, client, update)
+            return
+        await self._slots.acquire()
+        self._pending += 1
+        queue = self._queues.get(user.id)
+        if queue is None:
+            queue = self._queues[user.id] = deque()
+            self._drainers[user.id] = asyncio.create_task(self._drain(user.id, queue))
+        queue.append((callback, client, update, time.monotonic()))
+
+    async def _drain(self, user_id, queue: deque):
+        """Выполняет обновления пользователя по порядку, пока его очередь не опустеет."""
+        while queue:
+            callback, client, update, enqueued_at = queue[0]
+            async with self._running:
+                wait = time.monotonic() - enqueued_at
+                self.processed += 1
+                self.wait_total += wait
+                if wait > self.wait_max:
+                    self.wait_max = wait
+                if self.storage:
+                    # Контекст FSM, загруженный до постановки в очередь (например, фильтром), мог устареть.
+                    self.storage.reset(update)
+                try:
+                    await metrics.track_update(callback.__name__, callback, client, update)
+                except Exception as e:
+                    logger.error("Update of user %s failed in dispatcher: %s", user_id, e)
+                finally:
+                    queue.popleft()
+                    self._pending -= 1
+                    self._slots.release()
+        del self._queues[user_id]
+        del self._drainers[user_id]
+
+    async def wait_user(self, user_id):
+        """Дожидается обработки всех обновлений пользователя, уже принятых в очередь."""
+        drainer = self._drainers.get(user_id)
+        if drainer:
+            await asyncio.gather(drainer, return_exceptions=True)
+
+    async def join(self):
+        """Дожидается обработки всех обновлений, уже принятых в очереди."""
+        while self._drainers:
+            await asyncio.gather(*list(self._drainers.values()), return_exceptions=True)
+
+    def stats(self) -> dict:
+        """
+        Возвращает состояние очередей.
+        Возвращает:
+            dict: Количество ожидающих обновлений, активных пользователей, максимальная глубина очереди
+                  пользователя и время ожидания в очереди.
+        """
+        return {
+            "pending": self._pending,
+            "active_users": len(self._queues),
+            "max_user_depth": max((len(queue) for queue in self._queues.values()), default=0),
+            "processed": self.processed,
+            "wait_avg": self.wait_total / self.processed if self.processed else 0.0,
+            "wait_max": self.wait_max,
+        }
@@ -0,0 +1,221 @@
+import time
+import bisect
+import asyncio
+import logging
+import contextvars
+
+logger = logging.getLogger('test_bot')
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROUNDTRIP_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21)
+
+# Счетчики round-trip к БД и Redis текущего обновления (None - обновление не отслеживается).
+_update_roundtrips = contextvars.ContextVar("update_roundtrips", default=None)
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными границами корзин в формате Prometheus.
+    Атрибуты:
+        buckets (tuple): Верхние границы корзин.
+        counts (list): Количество наблюдений в каждой корзине (не накопительно, последняя - +Inf).
+        sum (float): Сумма наблюдений.
+        count (int): Количество наблюдений.
+    """
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик бота: время выполнения и ошибки обработчиков и методов CRUD,
+    время обработки обновлений и количество запросов к БД и Redis на одно обновление.
+    Пока реестр выключен, декораторы и счетчики только проверяют флаг и ничего не записывают.
+
+    Атрибуты:
+        enabled (bool): Собирать ли метрики.
+        histograms (dict): Гистограммы по семействам метрик и значениям метки name.
+        errors (dict): Количество ошибок по семействам метрик и значениям метки name.
+        collectors (dict): Функции, возвращающие текущие значения (gauge) по префиксу метрики.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.histograms: dict = {}
+        self.errors: dict = {}
+        self.collectors: dict = {}
+
+    def observe(self, kind: str, name: str, seconds: float, error: bool = False):
+        """
+        Учитывает один вызов.
+        Аргументы:
+            kind (str): Вид вызова: handler, crud или update.
+            name (str): Имя обработчика или метода.
+            seconds (float): Время выполнения.
+            error (bool): Вызов завершился исключением.
+        """
+        self._histogram(f"bot_{kind}_duration_seconds", name, LATENCY_BUCKETS).observe(seconds)
+        if error:
+            family = self.errors.setdefault(f"bot_{kind}_errors_total", {})
+            family[name] = family.get(name, 0) + 1
+
+    def _histogram(self, family: str, name: str, buckets: tuple) -> Histogram:
+        histograms = self.histograms.setdefault(family, {})
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = Histogram(buckets)
+        return histogram
+
+    def timed(self, kind: str):
+        """
+        Декоратор корутин, записывающий время выполнения и исключения под именем функции.
+        Аргументы:
+            kind (str): Вид вызова (handler, crud).
+        """
+        def decorator(func):
+            name = func.__name__
+
+            async def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return await func(*args, **kwargs)
+                started = time.perf_counter()
+                failed = False
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    failed = True
+                    raise
+                finally:
+                    self.observe(kind, name, time.perf_counter() - started, failed)
+            wrapper.__name__ = name
+            wrapper.__doc__ = func.__doc__
+            return wrapper
+        return decorator
+
+    async def track_update(self, name: str, callback, *args):
+        """
+        Выполняет обработку одного обновления и учитывает ее время и количество запросов к БД и Redis.
+        Аргументы:
+            name (str): Имя обработчика обновления.
+            callback (function): Корутина-функция обработчика.
+        """
+        if not self.enabled:
+            return await callback(*args)
+        roundtrips = {"db": 0, "redis": 0}
+        token = _update_roundtrips.set(roundtrips)
+        started = time.perf_counter()
+        failed = False
+        try:
+            return await callback(*args)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            _update_roundtrips.reset(token)
+            self.observe("update", name, time.perf_counter() - started, failed)
+            for target, count in roundtrips.items():
+                self._histogram(f"bot_update_{target}_roundtrips", name, ROUNDTRIP_BUCKETS).observe(count)
+
+    def roundtrip(self, target: str):
+        """Учитывает один запрос к БД ("db") или Redis ("redis") в рамках текущего обновления."""
+        roundtrips = _update_roundtrips.get()
+        if roundtrips is not None:
+            roundtrips[target] += 1
+
+    def register_collector(self, prefix: str, collector):
+        """
+        Добавляет источник текущих значений (пул БД, очереди и т.д.).
+        Аргументы:
+            prefix (str): Префикс имен метрик.
+            collector (function): Функция без аргументов, возвращающая dict с числовыми значениями.
+        """
+        self.collectors[prefix] = collector
+
+    def render(self) -> str:
+        """
+        Возвращает метрики в текстовом формате Prometheus.
+        Возвращает:
+            str: Текст для ответа на запрос /metrics.
+        """
+        lines = []
+        for family, histograms in self.histograms.items():
+            lines.append(f"# TYPE {family} histogram")
+            for name, histogram in histograms.items():
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{family}_bucket{{name="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{family}_bucket{{name="{name}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{family}_sum{{name="{name}"}} {histogram.sum}')
+                lines.append(f'{family}_count{{name="{name}"}} {histogram.count}')
+        for family, counters in self.errors.items():
+            lines.append(f"# TYPE {family} counter")
+            for name, count in counters.items():
+                lines.append(f'{family}{{name="{name}"}} {count}')
+        for prefix, collector in self.collectors.items():
+            try:
+                values = collector()
+            except Exception as e:
+                logger.error("Metrics collector %s failed: %s", prefix, e)
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"# TYPE bot_{prefix}_{key} gauge")
+                    lines.append(f"bot_{prefix}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class MetricsServer:
+    """
+    Минимальный HTTP-сервер, отдающий метрики по GET /metrics.
+    Атрибуты:
+        registry (MetricsRegistry): Реестр метрик.
+        host (str): Адрес, на котором слушает сервер.
+        port (int): Порт сервера.
+    """
+    def __init__(self, registry: MetricsRegistry, host: str, port: int):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info("Metrics endpoint listening on %s:%s", self.host, self.port)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            parts = request_line.decode("latin-1").split()
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", self.registry.render().encode()
+            else:
+                status, body = "404 Not Found", b"Not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.error("Metrics request failed: %s", e)
+        finally:
+            writer.close()
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
@@ -0,0 +1,147 @@
+import time
+import asyncio
+import logging
+from datetime import timedelta
+
+from utils.sender import BACKGROUND
+from utils.timer_wheel import TimerWheel
+
+logger = logging.getLogger('test_bot')
+
+
+class ReminderScheduler:
+    """
+    Отправляет напоминания о сроках задач.
+    Раз в poll_interval секунд забирает из БД напоминания на ближайшие poll_interval секунд
+    (и все пропущенные, например за время простоя бота) и раскладывает их по TimerWheel в памяти.
+    Забранные напоминания арендуются на lease секунд, поэтому несколько экземпляров бота делят их между собой.
+    Перед отправкой напоминание отмечается отправленным с проверкой аренды, и оно не отправляется дважды.
+    Сообщения уходят через MessageSender с фоновым приоритетом.
+
+    Атрибуты:
+        crud (CRUD): Операции с базой данных.
+        sender (MessageSender): Очередь исходящих сообщений.
+        poll_interval (float): Период опроса БД и горизонт забираемых напоминаний (сек).
+        lease (float): Срок аренды забранных напоминаний (сек).
+        batch_size (int): Сколько напоминаний забирать за один запрос.
+        max_pending (int): Сколько забранных напоминаний держать в памяти, остальные ждут следующего опроса.
+        wheel (TimerWheel): Таймеры забранных напоминаний.
+        claimed (int): Количество забранных напоминаний.
+        sent (int): Количество отправленных напоминаний.
+        failed (int): Количество напоминаний, которые не удалось отправить.
+        missed (int): Количество напоминаний, отправленных с опозданием (пропущенных).
+    """
+    def __init__(self, crud, sender, poll_interval: float = 5.0, lease: float = 120.0, batch_size: int = 500,
+                 max_pending: int = 50000, resolution: float = 1.0):
+        self.crud = crud
+        self.sender = sender
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.wheel = TimerWheel(resolution, now=time.time())
+        self.claimed = 0
+        self.sent = 0
+        self.failed = 0
+        self.missed = 0
+        self._leases: dict = {}
+        self._tasks: list = []
+        self._sends: set = set()
+
+    def start(self):
+        """Запускает опрос БД и срабатывание таймеров в фоне."""
+        self._tasks = [asyncio.create_task(self._poll_loop()), asyncio.create_task(self._tick_loop())]
+
+    async def _poll_loop(self):
+        while True:
+            claimed = 0
+            if len(self._leases) < self.max_pending:
+                claimed = await self.poll()
+            # Полная пачка означает, что есть еще пропущенные напоминания: забираем их без паузы.
+            if claimed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+            else:
+                await asyncio.sleep(0)
+
+    async def poll(self) -> int:
+        """
+        Забирает напоминания на ближайшие poll_interval секунд и ставит для них таймеры.
+        Возвращает:
+            int: Количество забранных напоминаний.
+        """
+        limit = min(self.batch_size, self.max_pending - len(self._leases))
+        rows = await self.crud.claim_reminders(
+            timedelta(seconds=self.poll_interval), timedelta(seconds=self.lease), limit
+        )
+        for task_id, remind_at, lease in rows:
+            self._leases[task_id] = (lease, remind_at)
+            self.wheel.add(remind_at.timestamp(), task_id)
+        self.claimed += len(rows)
+        return len(rows)
+
+    async def _tick_loop(self):
+        while True:
+            await asyncio.sleep(self.wheel.resolution)
+            due = self.wheel.advance(time.time())
+            if due:
+                try:
+                    await self.fire(due)
+                except Exception as e:
+                    logger.error("Failed to fire %s reminders: %s", len(due), e)
+
+    async def fire(self, task_ids: list):
+        """
+        Отмечает сработавшие напоминания отправленными и ставит сообщения в очередь отправки.
+        Аргументы:
+            task_ids (list): ID задач сработавших таймеров.
+        """
+        claims = {task_id: self._leases.pop(task_id) for task_id in task_ids if task_id in self._leases}
+        rows = await self.crud.fire_reminders([(task_id, lease) for task_id, (lease, _) in claims.items()])
+        now = time.time()
+        for row in rows:
+            if row.status == "DONE":
+                continue
+            remind_at = claims[row.id][1]
+            # Напоминание пропущено, если оно забрано уже просроченным: например, бот в это время не работал.
+            missed = now - remind_at.timestamp() > self.poll_interval + self.wheel.resolution
+            send = asyncio.create_task(self._send(row, missed))
+            self._sends.add(send)
+            send.add_done_callback(self._sends.discard)
+
+    async def _send(self, row, missed: bool):
+        due = f"{row.due_at:%Y-%m-%d %H:%M} UTC" if row.due_at else "now"
+        if missed:
+            text = f"Missed reminder: task ‘{row.name}’ was due {due}."
+        else:
+            text = f"Reminder: task ‘{row.name}’ is due {due}."
+        try:
+            await self.sender.send_message(row.tg_user_id, text, priority=BACKGROUND)
+        except Exception as e:
+            self.failed += 1
+            logger.error("Failed to send a reminder for task %s to user %s: %s", row.id, row.tg_user_id, e)
+            return
+        self.sent += 1
+        self.missed += missed
+
+    async def close(self):
+        """
+        Останавливает опрос, дожидается поставленных в очередь напоминаний
+        и снимает аренду с еще не сработавших, чтобы их забрал другой экземпляр бота.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.gather(*self._sends, return_exceptions=True)
+        if self._leases:
+            await self.crud.release_reminders([(task_id, lease) for task_id, (lease, _) in self._leases.items()])
+            self._leases.clear()
+
+    def stats(self) -> dict:
+        """Возвращает количество забранных, ожидающих и отправленных напоминаний."""
+        return {
+            "pending": len(self._leases),
+            "claimed": self.claimed,
+            "sent": self.sent,
+            "missed": self.missed,
+            "failed": self.failed,
+        }
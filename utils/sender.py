@@ -0,0 +1,292 @@
+import time
+import asyncio
+import logging
+import itertools
+from collections import deque
+
+from pyrogram.errors import FloodWait, BadRequest, MessageNotModified
+
+logger = logging.getLogger('test_bot')
+
+# Приоритеты исходящих запросов: ответы пользователю отправляются раньше фоновых рассылок.
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты запросов "корзина токенов".
+    Атрибуты:
+        rate (float): Скорость пополнения (токенов в секунду).
+        capacity (float): Максимальное количество токенов (допустимый всплеск).
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def delay(self, now: float) -> float:
+        """Возвращает, сколько секунд ждать до появления токена (0 - токен есть)."""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+    def is_idle(self, now: float) -> bool:
+        """Корзина полная и не заблокирована - ее можно удалить без потери информации."""
+        return now >= self.blocked_until and self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class MessageSender:
+    """
+    Очередь исходящих запросов к Telegram с ограничением частоты.
+    Применяет общий лимит бота и лимит на каждый чат, при FloodWait откладывает запрос
+    на указанное Telegram время и повторяет его. Ответы пользователям имеют приоритет над фоновыми отправками.
+    Пока запрос в чат отложен (лимит или FloodWait), следующие запросы в этот чат ждут за ним
+    и возвращаются в очередь в прежнем порядке, когда он выполнен, поэтому сообщения в чате не меняют порядок.
+
+    Атрибуты:
+        client (Client): Клиент Pyrogram.
+        max_retries (int): Сколько раз повторять запрос после FloodWait.
+        sent (int): Количество выполненных запросов.
+        failed (int): Количество запросов, завершившихся ошибкой.
+        flood_waits (int): Количество полученных FloodWait.
+        edits (int): Количество отредактированных сообщений.
+        skipped_edits (int): Количество пропущенных редактирований (содержимое не изменилось).
+        latency_total (float): Суммарное время от постановки в очередь до выполнения (сек).
+        latency_max (float): Максимальное время от постановки в очередь до выполнения (сек).
+    """
+    MAX_CHAT_BUCKETS = 10000
+
+    def __init__(self, client, global_rate: float = 30, chat_rate: float = 1, chat_burst: float = 3,
+                 workers: int = 8, max_retries: int = 3):
+        self.client = client
+        self.max_retries = max_retries
+        self.sent = 0
+        self.failed = 0
+        self.flood_waits = 0
+        self.edits = 0
+        self.skipped_edits = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._chats: dict = {}
+        self._queue = None
+        self._workers_count = workers
+        self._workers: list = []
+        self._delayed = 0
+        self._lines: dict = {}
+        self._seq = itertools.count()
+
+    async def send_message(self, chat_id, text: str, priority: int = INTERACTIVE, **kwargs):
+        """Отправляет сообщение в чат через очередь. Принимает те же аргументы, что и Client.send_message."""
+        return await self.call(chat_id, self.client.send_message, chat_id=chat_id, text=text,
+                               priority=priority, **kwargs)
+
+    async def reply(self, message, text: str, priority: int = INTERACTIVE, **kwargs):
+        """Отвечает в чат сообщения через очередь (замена Message.reply)."""
+        return await self.send_message(message.chat.id, text, priority=priority, **kwargs)
+
+    async def edit(self, message, text: str, reply_markup=None, priority: int = INTERACTIVE):
+        """
+        Заменяет текст и клавиатуру сообщения бота вместо отправки нового сообщения.
+        Если текст и клавиатура не изменились, запрос не отправляется; если изменилась только клавиатура,
+        отправляется edit_message_reply_markup. Если сообщение нельзя отредактировать, отправляется новое.
+        Аргументы:
+            message (Message): Сообщение бота, к которому относится нажатая кнопка.
+            text (str): Новый текст сообщения.
+            reply_markup (InlineKeyboardMarkup, optional): Новая клавиатура.
+        Возвращает:
+            Message: Отредактированное (или новое) сообщение.
+        """
+        chat_id = message.chat.id
+        same_keyboard = self.keyboard_rows(message.reply_markup) == self.keyboard_rows(reply_markup)
+        try:
+            if message.text == text:
+                if same_keyboard:
+                    self.skipped_edits += 1
+                    return message
+                result = await self.call(chat_id, self.client.edit_message_reply_markup, chat_id=chat_id,
+                                         message_id=message.id, reply_markup=reply_markup, priority=priority)
+            else:
+                result = await self.call(chat_id, self.client.edit_message_text, chat_id=chat_id,
+                                         message_id=message.id, text=text, reply_markup=reply_markup,
+                                         priority=priority)
+        except MessageNotModified:
+            self.skipped_edits += 1
+            return message
+        except BadRequest as e:
+            logger.warning("Could not edit message %s in chat %s, sending a new one: %s", message.id, chat_id, e)
+            return await self.send_message(chat_id, text, priority=priority, reply_markup=reply_markup)
+        self.edits += 1
+        return result
+
+    @staticmethod
+    def keyboard_rows(markup) -> list:
+        """Возвращает клавиатуру как список строк из пар (текст, callback_data) для сравнения."""
+        rows = []
+        for row in getattr(markup, "inline_keyboard", None) or []:
+            buttons = []
+            for button in row:
+                data = button.callback_data
+                buttons.append((button.text, data.decode() if isinstance(data, bytes) else data))
+            rows.append(buttons)
+        return rows
+
+    async def call(self, chat_id, method, /, *args, priority: int = INTERACTIVE, **kwargs):
+        """
+        Выполняет произвольный метод клиента с учетом лимитов чата.
+        Аргументы:
+            chat_id (int): Чат, к лимиту которого относится запрос.
+            method: Корутина-функция клиента (send_message, edit_message_text и т.д.).
+            priority (int): INTERACTIVE или BACKGROUND.
+        Возвращает:
+            Результат метода клиента.
+        """
+        self._ensure_workers()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((priority, next(self._seq), time.monotonic(), 0, chat_id, method, args, kwargs, future))
+        return await future
+
+    def _ensure_workers(self):
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self._workers_count)]
+
+    def _chat_bucket(self, chat_id, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.MAX_CHAT_BUCKETS:
+                self._chats = {key: value for key, value in self._chats.items() if not value.is_idle(now)}
+            bucket = self._chats[chat_id] = TokenBucket(self._chat_rate, self._chat_burst)
+        return bucket
+
+    def _reserve(self, chat_id) -> float:
+        """Забирает токены общего лимита и лимита чата или возвращает, сколько нужно подождать."""
+        now = time.monotonic()
+        chat_bucket = self._chat_bucket(chat_id, now)
+        delay = max(self._global.delay(now), chat_bucket.delay(now))
+        if delay:
+            return delay
+        self._global.consume()
+        chat_bucket.consume()
+        return 0.0
+
+    def _requeue_later(self, delay: float, item: tuple):
+        """
+        Возвращает запрос в очередь через delay секунд.
+        До его выполнения следующие запросы в тот же чат ждут за ним (см. _wait_in_line).
+        """
+        seq, chat_id = item[1], item[4]
+        self._lines.setdefault(chat_id, (seq, deque()))
+        self._delayed += 1
+
+        def put():
+            self._delayed -= 1
+            self._queue.put_nowait(item)
+        asyncio.get_running_loop().call_later(delay, put)
+
+    def _wait_in_line(self, item: tuple) -> bool:
+        """
+        Ставит запрос в очередь чата, если в чате ждет отложенный запрос.
+        Возвращает:
+            bool: True, если запрос отложен до выполнения отложенного запроса чата.
+        """
+        seq, chat_id = item[1], item[4]
+        line = self._lines.get(chat_id)
+        if line is None or line[0] == seq:
+            return False
+        line[1].append(item)
+        return True
+
+    def _release(self, chat_id, seq: int):
+        """Возвращает в очередь запросы, ждавшие выполненного отложенного запроса чата."""
+        line = self._lines.get(chat_id)
+        if line is None or line[0] != seq:
+            return
+        del self._lines[chat_id]
+        for item in line[1]:
+            self._queue.put_nowait(item)
+
+    async def _worker(self):
+        while True:
+            item = await self._queue.get()
+            priority, seq, enqueued_at, attempt, chat_id, method, args, kwargs, future = item
+            if self._wait_in_line(item):
+                continue
+            if future.cancelled():
+                self._release(chat_id, seq)
+                continue
+            delay = self._reserve(chat_id)
+            if delay:
+                self._requeue_later(delay, item)
+                continue
+            retried = False
+            try:
+                result = await method(*args, **kwargs)
+            except FloodWait as e:
+                self.flood_waits += 1
+                wait = float(e.value)
+                logger.warning("FloodWait %s s for chat %s", wait, chat_id)
+                self._chat_bucket(chat_id, time.monotonic()).blocked_until = time.monotonic() + wait
+                if attempt < self.max_retries:
+                    retry = (priority, seq, enqueued_at, attempt + 1, chat_id, method, args, kwargs, future)
+                    self._requeue_later(wait, retry)
+                    retried = True
+                else:
+                    self.failed += 1
+                    if not future.done():
+                        future.set_exception(e)
+            except Exception as e:
+                self.failed += 1
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                latency = time.monotonic() - enqueued_at
+                self.sent += 1
+                self.latency_total += latency
+                if latency > self.latency_max:
+                    self.latency_max = latency
+                if not future.done():
+                    future.set_result(result)
+            if not retried:
+                self._release(chat_id, seq)
+
+    async def close(self, timeout: float = 10):
+        """Дожидается отправки запросов из очереди (не дольше timeout) и останавливает обработчиков очереди."""
+        deadline = time.monotonic() + timeout
+        while (self._queue is not None and (not self._queue.empty() or self._delayed or self._lines)
+               and time.monotonic() < deadline):
+            await asyncio.sleep(0.1)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def stats(self) -> dict:
+        """
+        Возвращает состояние очереди отправки.
+        Возвращает:
+            dict: Длина очереди, количество отложенных и ждущих за ними запросов, отправленных и неудачных запросов и задержка отправки.
+        """
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "delayed": self._delayed,
+            "waiting": sum(len(items) for _, items in self._lines.values()),
+            "sent": self.sent,
+            "failed": self.failed,
+            "flood_waits": self.flood_waits,
+            "edits": self.edits,
+            "skipped_edits": self.skipped_edits,
+            "latency_avg": self.latency_total / self.sent if self.sent else 0.0,
+            "latency_max": self.latency_max,
+        }
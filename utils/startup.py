@@ -0,0 +1,47 @@
+import time
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger('test_bot')
+
+
+class StartupTimer:
+    """
+    Время этапов запуска бота для отчета в логе.
+    Этапы, выполняемые параллельно, учитываются каждый отдельно, а общее время считается от started.
+
+    Атрибуты:
+        started (float): Момент начала запуска (time.perf_counter()).
+        phases (list): Пары (этап, длительность в секундах) в порядке завершения.
+    """
+    def __init__(self, started: float = None):
+        self.started = started if started is not None else time.perf_counter()
+        self.phases: list = []
+
+    def add(self, name: str, seconds: float):
+        self.phases.append((name, seconds))
+
+    @contextmanager
+    def phase(self, name: str):
+        """Контекстный менеджер, записывающий время выполнения блока как этап name."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    async def timed(self, name: str, coro):
+        """Выполняет корутину и записывает ее время как этап name. Удобно для параллельных этапов в gather."""
+        with self.phase(name):
+            return await coro
+
+    def report(self) -> str:
+        """
+        Возвращает строку отчета: время каждого этапа и общее время запуска в миллисекундах.
+        """
+        parts = [f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases]
+        parts.append(f"total {(time.perf_counter() - self.started) * 1000:.0f} ms")
+        return ", ".join(parts)
+
+    def log(self):
+        logger.info("Startup phases: %s", self.report())
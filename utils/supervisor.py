@@ -0,0 +1,361 @@
+import os
+import bisect
+import signal
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+from collections import deque
+
+import pyrogram
+from pyrogram.types import Message, CallbackQuery, InlineQuery
+from pyrogram.handlers import MessageHandler, CallbackQueryHandler, InlineQueryHandler
+
+from logger.logger import setup_logging, setup_worker_logging, forward_worker_logs
+
+logger = logging.getLogger('test_bot')
+
+HANDLER_TYPES = {
+    Message: MessageHandler,
+    CallbackQuery: CallbackQueryHandler,
+    InlineQuery: InlineQueryHandler,
+}
+
+
+async def dispatch_update(client, update):
+    """
+    Передает разобранное обновление обработчикам клиента так же, как диспетчер Pyrogram:
+    в каждой группе срабатывает первый обработчик, чьи фильтры пропустили обновление.
+    Аргументы:
+        client (Client): Клиент, в котором зарегистрированы обработчики.
+        update: Обновление Pyrogram (Message, CallbackQuery, InlineQuery).
+    """
+    handler_type = HANDLER_TYPES.get(type(update))
+    if handler_type is None:
+        return
+    try:
+        for group in list(client.dispatcher.groups.values()):
+            for handler in group:
+                if not isinstance(handler, handler_type):
+                    continue
+                try:
+                    if not await handler.check(client, update):
+                        continue
+                except Exception as e:
+                    logger.error("Handler filter failed: %s", e)
+                    continue
+                try:
+                    await handler.callback(client, update)
+                except pyrogram.ContinuePropagation:
+                    continue
+                except pyrogram.StopPropagation:
+                    raise
+                except Exception as e:
+                    logger.error("Handler %s failed: %s", getattr(handler.callback, "__name__", handler), e)
+                break
+    except pyrogram.StopPropagation:
+        pass
+
+
+class HashRing:
+    """
+    Консистентное хеширование ключей (Телеграм ID пользователей) по воркерам.
+    Каждый воркер занимает replicas точек на кольце, поэтому при изменении количества воркеров
+    переезжает только доля пользователей, а не все.
+
+    Атрибуты:
+        nodes (int): Количество воркеров.
+    """
+    def __init__(self, nodes: int, replicas: int = 100):
+        self.nodes = nodes
+        points = sorted(
+            (self._hash(f"worker-{node}:{replica}"), node)
+            for node in range(nodes)
+            for replica in range(replicas)
+        )
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    @staticmethod
+    def _hash(value) -> int:
+        return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "big")
+
+    def node(self, key) -> int:
+        """Возвращает номер воркера для ключа."""
+        index = bisect.bisect(self._points, self._hash(key)) % len(self._points)
+        return self._owners[index]
+
+
+class ShardWorker:
+    """
+    Принимает обновления своей доли пользователей в процессе-воркере и передает их обработчикам бота.
+    Следующее обновление пользователя проверяется фильтрами только после того, как предыдущее
+    полностью обработано диспетчером, поэтому фильтры состояний FSM видят актуальное состояние.
+
+    Атрибуты:
+        app (BotApp): Приложение бота с зарегистрированными обработчиками.
+        processed (int): Количество обработанных обновлений.
+    """
+    def __init__(self, app, max_pending: int):
+        self.app = app
+        self.processed = 0
+        self._queues: dict = {}
+        self._feeders: dict = {}
+        self._slots = asyncio.Semaphore(max_pending)
+
+    async def submit(self, update):
+        """Ставит обновление в очередь его пользователя, ожидая места, если очереди заполнены."""
+        update.bind(self.app.app)
+        await self._slots.acquire()
+        user = getattr(update, "from_user", None)
+        key = user.id if user else None
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+            self._feeders[key] = asyncio.create_task(self._feed(key, queue))
+        queue.append(update)
+
+    async def _feed(self, key, queue: deque):
+        while queue:
+            try:
+                await dispatch_update(self.app.app, queue[0])
+                if key is not None:
+                    await self.app.dispatcher.wait_user(key)
+            except Exception as e:
+                logger.error("Update of user %s failed in worker: %s", key, e)
+            finally:
+                queue.popleft()
+                self.processed += 1
+                self._slots.release()
+        del self._queues[key]
+        del self._feeders[key]
+
+    async def join(self):
+        """Дожидается обработки всех принятых обновлений."""
+        while self._feeders:
+            await asyncio.gather(*list(self._feeders.values()), return_exceptions=True)
+        await self.app.dispatcher.join()
+
+
+def run_worker(shard: int, updates, events, logs, app_factory):
+    """
+    Точка входа процесса-воркера.
+    Аргументы:
+        shard (int): Номер воркера.
+        updates (multiprocessing.Queue): Пачки обновлений от супервизора, None - остановка.
+        events (multiprocessing.Queue): Очередь событий воркера для супервизора.
+        logs (multiprocessing.Queue): Очередь записей лога, в файл их пишет супервизор.
+        app_factory (function): Корутина-функция (shard) -> BotApp с запущенным клиентом и обработчиками.
+    """
+    # Ctrl+C получает вся группа процессов, остановкой воркеров управляет супервизор.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    setup_worker_logging(logs)
+    asyncio.run(_serve(shard, updates, events, app_factory))
+
+
+async def _serve(shard: int, updates, events, app_factory):
+    from config.config import settings
+
+    app = await app_factory(shard)
+    worker = ShardWorker(app, settings.dispatcher_max_pending)
+    loop = asyncio.get_running_loop()
+    events.put(("ready", shard, os.getpid()))
+    logger.info("Worker %s started (pid %s)", shard, os.getpid())
+    try:
+        while True:
+            batch = await loop.run_in_executor(None, updates.get)
+            if batch is None:
+                break
+            for update in batch:
+                await worker.submit(update)
+        await worker.join()
+    finally:
+        await app.shutdown()
+        events.put(("stopped", shard, worker.processed))
+
+
+class Supervisor:
+    """
+    Принимает обновления от Telegram одним клиентом и раздает их N процессам-воркерам
+    по консистентному хешу Телеграм ID пользователя. Все обновления пользователя попадают в один воркер,
+    поэтому порядок обработки и состояние FSM пользователя сохраняются (подходит и FSM_BACKEND=memory).
+    Обновления передаются через multiprocessing.Queue пачками, накопленными за одну итерацию event loop.
+    Упавший воркер перезапускается с тем же номером и новой очередью,
+    обновления, которые он принял, но не обработал, теряются.
+
+    Атрибуты:
+        client (Client | None): Клиент Pyrogram, принимающий обновления (None - обновления передаются через forward).
+        workers (int): Количество процессов-воркеров.
+        app_factory (function): Корутина-функция (shard) -> BotApp, создающая приложение в процессе-воркере.
+        prepare (function | None): Корутина-функция, выполняемая один раз до запуска воркеров (миграции).
+        restart_delay (float): Период проверки воркеров и задержка перед перезапуском (сек).
+        ring (HashRing): Распределение пользователей по воркерам.
+        stop_event (asyncio.Event): Событие для остановки.
+        forwarded (int): Количество переданных воркерам обновлений.
+        processed (dict): Количество обработанных обновлений по воркерам (после их остановки).
+        restarts (int): Количество перезапусков воркеров.
+    """
+    def __init__(self, client, workers: int, app_factory, prepare=None, restart_delay: float = 1.0):
+        self.client = client
+        self.workers = workers
+        self.app_factory = app_factory
+        self.prepare = prepare
+        self.restart_delay = restart_delay
+        self.ring = HashRing(workers)
+        self.stop_event = asyncio.Event()
+        self.forwarded = 0
+        self.processed: dict = {}
+        self.restarts = 0
+        self._context = multiprocessing.get_context("spawn")
+        self._queues = [self._context.Queue() for _ in range(workers)]
+        self._events = self._context.Queue()
+        self._logs = self._context.Queue()
+        self._log_listener = None
+        self._processes: list = [None] * workers
+        self._buffers: list = [[] for _ in range(workers)]
+        self._flush_scheduled = False
+        self._ready: set = set()
+        self._all_ready = asyncio.Event()
+        self._stopping = False
+        self._events_task = None
+        self._monitor_task = None
+
+    def register(self):
+        """Регистрирует в клиенте обработчики, передающие все обновления воркерам."""
+        for handler in (MessageHandler, CallbackQueryHandler, InlineQueryHandler):
+            self.client.add_handler(handler(self._on_update))
+
+    async def _on_update(self, client, update):
+        self.forward(update)
+
+    def forward(self, update):
+        """Добавляет обновление в пачку воркера его пользователя. Пачки отправляются в конце итерации event loop."""
+        user = getattr(update, "from_user", None)
+        shard = self.ring.node(user.id) if user else 0
+        self._buffers[shard].append(update)
+        self.forwarded += 1
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush)
+
+    def _flush(self):
+        self._flush_scheduled = False
+        for shard, buffer in enumerate(self._buffers):
+            if buffer:
+                self._queues[shard].put(buffer)
+                self._buffers[shard] = []
+
+    def _spawn(self, shard: int):
+        process = self._context.Process(
+            target=run_worker,
+            args=(shard, self._queues[shard], self._events, self._logs, self.app_factory),
+            name=f"bot-worker-{shard}",
+        )
+        process.start()
+        self._processes[shard] = process
+
+    async def _read_events(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            event = await loop.run_in_executor(None, self._events.get)
+            if event is None:
+                break
+            kind, shard, value = event
+            if kind == "ready":
+                self._ready.add(shard)
+                if len(self._ready) == self.workers:
+                    self._all_ready.set()
+            elif kind == "stopped":
+                self.processed[shard] = self.processed.get(shard, 0) + value
+                logger.info("Worker %s stopped, processed %s updates", shard, value)
+
+    async def _monitor(self):
+        """Перезапускает завершившиеся воркеры, пока супервизор не остановлен."""
+        while not self._stopping:
+            await asyncio.sleep(self.restart_delay)
+            for shard, process in enumerate(self._processes):
+                if self._stopping or process.is_alive():
+                    continue
+                logger.error("Worker %s exited with code %s, restarting", shard, process.exitcode)
+                # Воркер мог завершиться, удерживая блокировку чтения очереди, поэтому очередь заменяется новой.
+                # Обновления, которые он не успел обработать, теряются.
+                queue = self._queues[shard]
+                queue.cancel_join_thread()
+                queue.close()
+                self._queues[shard] = self._context.Queue()
+                self.restarts += 1
+                self._spawn(shard)
+
+    async def start(self):
+        """Запускает процессы-воркеры и дожидается их готовности. Записи лога воркеров пишет этот процесс."""
+        self._log_listener = forward_worker_logs(self._logs)
+        for shard in range(self.workers):
+            self._spawn(shard)
+        self._events_task = asyncio.create_task(self._read_events())
+        self._monitor_task = asyncio.create_task(self._monitor())
+        await self._all_ready.wait()
+
+    async def stop(self, timeout: float = 60):
+        """
+        Останавливает воркеры: отправляет оставшиеся обновления и сигнал остановки
+        и ждет, пока каждый воркер обработает свою очередь и завершится.
+        Аргументы:
+            timeout (float): Сколько секунд ждать каждый воркер, после этого он завершается принудительно.
+        """
+        self._stopping = True
+        if self._monitor_task:
+            self._monitor_task.cancel()
+        self._flush()
+        for queue in self._queues:
+            queue.put(None)
+        loop = asyncio.get_running_loop()
+        for shard, process in enumerate(self._processes):
+            if process is None:
+                continue
+            await loop.run_in_executor(None, process.join, timeout)
+            if process.is_alive():
+                logger.error("Worker %s did not stop in %s s, terminating", shard, timeout)
+                process.terminate()
+                await loop.run_in_executor(None, process.join)
+        self._events.put(None)
+        if self._events_task:
+            await self._events_task
+        if self._log_listener:
+            self._log_listener.stop()
+            self._log_listener = None
+
+    def stats(self) -> dict:
+        """Возвращает количество переданных обновлений, живых воркеров и перезапусков."""
+        return {
+            "workers": self.workers,
+            "alive": sum(1 for process in self._processes if process is not None and process.is_alive()),
+            "forwarded": self.forwarded,
+            "restarts": self.restarts,
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stop_event.set)
+        if self.prepare:
+            await self.prepare()
+        self.register()
+        logger.info("Starting %s bot workers...", self.workers)
+        await self.start()
+        logger.info("Starting supervisor...")
+        await self.client.start()
+        try:
+            await self.stop_event.wait()
+        finally:
+            await self.client.stop()
+            await self.stop()
+            logger.info("Supervisor stopped gracefully.. %s", self.stats())
+
+    def run(self):
+        """Запускает супервизор до сигнала SIGINT или SIGTERM."""
+        log_listener = setup_logging()
+        try:
+            loop = asyncio.get_event_loop()
+            loop.run_until_complete(self._run())
+        finally:
+            log_listener.stop()
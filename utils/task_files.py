@@ -0,0 +1,145 @@
+import csv
+import json
+import asyncio
+
+from utils.utils import TaskValidator
+
+FILE_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "json"}
+
+
+def file_format(file_name: str | None) -> str | None:
+    """Определяет формат файла задач ("csv", "jsonl" или "json") по расширению, None - формат не поддерживается."""
+    name = (file_name or "").lower()
+    for extension, fmt in FILE_FORMATS.items():
+        if name.endswith(extension):
+            return fmt
+    return None
+
+
+def read_rows(path: str, fmt: str):
+    """
+    Читает файл задач построчно, не загружая его в память целиком.
+    Файл "json" - массив объектов, он разбирается целиком, а номер строки - номер элемента массива.
+    Чтение блокирующее, в обработчиках генератор читается в отдельном потоке (record_batches).
+    Аргументы:
+        path (str): Путь к файлу.
+        fmt (str): "csv" (первая строка - заголовок), "jsonl" или "json".
+    Возвращает:
+        Генератор кортежей (номер строки, словарь полей или None, ошибка разбора или None).
+    """
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        if fmt == "json":
+            try:
+                rows = json.load(file)
+            except ValueError as e:
+                yield 1, None, f"invalid JSON: {e}"
+                return
+            if not isinstance(rows, list):
+                yield 1, None, "a JSON array of objects is expected"
+                return
+            for number, row in enumerate(rows, 1):
+                if isinstance(row, dict):
+                    yield number, row, None
+                else:
+                    yield number, None, "a JSON object is expected"
+        elif fmt == "csv":
+            reader = csv.DictReader(file)
+            while True:
+                try:
+                    row = next(reader)
+                except StopIteration:
+                    return
+                except csv.Error as e:
+                    yield reader.line_num, None, str(e)
+                    continue
+                yield reader.line_num, row, None
+        else:
+            for number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield number, None, f"invalid JSON: {e}"
+                    continue
+                if not isinstance(row, dict):
+                    yield number, None, "a JSON object is expected"
+                    continue
+                yield number, row, None
+
+
+def task_record(row: dict, statuses) -> tuple[tuple | None, str | None]:
+    """
+    Проверяет поля задачи из файла через TaskValidator.
+    Аргументы:
+        row (dict): Поля строки файла: name, description и необязательный status.
+        statuses (Iterable[str]): Допустимые статусы задачи.
+    Возвращает:
+        tuple: Запись (name, description, status) и None или None и сообщение об ошибке.
+    """
+    name = str(row.get("name") or "").strip()
+    description = str(row.get("description") or "")
+    status = str(row.get("status") or "PROG").strip().upper()
+    if not name:
+        return None, "the task name is empty"
+    is_valid, error_msg = TaskValidator.validate("name", name)
+    if not is_valid:
+        return None, error_msg
+    if status not in statuses:
+        return None, f"unknown status {status}"
+    return (name, description, status), None
+
+
+class ImportReport:
+    """
+    Итоги проверки файла импорта.
+    Атрибуты:
+        skipped (int): Количество пропущенных строк.
+        errors (list): Первые ошибки в виде строк "line N: ошибка".
+    """
+    MAX_ERRORS = 5
+
+    def __init__(self):
+        self.skipped = 0
+        self.errors: list = []
+
+    def skip(self, line: int, error: str):
+        self.skipped += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append(f"line {line}: {error}")
+
+
+def next_batch(rows, statuses, batch_size: int, report: ImportReport) -> list:
+    """Читает и проверяет строки до следующей пачки из batch_size записей, пустой список - файл закончился."""
+    batch = []
+    for number, row, error in rows:
+        record = None
+        if error is None:
+            record, error = task_record(row, statuses)
+        if error:
+            report.skip(number, error)
+            continue
+        batch.append(record)
+        if len(batch) >= batch_size:
+            break
+    return batch
+
+
+async def record_batches(path: str, fmt: str, statuses, batch_size: int, report: ImportReport):
+    """
+    Читает файл задач и отдает проверенные записи пачками по batch_size.
+    Чтение и разбор файла идут в отдельном потоке (asyncio.to_thread), чтобы не задерживать
+    обновления других пользователей. Неверные строки пропускаются и учитываются в report.
+    Аргументы:
+        path (str): Путь к файлу.
+        fmt (str): "csv", "jsonl" или "json".
+        statuses (Iterable[str]): Допустимые статусы задачи.
+        batch_size (int): Размер пачки.
+        report (ImportReport): Отчет о пропущенных строках.
+    """
+    rows = read_rows(path, fmt)
+    try:
+        while batch := await asyncio.to_thread(next_batch, rows, statuses, batch_size, report):
+            yield batch
+    finally:
+        await asyncio.to_thread(rows.close)
@@ -0,0 +1,90 @@
+import math
+import heapq
+import itertools
+
+
+class TimerWheel:
+    """
+    Иерархическое колесо таймеров.
+    Уровень 0 делится на slots ячеек по resolution секунд, каждая ячейка следующего уровня покрывает
+    весь предыдущий уровень. Когда колесо доходит до ячейки старшего уровня, ее таймеры раскладываются
+    по младшим уровням. Добавление и срабатывание таймера стоят O(1) независимо от количества таймеров.
+    Таймеры дальше последнего уровня хранятся в куче и переносятся в колесо по мере приближения.
+
+    Атрибуты:
+        resolution (float): Длительность одного тика (сек), точность срабатывания таймеров.
+        slots (int): Количество ячеек на каждом уровне.
+        levels (int): Количество уровней.
+    """
+    def __init__(self, resolution: float = 1.0, slots: int = 64, levels: int = 4, now: float = 0.0):
+        self.resolution = resolution
+        self.slots = slots
+        self.levels = levels
+        self._wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self._spans = [slots ** level for level in range(levels + 1)]
+        self._overflow: list = []
+        self._seq = itertools.count()
+        self._current = int(now // resolution)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, when: float, item):
+        """
+        Добавляет таймер. Таймер с уже наступившим временем сработает на следующем тике.
+        Аргументы:
+            when (float): Время срабатывания (в тех же единицах, что и now в advance, обычно time.time()).
+            item: Значение, которое вернет advance при срабатывании.
+        """
+        tick = max(math.ceil(when / self.resolution), self._current + 1)
+        self._insert(tick, item)
+        self._size += 1
+
+    def _insert(self, tick: int, item):
+        delta = tick - self._current
+        for level in range(self.levels):
+            if delta < self._spans[level + 1]:
+                self._wheels[level][(tick // self._spans[level]) % self.slots].append((tick, item))
+                return
+        heapq.heappush(self._overflow, (tick, next(self._seq), item))
+
+    def _cascade(self):
+        # Старшие уровни раскладываются первыми: их таймеры могут попасть в ячейку младшего уровня,
+        # которую нужно разложить на этом же тике.
+        for level in range(self.levels - 1, 0, -1):
+            span = self._spans[level]
+            if self._current % span:
+                continue
+            slot = self._wheels[level][(self._current // span) % self.slots]
+            timers = slot[:]
+            slot.clear()
+            for tick, item in timers:
+                self._insert(tick, item)
+        limit = self._current + self._spans[self.levels]
+        while self._overflow and self._overflow[0][0] < limit:
+            tick, _, item = heapq.heappop(self._overflow)
+            self._insert(tick, item)
+
+    def advance(self, now: float) -> list:
+        """
+        Продвигает колесо до времени now.
+        Аргументы:
+            now (float): Текущее время.
+        Возвращает:
+            list: Значения сработавших таймеров в порядке времени срабатывания.
+        """
+        target = int(now // self.resolution)
+        if not self._size:
+            self._current = max(self._current, target)
+            return []
+        due = []
+        while self._current < target and self._size > len(due):
+            self._current += 1
+            self._cascade()
+            slot = self._wheels[0][self._current % self.slots]
+            due.extend(item for _, item in slot)
+            slot.clear()
+        self._current = max(self._current, target)
+        self._size -= len(due)
+        return due
@@ -1,10 +1,96 @@
 
 
+from datetime import datetime, timedelta, timezone
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
 def chunk_tasks(tasks, chunk_size):
     """Разбивает список задач на группы фиксированного размера."""
     return [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
 
 
+def encode_cursor(created_at: datetime, task_id: int) -> str:
+    """Кодирует ключ задачи (created_at, id) в короткую строку для callback_data."""
+    return f"{(created_at - EPOCH) // timedelta(microseconds=1)}.{task_id}"
+
+
+def decode_cursor(value: str) -> tuple[datetime, int]:
+    """Декодирует строку из encode_cursor обратно в ключ (created_at, id)."""
+    micros, task_id = value.split(".")
+    return EPOCH + timedelta(microseconds=int(micros)), int(task_id)
+
+
+def _to_base36(number: int) -> str:
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    result = ""
+    while True:
+        number, remainder = divmod(number, 36)
+        result = digits[remainder] + result
+        if not number:
+            return result
+
+
+def encode_ids(ids) -> str:
+    """
+    Кодирует набор ID задач в короткую строку для данных FSM:
+    отсортированные ID записываются разностями с предыдущим ID в base36 через точку.
+    Например, {1000, 1001, 1005} -> "rs.1.4".
+    """
+    previous = 0
+    parts = []
+    for task_id in sorted(ids):
+        parts.append(_to_base36(task_id - previous))
+        previous = task_id
+    return ".".join(parts)
+
+
+def decode_ids(value: str) -> set:
+    """Декодирует строку из encode_ids обратно в набор ID."""
+    ids = set()
+    if not value:
+        return ids
+    current = 0
+    for part in value.split("."):
+        current += int(part, 36)
+        ids.add(current)
+    return ids
+
+
+DUE_DATE_UNITS = {"m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+DUE_DATE_FORMATS = ("%Y-%m-%d %H:%M", "%Y-%m-%d")
+
+
+def parse_due_date(text: str, now: datetime) -> datetime:
+    """
+    Разбирает срок задачи, введенный пользователем. Время указывается в UTC.
+    Поддерживаются `YYYY-MM-DD HH:MM`, `YYYY-MM-DD` (начало дня) и сдвиг от текущего времени: `+30m`, `+2h`, `+3d`, `+1w`.
+    Аргументы:
+        text (str): Текст пользователя.
+        now (datetime): Текущее время (UTC).
+    Возвращает:
+        datetime: Срок задачи с часовым поясом UTC.
+    Исключения:
+        ValueError: Текст не распознан или срок уже прошел.
+    """
+    text = text.strip().lower()
+    if text.startswith("+") and text[-1:] in DUE_DATE_UNITS:
+        amount = int(text[1:-1])
+        due_at = now + timedelta(**{DUE_DATE_UNITS[text[-1]]: amount})
+    else:
+        for date_format in DUE_DATE_FORMATS:
+            try:
+                due_at = datetime.strptime(text, date_format).replace(tzinfo=timezone.utc)
+                break
+            except ValueError:
+                continue
+        else:
+            raise ValueError(f"Unknown date format: {text}")
+    if due_at <= now:
+        raise ValueError("The due date has already passed")
+    return due_at
+
+
 class TaskValidator:
     """Класс для проверки ограничений на поля задачи"""
     FIELD_CONSTRAINTS = {